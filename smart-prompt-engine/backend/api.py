@@ -1,10 +1,20 @@
 from fastapi import FastAPI
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+import contextvars
 import hashlib
-from backend.utils.cache import TTLCache, SimpleRateLimiter, normalize_prompt
+import json
+import os
+import time
+from backend.utils.cache import TTLCache, ByteLRUCache, SimpleRateLimiter, normalize_prompt, content_hash
 from backend.cache_metrics import CacheStats, reset_stats
+from backend.utils.executor import BoundedExecutor, Overloaded
+from backend.metrics import MetricsMiddleware, registry as metrics_registry, stage
+from backend.tracing import TracingMiddleware, exporter as trace_exporter, span
+from backend.debug import Busy, debug_enabled, sample_stacks, token_ok, tracemalloc_diff
 
 
 # Internal modules
@@ -15,15 +25,23 @@ from backend.scorer.intent import IntentDetector
 from backend.optimizer.prompt_builder import PromptOptimizer
 from backend.scorer.gap_reasoner import GapReasoner
 from backend.scorer.local_score import LocalScorer
-from backend.llm.openai_client import OpenAITextClient, LLMError
-from backend.rewrite.suggestions import get_rewrite_suggestions, SYSTEM_VERSION as REWRITE_SYSTEM_VERSION
+from backend.scorer.tier0 import Tier0Scorer, TypingTracker
+from backend.llm.openai_client import OpenAITextClient, LLMError, LLMTimeout, LLMUnavailable
+from backend.rewrite.suggestions import (
+    get_rewrite_suggestions, local_rewrite_suggestions, SYSTEM_VERSION as REWRITE_SYSTEM_VERSION,
+)
+from backend.rewrite.incremental import CardIndex, refill
+from backend.rewrite.prefetch import PrefetchConfig, Prefetcher
 from backend.compress.logs import compress_logs
-from backend.compress.code import compress_code
+from backend.compress.code import CODE_MODES, compress_code
 from backend.compress.data import compress_json
-from backend.compress.csv import compress_csv
+from backend.compress.csv import CSV_MODES, compress_csv
 from backend.compress.detect import detect_type
-from backend.storage.feedback import append_feedback, summary as feedback_summary
-from backend.compress.text import compress_text
+from backend.storage.feedback import append_feedback, summary as feedback_summary, writer as feedback_writer
+from backend.compress.text import TEXT_MODES, compress_text
+from backend.compress.tokens import count_tokens, set_tokenizer, token_count_stats
+from backend.compress.dedupe import NEAR_DUP_THRESHOLD
+from backend.compress.segment import segment_text, compress_segments
 
 # -----------------------------
 # Initialize shared objects
@@ -31,21 +49,88 @@ from backend.compress.text import compress_text
 
 rep = PromptRepresentation()
 local_scorer = LocalScorer(rep)
+# Tier-0 hashing scorer (None until distilled: python -m backend.scorer.distill_tier0)
+tier0_scorer = Tier0Scorer.load(local_scorer)
+typing_tracker = TypingTracker(fast_gap_s=2.0)
+# Token counts for /compress come from the already-loaded MiniLM tokenizer.
+set_tokenizer(getattr(rep.model, "tokenizer", None))
 intent_detector = IntentDetector()
-gap_reasoner = GapReasoner()  # OpenAI-based reasoner
-optimizer = PromptOptimizer(intent_detector, gap_reasoner)
 
-# LLM client (used only for rewrite suggestions)
+# LLM client (rewrite suggestions and /optimize)
 # Make sure you have OPENAI_API_KEY in your environment
 try:
     llm_client = OpenAITextClient(model="gpt-4o-mini")
 except Exception:
     llm_client = None
 
+gap_reasoner = GapReasoner(llm_client)  # LLM-based reasoner
+optimizer = PromptOptimizer(intent_detector, gap_reasoner)
+
 rewrite_cache = TTLCache(ttl_seconds=600, max_items=500)       # 10 minutes
 rewrite_cache_stats = CacheStats(name="rewrite_cache")
+# Issued cards by first line + fill fields: a card sent back with blanks
+# filled is recomputed locally from the result it came from.
+card_index = CardIndex(ttl_seconds=600, max_items=2000)
+card_index_stats = CacheStats(name="rewrite_card_index")
+# 20/min per IP; raise SPE_REWRITE_LIMIT_PER_MIN for load tests from one host
 rewrite_limiter = SimpleRateLimiter(
-    max_requests=20, window_seconds=60)  # 20/min per IP
+    max_requests=int(os.getenv("SPE_REWRITE_LIMIT_PER_MIN", "20")), window_seconds=60)
+# In-flight LLM rewrites by cache key. Concurrent callers share one upstream
+# call, and a caller that gives up at its deadline leaves it running so the
+# result still lands in rewrite_cache for the next request.
+rewrite_inflight: dict[str, asyncio.Task] = {}
+rewrite_backgrounded: set[str] = set()  # in-flight keys some caller fell back on
+# Part of deadline_ms kept back for building the local fallback cards.
+REWRITE_LOCAL_RESERVE_S = float(os.getenv("SPE_REWRITE_LOCAL_RESERVE_MS", 60)) / 1000
+rewrite_sla_stats = {"deadline_requests": 0, "joined_inflight": 0, "background_completed": 0,
+                     "background_failed": 0, "fallbacks": {}}
+
+# Dedicated, bounded pools per workload class: a burst of one kind fails
+# fast (429/503 + Retry-After) instead of queueing behind the others.
+_CPUS = os.cpu_count() or 2
+encode_pool = BoundedExecutor(
+    "encode",
+    max_workers=int(os.getenv("SPE_ENCODE_WORKERS", min(4, _CPUS))),
+    max_queue=int(os.getenv("SPE_ENCODE_QUEUE", 32)),
+    deadline_s=float(os.getenv("SPE_ENCODE_DEADLINE_S", 2.0)),
+)
+compress_pool = BoundedExecutor(
+    "compress",
+    max_workers=int(os.getenv("SPE_COMPRESS_WORKERS", min(2, _CPUS))),
+    max_queue=int(os.getenv("SPE_COMPRESS_QUEUE", 16)),
+    deadline_s=float(os.getenv("SPE_COMPRESS_DEADLINE_S", 10.0)),
+)
+llm_pool = BoundedExecutor(
+    "llm",
+    max_workers=int(os.getenv("SPE_LLM_WORKERS", 16)),
+    max_queue=int(os.getenv("SPE_LLM_QUEUE", 64)),
+    deadline_s=float(os.getenv("SPE_LLM_DEADLINE_S", 30.0)),
+)
+executors = {ex.name: ex for ex in (encode_pool, compress_pool, llm_pool)}
+
+
+# Bump when compressor output changes so stale cached results are not served.
+COMPRESS_VERSION = "c3"
+
+
+def _compressed_size(result: dict) -> int:
+    # Sized by the compressed payload (+ small fixed overhead for stats/meta).
+    return len((result.get("compressed") or "").encode("utf-8")) + 512
+
+
+compress_cache = ByteLRUCache(max_bytes=32 * 1024 * 1024, size_of=_compressed_size)  # 32 MB
+compress_cache_stats = CacheStats(name="compress_cache")
+
+
+def _compress_cache_key(text: str, data: "CompressData") -> str:
+    opts = json.dumps({
+        "mode": data.mode,
+        "prompt": data.prompt,
+        "target_tokens": data.target_tokens,
+        "dedupe_threshold": data.dedupe_threshold,
+        "aliases": data.aliases,
+    }, sort_keys=True)
+    return content_hash(COMPRESS_VERSION, opts, text)
 
 
 def _rewrite_cache_key(prompt: str, model: str, user_id: str) -> str:
@@ -80,6 +165,65 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(MetricsMiddleware, routes_from=app)
+# outermost: the root span covers the metrics middleware too
+app.add_middleware(TracingMiddleware)
+
+
+# Set by warmup(); /ready answers 503 until the encoder has run once.
+readiness = {"ready": False, "warmup_ms": None}
+
+
+def warmup() -> None:
+    """
+    One real pass through the scorer (tokenizer, encoder, prototypes) and
+    the compress tokenizer, so the first user request is not the slow one.
+    backend.serve calls this in the parent before forking workers.
+    """
+    if readiness["ready"]:
+        return
+    t0 = time.perf_counter()
+    local_scorer.score("How do I fix this TypeError in my Python script? Explain step by step.")
+    count_tokens("warmup")
+    readiness["warmup_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    readiness["ready"] = True
+
+
+@app.on_event("startup")
+def _warmup_on_startup():
+    # Already done in the parent when started through backend.serve.
+    warmup()
+
+
+@app.on_event("shutdown")
+def _flush_on_shutdown():
+    # pre-forked workers leave through os._exit, which skips atexit
+    feedback_writer.close()
+    trace_exporter.flush()
+
+
+def _json_response(body: dict) -> JSONResponse:
+    # Serialize inside the handler (instead of after return) so the cost
+    # shows up as its own span.
+    with span("serialize"):
+        return JSONResponse(content=body)
+
+
+@app.get("/ready")
+def ready_endpoint():
+    body = {**readiness, "pid": os.getpid()}
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status,
+        content={"error": "overloaded", "workload": exc.workload, "details": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # -----------------------------
 # Data models
@@ -88,6 +232,8 @@ app.add_middleware(
 
 class PromptData(BaseModel):
     prompt: str
+    # "fast" (tier-0 if confident) | "full" (embedding model); None = auto by typing rate
+    tier: str | None = None
 
 
 class OptimizeData(BaseModel):
@@ -96,10 +242,38 @@ class OptimizeData(BaseModel):
 
 class RewriteData(BaseModel):
     prompt: str
+    # Latency SLA: answer within this many ms, with local cards
+    # (meta.source="local") if the LLM is not back in time.
+    deadline_ms: int | None = None
+
+
+# A mode names one compressor's strategy; the others use their default.
+COMPRESS_MODES = (*CSV_MODES, *CODE_MODES, *TEXT_MODES)
+
+
+def _mode(data: "CompressData", modes: tuple) -> str:
+    return data.mode if data.mode in modes else modes[0]
 
 
 class CompressData(BaseModel):
     text: str
+    # Optional per-compressor mode: "lossless" (CSV), "skeleton" (code), "extractive" (text).
+    mode: str | None = None
+    # The user's own prompt (if any); names mentioned there are kept in full.
+    prompt: str | None = None
+    # Hard context budget; compressors drop lower-priority content to fit.
+    target_tokens: int | None = None
+    # Near-duplicate similarity threshold for text/logs (0 disables).
+    dedupe_threshold: float | None = Field(None, ge=0.0, le=1.0)
+    # Replace long repeated paths/prefixes in logs/code with $P1-style aliases.
+    aliases: bool = True
+
+    @field_validator("mode")
+    @classmethod
+    def _known_mode(cls, mode: str | None) -> str | None:
+        if mode is not None and mode not in COMPRESS_MODES:
+            raise ValueError(f"unknown mode {mode!r}; expected one of {', '.join(COMPRESS_MODES)}")
+        return mode
 
 
 class FeedbackData(BaseModel):
@@ -139,93 +313,277 @@ def _ensure_savings(result: dict, original: str) -> dict:
         stats = result.setdefault("stats", {})
         stats["chars_in"] = len(original)
         stats["chars_out"] = len(original)
+        if "tokens_in" in stats:
+            stats["tokens_out"] = stats["tokens_in"]
         result["note"] = "Not compressed (would increase size)"
     return result
 
 
+def _with_token_stats(result: dict, original: str) -> dict:
+    stats = result.setdefault("stats", {})
+    if "tokens_in" not in stats:
+        stats["tokens_in"] = count_tokens(original)
+    if "tokens_out" not in stats:
+        stats["tokens_out"] = count_tokens(result.get("compressed") or "")
+    return result
+
+
+def _compress_by_type(kind: str, text: str, data: CompressData, budget: int | None,
+                      dedupe: float, query: str) -> dict:
+    with stage(f"compress_{kind}"):
+        return _run_compressor(kind, text, data, budget, dedupe, query)
+
+
+def _run_compressor(kind: str, text: str, data: CompressData, budget: int | None,
+                    dedupe: float, query: str) -> dict:
+    if kind == "logs":
+        return compress_logs(text, target_tokens=budget, near_dup_threshold=dedupe,
+                             aliases=data.aliases)
+    if kind == "json":
+        return compress_json(text, target_tokens=budget)
+    if kind == "csv":
+        return compress_csv(text, mode=_mode(data, CSV_MODES), target_tokens=budget)
+    if kind == "code":
+        return compress_code(text, mode=_mode(data, CODE_MODES), query=query, target_tokens=budget,
+                             aliases=data.aliases)
+    return compress_text(text, target_tokens=budget, mode=_mode(data, TEXT_MODES), rep=rep,
+                         near_dup_threshold=dedupe)
+
+
 @app.get("/")
 def root():
     return {"message": "Smart Prompt Engine API running"}
 
 
 @app.post("/score")
-def score_endpoint(data: PromptData):
+async def score_endpoint(data: PromptData, request: Request):
     """
     Local (no-LLM) scoring for live typing:
     - score (0-100)
     - intent
     - missing dimensions
     - live suggestions
+    While the user is typing fast, the tier-0 hashing scorer answers
+    (tier="tier0") unless it is not confident; otherwise the full
+    embedding scorer does (tier="full").
     """
-    return local_scorer.score(data.prompt)
+    session = request.headers.get("X-SPE-User", "").strip() or (request.client.host if request.client else "anon")
+    typing = typing_tracker.is_typing_fast(session)
+    use_tier0 = tier0_scorer is not None and data.tier != "full" and (typing or data.tier == "fast")
+    with span("score", pool="encode", tier0=use_tier0):
+        result = await encode_pool.run(_score, data.prompt, use_tier0)
+    user_id = request.headers.get("X-SPE-User", "").strip() or "anon"
+    prefetcher.observe(session, user_id, data.prompt, result)
+    return result
+
+
+def _score(prompt: str, use_tier0: bool) -> dict:
+    if use_tier0:
+        out = tier0_scorer.score(prompt)
+        if out is not None:
+            return out
+    return local_scorer.score(prompt)
 
 
 @app.post("/optimize")
-def optimize_endpoint(data: OptimizeData):
+async def optimize_endpoint(data: OptimizeData):
     """
     Returns optimized prompt with missing info detected by LLM
     """
-    user_vec = rep.encode(data.prompt)
+    try:
+        return await llm_pool.run(_optimize, data.prompt)
+    except LLMUnavailable as e:
+        return {"error": "llm_unavailable", "details": str(e)}
+    except LLMError as e:
+        return {"error": "LLM call failed", "details": str(e)}
+
+
+def _optimize(prompt: str) -> dict:
+    user_vec = rep.encode(prompt)
     confidence = confidence_scorer.score(user_vec)
 
-    result = optimizer.optimize(data.prompt, confidence)
+    result = optimizer.optimize(prompt, confidence)
+    return result
+
+
+def _finish_rewrite(prompt: str, result: dict) -> dict:
+    # Keep model score if present; otherwise derive from missing fields.
+    if not isinstance(result.get("score"), (int, float)):
+        missing = result.get("required_missing", [])
+        if not isinstance(missing, list):
+            missing = []
+        result["score"] = llm_score_from_missing(prompt, missing)
+    result["label"] = "good" if result["score"] >= 75 else "needs_more_detail"
+    return result
+
+
+async def _run_rewrite(key: str, scope: str, prompt: str) -> dict:
+    result = await llm_pool.run(get_rewrite_suggestions, prompt, llm_client)
+    if isinstance(result, dict) and result.get("error"):
+        return result
+    result = _finish_rewrite(prompt, result)
+    rewrite_cache.set(key, result)
+    rewrite_cache_stats.sets += 1
+    card_index.add(scope, result)
+    card_index_stats.sets += 1
     return result
 
 
+def _rewrite_done(key: str, task: asyncio.Task) -> None:
+    if rewrite_inflight.get(key) is task:
+        rewrite_inflight.pop(key)
+    if not task.cancelled():
+        task.exception()  # mark retrieved even when no caller is left waiting
+
+
+def _count_background(key: str, task: asyncio.Task) -> None:
+    rewrite_backgrounded.discard(key)
+    failed = task.cancelled() or task.exception() is not None
+    rewrite_sla_stats["background_failed" if failed else "background_completed"] += 1
+
+
+def _rewrite_task(key: str, scope: str, prompt: str) -> asyncio.Task:
+    """
+    The shared LLM job for this key, started if none is running.
+    """
+    task = rewrite_inflight.get(key)
+    if task is not None and not task.cancelling():
+        rewrite_sla_stats["joined_inflight"] += 1
+        return task
+    task = rewrite_inflight[key] = asyncio.ensure_future(_run_rewrite(key, scope, prompt))
+    task.add_done_callback(lambda t: _rewrite_done(key, t))
+    return task
+
+
+def _start_prefetch(prompt: str, user_id: str) -> tuple[str, asyncio.Task] | None:
+    if llm_client is None:
+        return None
+    model_name = getattr(llm_client, "model", "unknown")
+    key = _rewrite_cache_key(prompt, model_name, user_id)
+    if key in rewrite_inflight or rewrite_cache.get(key) is not None:
+        return None
+    # fresh context: the prefetch is not part of the /score request's trace
+    task = contextvars.Context().run(_rewrite_task, key, f"{model_name}|{user_id}", prompt)
+    return key, task
+
+
+def _llm_pool_idle() -> bool:
+    # leave at least half the llm workers to interactive requests
+    return llm_pool.queued == 0 and llm_pool.running < max(1, llm_pool.max_workers // 2)
+
+
+prefetcher = Prefetcher(PrefetchConfig.from_env(), start=_start_prefetch, has_capacity=_llm_pool_idle)
+
+
+def _fallback_reason(exc: Exception) -> str:
+    if isinstance(exc, Overloaded):
+        return "overloaded"
+    if isinstance(exc, LLMUnavailable):
+        return "llm_unavailable"
+    if isinstance(exc, LLMTimeout):
+        return "llm_timeout"
+    return "llm_error"
+
+
+async def _local_rewrite(prompt: str, scope: str, reason: str, pending: bool) -> JSONResponse:
+    with span("local_rewrite", pool="encode", reason=reason):
+        local = await encode_pool.run(_score, prompt, False)
+        result = _finish_rewrite(prompt, local_rewrite_suggestions(prompt, local))
+    card_index.add(scope, result)
+    card_index_stats.sets += 1
+    fallbacks = rewrite_sla_stats["fallbacks"]
+    fallbacks[reason] = fallbacks.get(reason, 0) + 1
+    result["meta"] = {"cache": "miss", "source": "local", "fallback": reason,
+                      "llm_pending": pending, "system_version": REWRITE_SYSTEM_VERSION}
+    return _json_response(result)
+
+
 @app.post("/rewrite_suggestions")
-def rewrite_suggestions_endpoint(data: RewriteData, request: Request):
+async def rewrite_suggestions_endpoint(data: RewriteData, request: Request):
     if llm_client is None:
         return {
             "error": "LLM not configured",
             "hint": "Set OPENAI_API_KEY and restart backend."
         }
 
-    # Rate limit (by client IP)
-    ip = request.client.host if request.client else "unknown"
-    if not rewrite_limiter.allow(ip):
-        return {
-            "error": "rate_limited",
-            "details": "Too many requests. Please wait a bit and try again."
-        }
-
     # Normalize + cache lookup
-    prompt = normalize_prompt(data.prompt)
+    with stage("normalize"):
+        prompt = normalize_prompt(data.prompt)
     if not prompt:
         return {"error": "empty_prompt"}
 
     model_name = getattr(llm_client, "model", "unknown")
     user_id = request.headers.get("X-SPE-User", "").strip() or "anon"
     key = _rewrite_cache_key(prompt, model_name, user_id)
-    cached = rewrite_cache.get(key)
+    prefetched = prefetcher.claim(key)
+    with span("cache_lookup"):
+        cached = rewrite_cache.get(key)
     if cached is not None:
         rewrite_cache_stats.hits += 1
         out = dict(cached)
-        out["meta"] = {"cache": "hit",
+        out["meta"] = {"cache": "hit", "source": "llm", "prefetched": prefetched,
                        "system_version": REWRITE_SYSTEM_VERSION}
-        return out
+        return _json_response(out)
     rewrite_cache_stats.misses += 1
 
-    # Call LLM
+    # One of our own cards with blanks filled in: no LLM call needed.
+    scope = f"{model_name}|{user_id}"
+    with span("card_index_lookup"):
+        base = card_index.lookup(scope, prompt)
+    if base is not None:
+        card_index_stats.hits += 1
+        result = _finish_rewrite(prompt, refill(prompt, base))
+        card_index.add(scope, result)
+        card_index_stats.sets += 1
+        out = dict(result)
+        out["meta"] = {"cache": "miss", "source": "incremental",
+                       "system_version": REWRITE_SYSTEM_VERSION}
+        return _json_response(out)
+    if "fill these (required):" in prompt.lower():
+        card_index_stats.misses += 1
+
+    # Rate limit (by client IP); only calls that may reach the LLM count
+    ip = request.client.host if request.client else "unknown"
+    if not rewrite_limiter.allow(ip):
+        return {
+            "error": "rate_limited",
+            "details": "Too many requests. Please wait a bit and try again."
+        }
+
+    deadline_s = None
+    if data.deadline_ms is not None:
+        deadline_s = max(0.0, data.deadline_ms / 1000 - REWRITE_LOCAL_RESERVE_S)
+        rewrite_sla_stats["deadline_requests"] += 1
+
+    # Call LLM (shielded: a deadline or a dropped client must not cancel
+    # the shared job)
+    task = _rewrite_task(key, scope, prompt)
     try:
-        result = get_rewrite_suggestions(prompt, llm_client)
+        try:
+            with span("rewrite", pool="llm", deadline=deadline_s is not None):
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=deadline_s)
+        except asyncio.TimeoutError:
+            if key not in rewrite_backgrounded:
+                # counted once per job, however many callers fell back
+                rewrite_backgrounded.add(key)
+                task.add_done_callback(lambda t: _count_background(key, t))
+            return await _local_rewrite(prompt, scope, "deadline", pending=True)
+        except (LLMError, Overloaded) as e:
+            if deadline_s is None:
+                raise
+            return await _local_rewrite(prompt, scope, _fallback_reason(e), pending=False)
         if isinstance(result, dict) and result.get("error"):
             return result
 
-        # Keep model score if present; otherwise derive from missing fields.
-        if not isinstance(result.get("score"), (int, float)):
-            missing = result.get("required_missing", [])
-            if not isinstance(missing, list):
-                missing = []
-            result["score"] = llm_score_from_missing(prompt, missing)
-        result["label"] = "good" if result["score"] >= 75 else "needs_more_detail"
-
-        # store in cache
-        rewrite_cache.set(key, result)
-        rewrite_cache_stats.sets += 1
-        result["meta"] = {"cache": "miss",
-                          "system_version": REWRITE_SYSTEM_VERSION}
-        return result
+        out = dict(result)
+        out["meta"] = {"cache": "miss", "source": "llm", "prefetched": prefetched,
+                       "system_version": REWRITE_SYSTEM_VERSION}
+        return _json_response(out)
 
+    except LLMUnavailable as e:
+        return {"error": "llm_unavailable", "details": str(e)}
+    except LLMTimeout as e:
+        return {"error": "llm_timeout", "details": str(e)}
     except LLMError as e:
         msg = str(e)
         # Make quota errors clear
@@ -238,7 +596,7 @@ def rewrite_suggestions_endpoint(data: RewriteData, request: Request):
 
 
 @app.post("/compress")
-def compress_endpoint(data: CompressData):
+async def compress_endpoint(data: CompressData):
     text = (data.text or "").strip()
     # Normalize literal \n sequences into real newlines (common from contenteditable)
     if "\\n" in text and "\n" not in text:
@@ -247,22 +605,51 @@ def compress_endpoint(data: CompressData):
     if not text:
         return {"detected_type": "empty", "compressed": "", "stats": {"chars_in": 0, "chars_out": 0}}
 
-    det = detect_type(text)
+    key = _compress_cache_key(text, data)
+    with span("cache_lookup"):
+        cached = compress_cache.get(key)
+    if cached is not None:
+        compress_cache_stats.hits += 1
+        out = dict(cached)
+        out["meta"] = {"cache": "hit", "version": COMPRESS_VERSION}
+        return out
+    compress_cache_stats.misses += 1
+
+    with span("compress", pool="compress"):
+        out = await compress_pool.run(_compress_uncached, text, data)
+    if compress_cache.set(key, out):
+        compress_cache_stats.sets += 1
+    compress_cache_stats.evictions = compress_cache.evictions
+    out = dict(out)
+    out["meta"] = {"cache": "miss", "version": COMPRESS_VERSION}
+    return out
+
+
+def _compress_uncached(text: str, data: CompressData) -> dict:
+    budget = data.target_tokens if (data.target_tokens or 0) > 0 else None
+    dedupe = NEAR_DUP_THRESHOLD if data.dedupe_threshold is None else data.dedupe_threshold
+
+    # Mixed pastes (prose + fence + traceback + JSON ...) get one compressor per segment.
+    with stage("segment"):
+        segments = segment_text(text)
+    if len(segments) > 1:
+        prose = "\n".join(s["text"] for s in segments if s["type"] == "text")
+        query = data.prompt or prose
+
+        def _one(kind: str, seg_text: str, seg_budget: int | None) -> dict:
+            return _compress_by_type(kind, seg_text, data, seg_budget, dedupe, query)
+
+        out = compress_segments(segments, _one, target_tokens=budget)
+        out["debug"] = {"matched": "mixed", "segments": [s["type"] for s in segments]}
+        return _with_token_stats(_ensure_savings(out, text), text)
+
+    with stage("detect_type"):
+        det = detect_type(text)
     kind = det.get("type", "text")
 
-    if kind == "logs":
-        out = compress_logs(text)
-    elif kind == "json":
-        out = compress_json(text)
-    elif kind == "csv":
-        out = compress_csv(text)
-    elif kind == "code":
-        out = compress_code(text)
-    else:
-        out = compress_text(text)
-
+    out = _compress_by_type(kind, text, data, budget, dedupe, data.prompt or "")
     out["debug"] = det.get("debug", {"matched": kind})
-    return _ensure_savings(out, text)
+    return _with_token_stats(_ensure_savings(out, text), text)
 
 
 @app.post("/feedback")
@@ -284,11 +671,127 @@ def cache_metrics():
             "maxsize": getattr(rewrite_cache, "maxsize", getattr(rewrite_cache, "max_items", None)),
             "ttl": getattr(rewrite_cache, "ttl", None),
             "currsize": len(getattr(rewrite_cache, "store", {})),
-        }
+        },
+        "compress_cache": {
+            **compress_cache_stats.to_dict(),
+            "max_bytes": compress_cache.max_bytes,
+            "bytes": compress_cache.bytes,
+            "currsize": len(compress_cache.store),
+        },
+        "rewrite_card_index": {**card_index_stats.to_dict(), "currsize": len(card_index)},
+        "rewrite_sla": {**rewrite_sla_stats, "inflight": len(rewrite_inflight)},
+        "rewrite_prefetch": prefetcher.metrics(),
+        "token_count": token_count_stats(),
     }
 
 
 @app.post("/cache_metrics/reset")
 def cache_metrics_reset():
     reset_stats(rewrite_cache_stats)
+    reset_stats(compress_cache_stats)
+    reset_stats(card_index_stats)
+    compress_cache.evictions = 0
+    for k in ("deadline_requests", "joined_inflight", "background_completed", "background_failed"):
+        rewrite_sla_stats[k] = 0
+    rewrite_sla_stats["fallbacks"] = {}
+    prefetcher.reset_stats()
     return {"ok": True}
+
+
+@app.get("/queue_metrics")
+def queue_metrics():
+    """
+    Per-workload executor state: queue depth, running, rejected (429),
+    timed out (503) and queue wait percentiles, plus the feedback writer
+    and the LLM upstream (circuit breaker, hedging, p95).
+    """
+    out = {name: ex.metrics() for name, ex in executors.items()}
+    out["feedback_writer"] = feedback_writer.metrics()
+    if llm_client is not None:
+        out["llm_upstream"] = llm_client.resilient.stats()
+    return out
+
+
+def _queue_samples():
+    fields = (
+        ("spe_executor_queue_depth", "gauge", "Tasks waiting per workload pool", "queue_depth"),
+        ("spe_executor_running", "gauge", "Tasks running per workload pool", "running"),
+        ("spe_executor_rejected_total", "counter", "Requests rejected with 429 (queue full)", "rejected"),
+        ("spe_executor_timed_out_total", "counter", "Requests failed with 503 (deadline)", "timed_out"),
+        ("spe_executor_wait_p99_seconds", "gauge", "p99 queue wait over recent tasks", "wait_ms_p99"),
+    )
+    snap = {name: ex.metrics() for name, ex in executors.items()}
+    for metric, kind, help_text, field in fields:
+        scale = 0.001 if field.startswith("wait_ms") else 1
+        yield metric, kind, help_text, [(f'pool="{n}"', m[field] * scale) for n, m in snap.items()]
+
+    caches = (rewrite_cache_stats, compress_cache_stats, card_index_stats)
+    yield "spe_cache_hits_total", "counter", "Cache hits", [(f'cache="{c.name}"', c.hits) for c in caches]
+    yield "spe_cache_misses_total", "counter", "Cache misses", [(f'cache="{c.name}"', c.misses) for c in caches]
+    yield "spe_rewrite_local_fallbacks_total", "counter", "Rewrites answered with local cards, by reason", [
+        (f'reason="{r}"', n) for r, n in rewrite_sla_stats["fallbacks"].items()]
+    yield "spe_rewrite_prefetch_total", "counter", "Speculative rewrites by outcome", [
+        (f'outcome="{k}"', v) for k, v in prefetcher.stats.items()]
+    yield "spe_feedback_dropped_total", "counter", "Feedback events dropped (writer queue full)", [("", feedback_writer.dropped)]
+    if llm_client is not None:
+        breaker = llm_client.resilient.breaker
+        yield "spe_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is open", [
+            ('upstream="openai"', 0 if breaker.state == "closed" else 1)]
+
+
+metrics_registry.register_collector(_queue_samples)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus text format: per-endpoint and per-stage latency histograms,
+    request counters, executor queues and cache hit/miss counters.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# -----------------------------
+# Debug endpoints (off unless SPE_DEBUG_ENDPOINTS=1)
+# -----------------------------
+
+
+def _debug_denied(request: Request) -> JSONResponse | None:
+    if not debug_enabled():
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    if not token_ok(request.headers.get("X-SPE-Debug-Token")):
+        return JSONResponse(status_code=403, content={"error": "forbidden"})
+    return None
+
+
+@app.get("/debug/profile")
+def debug_profile(request: Request, seconds: float = 10.0, hz: int = 100,
+                  lines: bool = False, idle: bool = False):
+    """
+    Sampling profiler: collapsed stacks of all worker threads for `seconds`.
+    Pipe into flamegraph.pl or load in speedscope.
+    """
+    denied = _debug_denied(request)
+    if denied is not None:
+        return denied
+    try:
+        out = sample_stacks(seconds=seconds, hz=hz, with_lines=lines, idle=idle)
+    except Busy as e:
+        return JSONResponse(status_code=409, content={"error": "busy", "details": str(e)})
+    return PlainTextResponse(out["collapsed"] + "\n", headers={"X-SPE-Samples": str(out["samples"])})
+
+
+@app.get("/debug/tracemalloc")
+def debug_tracemalloc(request: Request, seconds: float = 10.0, top: int = 25,
+                      frames: int = 5, key: str = "lineno"):
+    """
+    Allocation growth over `seconds`: top allocation sites from a
+    tracemalloc snapshot diff.
+    """
+    denied = _debug_denied(request)
+    if denied is not None:
+        return denied
+    try:
+        return tracemalloc_diff(seconds=seconds, top=top, frames=frames, key_type=key)
+    except Busy as e:
+        return JSONResponse(status_code=409, content={"error": "busy", "details": str(e)})
@@ -0,0 +1,169 @@
+# backend/compress/alias.py
+from __future__ import annotations
+import re
+from typing import Dict, Any, List, Tuple
+
+from backend.compress.tokens import count_tokens
+
+# Substrings shorter than this are never worth a legend entry.
+MIN_ALIAS_LEN = 16
+MAX_ALIAS_LEN = 200
+MIN_OCCURRENCES = 3
+# Single-digit aliases: no alias is a prefix of another, so decoding is exact.
+MAX_ALIASES = 9
+# Occurrences sampled when extending a repeated window to its maximal length.
+EXTEND_SAMPLE = 64
+# Candidates (best scan estimate first) that get an exact recount.
+RECOUNT_CANDIDATES = 4 * MAX_ALIASES
+
+# Candidate starts: line start or right after a delimiter, so aliases cover
+# whole paths / URLs / UUIDs / package prefixes instead of splitting words.
+# Aliases never span whitespace, so frame/exception structure stays readable.
+BOUNDARY_BEFORE = set(" \t\"'(=:,[<")
+STOP_CHARS = set(" \t\n\"'")
+SEPARATORS = "/\\.:"
+WORD_CHAR = re.compile(r"[\w-]")
+LEGEND_HEADER = "aliases:"
+LEGEND_LINE = re.compile(r"^(\$[A-Z]\d) = (.*)$")
+
+
+def _boundary_starts(text: str) -> List[int]:
+    starts = []
+    prev = "\n"
+    for i, ch in enumerate(text):
+        if (prev == "\n" or prev in BOUNDARY_BEFORE) and ch not in STOP_CHARS:
+            starts.append(i)
+        prev = ch
+    return starts
+
+
+def _extend(text: str, positions: List[int], length: int) -> str:
+    """
+    Grow a repeated window to the right while every sampled occurrence
+    agrees, then cut back to a clean token/separator boundary.
+    """
+    n = len(text)
+    first = positions[0]
+    end = length
+    while end < MAX_ALIAS_LEN:
+        if first + end >= n:
+            break
+        ch = text[first + end]
+        if ch in STOP_CHARS or any(p + end >= n or text[p + end] != ch for p in positions[1:]):
+            break
+        end += 1
+
+    s = text[first:first + end]
+    nxt = text[first + end] if first + end < n else " "
+    if WORD_CHAR.match(nxt) and WORD_CHAR.match(s[-1]):
+        # stopped mid-token: back off to the last path/package separator
+        cut = max(s.rfind(c) for c in SEPARATORS)
+        s = s[:cut + 1] if cut >= 0 else ""
+    return s
+
+
+def find_repeated_substrings(text: str, min_len: int = MIN_ALIAS_LEN) -> List[Tuple[str, int]]:
+    """
+    Windowed hash scan: every boundary-aligned window of min_len chars is
+    hashed once (O(n) windows); windows seen MIN_OCCURRENCES+ times are
+    extended to their maximal shared length.
+    Returns (substring, estimated occurrences), best estimated savings first.
+    """
+    counts: Dict[str, int] = {}
+    positions: Dict[str, List[int]] = {}
+    for i in _boundary_starts(text):
+        w = text[i:i + min_len]
+        if len(w) < min_len or not STOP_CHARS.isdisjoint(w):
+            continue
+        c = counts.get(w, 0)
+        counts[w] = c + 1
+        if c == 0:
+            positions[w] = [i]
+        elif c < EXTEND_SAMPLE:
+            positions[w].append(i)
+
+    cands: Dict[str, int] = {}
+    for w, c in counts.items():
+        if c < MIN_OCCURRENCES:
+            continue
+        s = _extend(text, positions[w], min_len)
+        if len(s) >= min_len:
+            cands[s] = max(cands.get(s, 0), c)
+    return sorted(cands.items(), key=lambda kv: kv[1] * (len(kv[0]) - 3), reverse=True)
+
+
+def _alias_prefix(text: str) -> str:
+    for letter in "PQRSTUVWXYZ":
+        if f"${letter}" not in text:
+            return f"${letter}"
+    return ""
+
+
+def apply_aliases(text: str, min_len: int = MIN_ALIAS_LEN) -> Tuple[str, Dict[str, Any]]:
+    """
+    Replace long repeated substrings with $P1..$P9 and prepend a legend.
+    Only applied when the token count actually drops; the result expands
+    back to the exact input with expand_aliases().
+    """
+    stats: Dict[str, Any] = {"aliases": 0}
+    prefix = _alias_prefix(text)
+    if not prefix or len(text) < min_len * MIN_OCCURRENCES:
+        return text, stats
+
+    cands = find_repeated_substrings(text, min_len)
+    if not cands:
+        return text, stats
+
+    # Greedy by exact savings over the best scan estimates; counts are
+    # refreshed as the text is rewritten, since earlier aliases can swallow
+    # later candidates.
+    def savings(s: str, body: str) -> int:
+        return body.count(s) * (len(s) - 3) - (len(s) + 6)
+
+    cands = sorted((s for s, _ in cands[:RECOUNT_CANDIDATES]),
+                   key=lambda s: savings(s, text), reverse=True)
+
+    body = text
+    legend: List[Tuple[str, str]] = []
+    for s in cands:
+        if len(legend) >= MAX_ALIASES:
+            break
+        if body.count(s) < MIN_OCCURRENCES or savings(s, body) <= 0:
+            continue
+        alias = f"{prefix}{len(legend) + 1}"
+        body = body.replace(s, alias)
+        legend.append((alias, s))
+
+    if not legend:
+        return text, stats
+
+    out = LEGEND_HEADER + "\n" + "\n".join(f"{a} = {s}" for a, s in legend) + "\n\n" + body
+
+    tokens_before = count_tokens(text)
+    tokens_after = count_tokens(out)
+    if tokens_after >= tokens_before:
+        return text, stats
+
+    stats["aliases"] = len(legend)
+    stats["alias_tokens_saved"] = tokens_before - tokens_after
+    return out, stats
+
+
+def expand_aliases(text: str) -> str:
+    """
+    Inverse of apply_aliases (legend removed, aliases substituted back).
+    """
+    if not text.startswith(LEGEND_HEADER + "\n"):
+        return text
+    head, sep, body = text.partition("\n\n")
+    if not sep:
+        return text
+    legend: List[Tuple[str, str]] = []
+    for ln in head.splitlines()[1:]:
+        m = LEGEND_LINE.match(ln)
+        if not m:
+            return text
+        legend.append((m.group(1), m.group(2)))
+    for alias, s in reversed(legend):
+        body = body.replace(alias, s)
+    return body
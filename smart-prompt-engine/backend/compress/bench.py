@@ -0,0 +1,166 @@
+# backend/compress/bench.py
+"""
+Micro-benchmarks for the compressors.
+
+    python -m backend.compress.bench dedupe --lines 100000
+    python -m backend.compress.bench dedupe --lines 100000 --distinct
+    python -m backend.compress.bench alias --tracebacks 200
+"""
+from __future__ import annotations
+import argparse
+import random
+import resource
+import time
+from typing import List
+
+from backend.compress.alias import apply_aliases, expand_aliases
+from backend.compress.dedupe import NEAR_DUP_THRESHOLD, collapse_near_duplicates, log_blocks
+from backend.compress.tokens import count_tokens
+
+
+def synthetic_log_lines(n: int, seed: int = 7) -> List[str]:
+    """
+    Realistic-ish noisy log: request lines with varying ids/latencies,
+    periodic retries and repeated tracebacks with small differences.
+    """
+    rnd = random.Random(seed)
+    users = [f"user_{i}" for i in range(50)]
+    lines: List[str] = []
+    while len(lines) < n:
+        r = rnd.random()
+        ts = f"2024-05-{rnd.randint(1, 28):02d} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}"
+        if r < 0.6:
+            lines.append(
+                f"{ts} INFO GET /api/items/{rnd.randint(1, 99999)} user={rnd.choice(users)} "
+                f"status=200 latency_ms={rnd.randint(3, 900)}"
+            )
+        elif r < 0.85:
+            lines.append(
+                f"{ts} WARNING retrying upstream call attempt={rnd.randint(1, 5)} "
+                f"request_id={rnd.getrandbits(64):016x} reason=timeout"
+            )
+        else:
+            depth = rnd.randint(3, 6)
+            lines.append("Traceback (most recent call last):")
+            for d in range(depth):
+                lines.append(f'  File "/srv/app/handlers/mod_{d}.py", line {rnd.randint(10, 400)}, in handle_{d}')
+                lines.append(f"    result = step_{d}(payload, ctx)")
+            lines.append(f"KeyError: 'field_{rnd.randint(0, 3)}'")
+    return lines[:n]
+
+
+def synthetic_distinct_lines(n: int, seed: int = 5) -> List[str]:
+    """
+    Lines that stay distinct after dedupe normalization (which maps digits
+    and hex ids away): random lowercase words, the worst case for MinHash.
+    """
+    rnd = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [" ".join("".join(rnd.choice(letters) for _ in range(rnd.randint(3, 9)))
+                     for _ in range(rnd.randint(6, 14))) for _ in range(n)]
+
+
+PY_ROOTS = [
+    "/home/deploy/.venvs/prod/lib/python3.11/site-packages/",
+    "/srv/app/src/billing_service/",
+]
+PY_MODULES = [
+    "django/core/handlers/exception.py", "django/core/handlers/base.py",
+    "sqlalchemy/engine/base.py", "sqlalchemy/orm/session.py",
+    "api/views/invoices.py", "domain/ledger/reconcile.py",
+]
+JAVA_PREFIXES = ["com.acme.billing.service.invoice.", "org.springframework.web.servlet.mvc.method."]
+
+
+def synthetic_traceback_corpus(n_tracebacks: int, seed: int = 11) -> str:
+    """
+    Traceback-heavy paste: Python tracebacks with deep venv/app paths and
+    Java traces with long package prefixes, plus request ids (UUIDs) that
+    repeat across records.
+    """
+    rnd = random.Random(seed)
+    req_ids = [f"{rnd.getrandbits(128):032x}" for _ in range(5)]
+    req_ids = [f"{r[:8]}-{r[8:12]}-{r[12:16]}-{r[16:20]}-{r[20:]}" for r in req_ids]
+    out: List[str] = []
+    for _ in range(n_tracebacks):
+        rid = rnd.choice(req_ids)
+        if rnd.random() < 0.6:
+            out.append(f"ERROR request_id={rid} unhandled exception")
+            out.append("Traceback (most recent call last):")
+            for _ in range(rnd.randint(4, 9)):
+                mod = rnd.choice(PY_MODULES)
+                root = PY_ROOTS[0] if mod.startswith(("django/", "sqlalchemy/")) else PY_ROOTS[1]
+                out.append(f'  File "{root}{mod}", line {rnd.randint(10, 900)}, in fn_{rnd.randint(0, 20)}')
+                out.append(f"    value = call_{rnd.randint(0, 9)}(request, ctx)")
+            out.append(f"KeyError: 'field_{rnd.randint(0, 5)}'")
+        else:
+            out.append(f"java.lang.IllegalStateException: request {rid} rejected")
+            for _ in range(rnd.randint(4, 9)):
+                pkg = rnd.choice(JAVA_PREFIXES)
+                cls = f"Handler{rnd.randint(0, 5)}"
+                out.append(f"\tat {pkg}{cls}.run{rnd.randint(0, 3)}({cls}.java:{rnd.randint(10, 400)})")
+    return "\n".join(out)
+
+
+def bench_alias(n_tracebacks: int) -> None:
+    text = synthetic_traceback_corpus(n_tracebacks)
+
+    t0 = time.perf_counter()
+    aliased, stats = apply_aliases(text)
+    t1 = time.perf_counter()
+    restored = expand_aliases(aliased)
+    t2 = time.perf_counter()
+
+    tokens_in = count_tokens(text)
+    tokens_out = count_tokens(aliased)
+    print(f"tracebacks:       {n_tracebacks}")
+    print(f"chars:            {len(text)} -> {len(aliased)}")
+    print(f"tokens:           {tokens_in} -> {tokens_out}  ({100 * (1 - tokens_out / max(1, tokens_in)):.1f}% saved)")
+    print(f"aliases:          {stats['aliases']}")
+    print(f"round-trip exact: {restored == text}")
+    print(f"scan + replace:   {(t1 - t0) * 1000:.1f} ms")
+    print(f"expand:           {(t2 - t1) * 1000:.1f} ms")
+
+
+def bench_dedupe(n_lines: int, threshold: float, distinct: bool = False) -> None:
+    lines = synthetic_distinct_lines(n_lines) if distinct else synthetic_log_lines(n_lines)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    t0 = time.perf_counter()
+    blocks = log_blocks(lines)
+    t1 = time.perf_counter()
+    kept, removed = collapse_near_duplicates(blocks, threshold)
+    t2 = time.perf_counter()
+
+    print(f"lines:            {len(lines)}")
+    print(f"blocks:           {len(blocks)}")
+    print(f"blocks kept:      {len(kept)}  (removed {removed})")
+    print(f"threshold:        {threshold}")
+    print(f"block split:      {(t1 - t0) * 1000:.1f} ms")
+    print(f"minhash + lsh:    {(t2 - t1) * 1000:.1f} ms")
+    print(f"throughput:       {len(lines) / max(1e-9, t2 - t0):,.0f} lines/s")
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak rss growth:  {(rss_after - rss_before) / 1024:.0f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compressor micro-benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("dedupe", help="MinHash/LSH near-duplicate removal on synthetic logs")
+    p.add_argument("--lines", type=int, default=100_000)
+    p.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD)
+    p.add_argument("--distinct", action="store_true", help="lines that survive normalization (worst case)")
+
+    p = sub.add_parser("alias", help="repeated-substring aliasing on traceback-heavy text")
+    p.add_argument("--tracebacks", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.cmd == "dedupe":
+        bench_dedupe(args.lines, args.threshold, args.distinct)
+    elif args.cmd == "alias":
+        bench_alias(args.tracebacks)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 # backend/compress/code.py
 from __future__ import annotations
 import re
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
+
+from backend.compress.alias import apply_aliases
+from backend.compress.skeleton import skeletonize_code
+from backend.compress.tokens import count_tokens, fit_lines
+
+CODE_MODES = ("lines", "skeleton")
 
 CODE_SIGNALS = [
     r"\b(def|class|import|from|return|async|await|lambda)\b",     # python
@@ -64,30 +70,82 @@ def looks_like_code(text: str) -> bool:
     return ok
 
 
-def compress_code(text: str) -> Dict[str, Any]:
+SIGNATURE_LINE = re.compile(
+    r"^\s*(async\s+def|def|class|function|export|public|private|protected|static|interface|struct)\b"
+)
+MARKER_LINE = re.compile(r"(Error|Exception|Traceback|TODO|FIXME)")
+
+
+def _code_line_priority(ln: str) -> int:
+    # Higher = kept longer when fitting a token budget.
+    if MARKER_LINE.search(ln):
+        return 3
+    if SIGNATURE_LINE.match(ln):
+        return 3
+    if ln.strip().startswith(("import ", "from ", "#include", "using ")):
+        return 2
+    return 1
+
+
+def compress_code(
+    text: str,
+    mode: str = "lines",
+    query: str = "",
+    target_tokens: Optional[int] = None,
+    aliases: bool = True,
+) -> Dict[str, Any]:
+    if mode not in CODE_MODES:
+        raise ValueError(f"unknown code mode {mode!r}; expected one of {', '.join(CODE_MODES)}")
     raw = (text or "").strip()
     lines = raw.splitlines()
     lines_in = len(lines)
     chars_in = len(raw)
 
-    keep_idx = set()
-    for i, ln in enumerate(lines):
-        s = ln.strip()
-        if s.startswith(("import ", "from ", "def ", "class ", "function ")):
-            keep_idx.add(i)
-        if "return" in s or "raise" in s:
-            keep_idx.add(i)
-        if re.search(r"(Error|Exception|Traceback|TypeError|ValueError|KeyError|TODO|FIXME)", ln):
+    stats: Dict[str, Any] = {}
+    out = None
+
+    if mode == "skeleton":
+        sk = skeletonize_code(raw, query=query)
+        if sk is not None:
+            out = sk["lines"]
+            stats["strategy"] = sk["strategy"]
+            stats["functions_elided"] = sk["functions_elided"]
+            stats["functions_kept"] = sk["functions_kept"]
+        # unparsable fragment: fall through to the line-based heuristic
+
+    if out is None:
+        keep_idx = set()
+        for i, ln in enumerate(lines):
+            s = ln.strip()
+            if s.startswith(("import ", "from ", "def ", "class ", "function ")):
+                keep_idx.add(i)
+            if "return" in s or "raise" in s:
+                keep_idx.add(i)
+            if re.search(r"(Error|Exception|Traceback|TypeError|ValueError|KeyError|TODO|FIXME)", ln):
+                keep_idx.add(i)
+
+        for i in range(max(0, len(lines) - 10), len(lines)):
             keep_idx.add(i)
 
-    for i in range(max(0, len(lines) - 10), len(lines)):
-        keep_idx.add(i)
+        ordered_idx = sorted(keep_idx)
+        out = [lines[i] for i in ordered_idx if lines[i].strip()]
 
-    ordered_idx = sorted(keep_idx)
-    out = [lines[i] for i in ordered_idx if lines[i].strip()]
+    if target_tokens:
+        prios = [_code_line_priority(ln) for ln in out]
+        kept, tokens_out = fit_lines(out, prios, target_tokens, drop_first="last")
+        stats["dropped_lines"] = len(out) - len(kept)
+        out = [out[i] for i in kept]
+        stats["tokens_in"] = count_tokens(raw)
+        stats["tokens_out"] = tokens_out
 
     compressed = "\n".join(out).strip()
 
+    if aliases:
+        compressed, alias_stats = apply_aliases(compressed)
+        stats.update(alias_stats)
+        if alias_stats["aliases"] and "tokens_out" in stats:
+            stats["tokens_out"] = count_tokens(compressed)
+
     return {
         "detected_type": "code",
         "compressed": compressed,
@@ -96,5 +154,6 @@ def compress_code(text: str) -> Dict[str, Any]:
             "lines_out": len(out),
             "chars_in": chars_in,
             "chars_out": len(compressed),
+            **stats,
         }
     }
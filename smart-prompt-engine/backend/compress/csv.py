@@ -1,9 +1,27 @@
 # backend/compress/csv.py
 from __future__ import annotations
 
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
+from datetime import datetime
 import csv
 import io
+import json
+import re
+
+from backend.compress.tokens import PINNED, count_tokens, fit_lines
+
+CSV_MODES = ("summary", "lossless")
+
+# Dictionary encoding only pays off when values repeat enough.
+DICT_MAX_DISTINCT = 64
+DICT_MAX_DISTINCT_RATIO = 0.5
+
+TIMESTAMP_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d",
+)
+INT_VALUE = re.compile(r"^-?(0|[1-9]\d*)$")
 
 
 def looks_like_csv(text: str) -> bool:
@@ -54,7 +72,14 @@ def detect_csv_reason(text: str) -> Tuple[bool, str]:
     return True, f"dialect_delimiter:{repr(dialect.delimiter)}"
 
 
-def compress_csv(text: str, sample_rows: int = 3) -> Dict[str, Any]:
+def compress_csv(
+    text: str,
+    sample_rows: int = 3,
+    mode: str = "summary",
+    target_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    if mode not in CSV_MODES:
+        raise ValueError(f"unknown CSV mode {mode!r}; expected one of {', '.join(CSV_MODES)}")
     raw = (text or "").strip()
     if not raw:
         return {
@@ -63,6 +88,9 @@ def compress_csv(text: str, sample_rows: int = 3) -> Dict[str, Any]:
             "stats": {"chars_in": 0, "chars_out": 0}
         }
 
+    if mode == "lossless":
+        return compress_csv_lossless(raw, target_tokens=target_tokens)
+
     chars_in = len(raw)
     try:
         reader = csv.reader(io.StringIO(raw))
@@ -105,6 +133,16 @@ def compress_csv(text: str, sample_rows: int = 3) -> Dict[str, Any]:
     if row_count > (sample_rows * 2):
         out.append("- ... (middle rows omitted)")
 
+    stats: Dict[str, Any] = {}
+    if target_tokens:
+        # Header lines stay; sample rows are dropped from the end.
+        prios = [0 if ln.startswith("- ") and not ln.startswith("- ...") else PINNED for ln in out]
+        kept, tokens_out = fit_lines(out, prios, target_tokens, drop_first="last")
+        stats["dropped_lines"] = len(out) - len(kept)
+        out = [out[i] for i in kept]
+        stats["tokens_in"] = count_tokens(raw)
+        stats["tokens_out"] = tokens_out
+
     compressed = "\n".join(out)
 
     return {
@@ -115,5 +153,240 @@ def compress_csv(text: str, sample_rows: int = 3) -> Dict[str, Any]:
             "chars_out": len(compressed),
             "row_count": row_count,
             "column_count": col_count,
+            **stats,
+        },
+    }
+
+
+# ---------- Lossless mode (dictionary + delta encoding) ----------
+
+def _alias_prefix(name: str, values: List[str]) -> Optional[str]:
+    """
+    Short alias prefix for a column (e.g. "s" -> s1, s2, ...).
+    Skips prefixes that would collide with real values in the column.
+    """
+    letters = [ch.lower() for ch in (name or "") if ch.isalpha()]
+    candidates = letters[:1] + ["v", "k", "x"]
+    for prefix in candidates:
+        pat = re.compile(rf"^{re.escape(prefix)}\d+$")
+        if not any(pat.match(v) for v in values):
+            return prefix
+    return None
+
+
+def _legend_value(value: str) -> str:
+    # Quote only when the raw value would make the legend ambiguous.
+    if value == "" or value != value.strip() or any(ch in value for ch in ',=;"'):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _dictionary_plan(name: str, values: List[str]) -> Optional[Dict[str, str]]:
+    n = len(values)
+    if n < 3:
+        return None
+
+    counts: Dict[str, int] = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+
+    distinct = len(counts)
+    if distinct > DICT_MAX_DISTINCT or distinct > max(2, int(n * DICT_MAX_DISTINCT_RATIO)):
+        return None
+
+    prefix = _alias_prefix(name, values)
+    if prefix is None:
+        return None
+
+    # Most frequent values get the shortest aliases.
+    ordered = sorted(counts, key=lambda v: (-counts[v], values.index(v)))
+    aliases = {v: f"{prefix}{i + 1}" for i, v in enumerate(ordered)}
+
+    saved = sum(counts[v] * (len(v) - len(aliases[v])) for v in ordered)
+    legend_cost = sum(len(aliases[v]) + len(_legend_value(v)) + 3 for v in ordered) + len(name) + 4
+    if saved <= legend_cost:
+        return None
+    return aliases
+
+
+def _parse_sorted_series(values: List[str]) -> Optional[Tuple[str, List[int]]]:
+    """
+    Returns (kind, numbers) when the column is a non-decreasing integer or
+    timestamp series whose text can be rebuilt exactly from the numbers.
+    """
+    if len(values) < 3:
+        return None
+
+    if all(INT_VALUE.match(v) for v in values):
+        nums = [int(v) for v in values]
+        kind = "int"
+    else:
+        kind = ""
+        nums = []
+        for fmt in TIMESTAMP_FORMATS:
+            try:
+                parsed = [datetime.strptime(v, fmt) for v in values]
+            except ValueError:
+                continue
+            if all(p.strftime(fmt) == v for p, v in zip(parsed, values)):
+                base = parsed[0]
+                nums = [int((p - base).total_seconds()) for p in parsed]
+                kind = fmt
+                break
+        if not kind:
+            return None
+
+    if any(b < a for a, b in zip(nums, nums[1:])):
+        return None
+    return kind, nums
+
+
+def _delta_cells(values: List[str], kind: str, nums: List[int]) -> List[str]:
+    suffix = "" if kind == "int" else "s"
+    cells = [values[0]]
+    for prev, cur in zip(nums, nums[1:]):
+        cells.append(f"+{cur - prev}{suffix}")
+    return cells
+
+
+def compress_csv_lossless(text: str, target_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lossless CSV mode: every row is kept, but
+    - low-cardinality columns are dictionary-encoded into short aliases (legend on top)
+    - sorted integer/timestamp columns are delta-encoded (+step from previous row)
+    - blank lines stay blank lines at their original positions
+    The result is still a readable table an LLM can reason about.
+    """
+    raw = (text or "").strip()
+    chars_in = len(raw)
+
+    try:
+        dialect = csv.Sniffer().sniff("\n".join(raw.splitlines()[:20]), delimiters=",;\t|")
+        delimiter = dialect.delimiter
+    except Exception:
+        delimiter = ","
+
+    try:
+        rows = list(csv.reader(io.StringIO(raw), delimiter=delimiter))
+    except Exception:
+        return {
+            "detected_type": "csv",
+            "compressed": raw,
+            "stats": {"chars_in": chars_in, "chars_out": chars_in},
+            "note": "Not compressed (parse failed)"
+        }
+
+    # Blank lines are encoded as themselves: skipped by the column
+    # encoders, put back in place when the table is written.
+    blank_at = {i for i, r in enumerate(rows) if not r}
+    rows = [r for r in rows if r]
+    if len(rows) < 4:
+        return {
+            "detected_type": "csv",
+            "compressed": raw,
+            "stats": {"chars_in": chars_in, "chars_out": chars_in},
+            "note": "Not compressed (too few rows)"
+        }
+
+    header = rows[0]
+    data = rows[1:]
+    col_count = len(header)
+    if any(len(r) != col_count for r in data):
+        return {
+            "detected_type": "csv",
+            "compressed": raw,
+            "stats": {"chars_in": chars_in, "chars_out": chars_in},
+            "note": "Not compressed (inconsistent columns)"
+        }
+
+    columns = [[r[c] for r in data] for c in range(col_count)]
+    encoded = [list(col) for col in columns]
+    legend: List[str] = []
+    dict_cols: List[str] = []
+    delta_cols: List[str] = []
+
+    for c, name in enumerate(header):
+        values = columns[c]
+
+        series = _parse_sorted_series(values)
+        if series is not None:
+            kind, nums = series
+            cells = _delta_cells(values, kind, nums)
+            if sum(map(len, cells)) < sum(map(len, values)):
+                encoded[c] = cells
+                unit = "" if kind == "int" else " seconds"
+                legend.append(f"- {name}: delta (first row absolute, then +N{unit} from previous row)")
+                delta_cols.append(name)
+                continue
+
+        aliases = _dictionary_plan(name, values)
+        if aliases is not None:
+            encoded[c] = [aliases[v] for v in values]
+            pairs = ", ".join(f"{a}={_legend_value(v)}" for v, a in aliases.items())
+            legend.append(f"- {name}: {pairs}")
+            dict_cols.append(name)
+
+    if not legend:
+        return {
+            "detected_type": "csv",
+            "compressed": raw,
+            "stats": {"chars_in": chars_in, "chars_out": chars_in},
+            "note": "Not compressed (no repeated or sorted columns)"
+        }
+
+    # One entry per row (quoted cells may hold newlines), so rows drop cleanly.
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\n")
+    encoded_rows: List[str] = []
+    for row in [header] + [[encoded[c][i] for c in range(col_count)] for i in range(len(data))]:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(row)
+        encoded_rows.append(buf.getvalue()[:-1])
+    it = iter(encoded_rows)
+    table = ["" if i in blank_at else next(it) for i in range(len(encoded_rows) + len(blank_at))]
+
+    out: List[str] = []
+    out.append("CSV LOSSLESS (dictionary/delta encoded)")
+    out.append("legend:")
+    out.extend(legend)
+    out.append("rows:")
+    head_len = len(out) + 1  # + table header
+    out.extend(table)
+
+    stats: Dict[str, Any] = {}
+    if target_tokens:
+        # Over budget: legend + header are pinned (the rows can't be decoded
+        # without them), trailing rows go first so deltas stay valid.
+        note = "... ({} more rows omitted to fit token budget)"
+        prios = [PINNED if i < head_len else 0 for i in range(len(out))]
+        kept, tokens_out = fit_lines(
+            out, prios, target_tokens, drop_first="last",
+            reserve_tokens=count_tokens(note.format(len(data))),
+        )
+        kept_set = set(kept)
+        dropped = sum(1 for i in range(head_len, len(out)) if i not in kept_set and out[i])
+        out = [out[i] for i in kept]
+        if dropped:
+            out.append(note.format(dropped))
+            tokens_out += count_tokens(out[-1])
+        stats["dropped_rows"] = dropped
+        stats["tokens_in"] = count_tokens(raw)
+        stats["tokens_out"] = tokens_out
+
+    compressed = "\n".join(out)
+
+    return {
+        "detected_type": "csv",
+        "compressed": compressed,
+        "stats": {
+            "chars_in": chars_in,
+            "chars_out": len(compressed),
+            "row_count": len(data),
+            "blank_rows": len(blank_at),
+            "column_count": col_count,
+            "dictionary_columns": dict_cols,
+            "delta_columns": delta_cols,
+            **stats,
         },
     }
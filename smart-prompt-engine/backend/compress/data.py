@@ -1,7 +1,9 @@
 # backend/compress/data.py
 from __future__ import annotations
 import json
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
+
+from backend.compress.tokens import count_tokens
 
 
 def looks_like_json(text: str) -> bool:
@@ -26,7 +28,41 @@ def _safe_json_parse(text: str):
     return json.loads(text)
 
 
-def compress_json(text: str) -> Dict[str, Any]:
+# Progressively smaller summaries tried when fitting a token budget:
+# (max_depth, max_keys, list_samples, max_str_len)
+SUMMARY_LEVELS = [
+    (2, 8, 3, None),
+    (2, 4, 3, 80),
+    (1, 4, 2, 40),
+    (1, 2, 1, 20),
+    (0, 2, 1, 20),
+]
+
+
+def _summarize_obj(o, max_depth=2, max_keys=8, list_samples=3, max_str=None, depth=0):
+    if depth > max_depth:
+        return "..."
+    if isinstance(o, dict):
+        keys = list(o.keys())
+        sample = {k: _summarize_obj(o[k], max_depth, max_keys, list_samples, max_str, depth + 1)
+                  for k in keys[:max_keys]}  # smaller
+        extra = len(keys) - len(sample)
+        if extra > 0:
+            sample["_more_keys"] = extra
+        return sample
+    if isinstance(o, list):
+        n = len(o)
+        sample_items = []
+        for idx in [0, n//2, n-1]:
+            if 0 <= idx < n:
+                sample_items.append(_summarize_obj(o[idx], max_depth, max_keys, list_samples, max_str, depth + 1))
+        return {"_type": "list", "count": n, "samples": sample_items[:list_samples]}
+    if max_str is not None and isinstance(o, str) and len(o) > max_str:
+        return o[:max_str] + "..."
+    return o
+
+
+def compress_json(text: str, target_tokens: Optional[int] = None) -> Dict[str, Any]:
     raw = (text or "").strip()
     chars_in = len(raw)
     try:
@@ -34,30 +70,25 @@ def compress_json(text: str) -> Dict[str, Any]:
     except Exception:
         return {"detected_type": "json", "compressed": raw, "stats": {"chars_in": chars_in, "chars_out": chars_in}}
 
-    def summarize_obj(o, depth=0):
-        if depth > 2:
-            return "..."
-        if isinstance(o, dict):
-            keys = list(o.keys())
-            sample = {k: summarize_obj(o[k], depth + 1)
-                      for k in keys[:8]}  # smaller
-            extra = len(keys) - len(sample)
-            if extra > 0:
-                sample["_more_keys"] = extra
-            return sample
-        if isinstance(o, list):
-            n = len(o)
-            sample_items = []
-            for idx in [0, n//2, n-1]:
-                if 0 <= idx < n:
-                    sample_items.append(summarize_obj(o[idx], depth + 1))
-            return {"_type": "list", "count": n, "samples": sample_items[:3]}
-        return o
-
-    summary = summarize_obj(obj)
-
-    # ✅ no indent, minified
-    compressed = json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+    levels = SUMMARY_LEVELS if target_tokens else SUMMARY_LEVELS[:1]
+    stats: Dict[str, Any] = {}
+    for level, (max_depth, max_keys, list_samples, max_str) in enumerate(levels):
+        summary = _summarize_obj(obj, max_depth, max_keys, list_samples, max_str)
+
+        # ✅ no indent, minified
+        compressed = json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+
+        if not target_tokens:
+            break
+        # Each level is a fresh (and smaller) summary, so only it gets counted.
+        tokens_out = count_tokens(compressed)
+        stats["summary_level"] = level
+        stats["tokens_out"] = tokens_out
+        if tokens_out <= target_tokens:
+            break
+
+    if target_tokens:
+        stats["tokens_in"] = count_tokens(raw)
 
     # ✅ if not smaller, keep original
     if len(compressed) >= chars_in:
@@ -71,5 +102,5 @@ def compress_json(text: str) -> Dict[str, Any]:
     return {
         "detected_type": "json",
         "compressed": compressed,
-        "stats": {"chars_in": chars_in, "chars_out": len(compressed)}
+        "stats": {"chars_in": chars_in, "chars_out": len(compressed), **stats}
     }
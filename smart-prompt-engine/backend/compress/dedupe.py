@@ -0,0 +1,205 @@
+# backend/compress/dedupe.py
+from __future__ import annotations
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Default Jaccard similarity above which two units count as "the same".
+NEAR_DUP_THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_WORDS = 3
+# Request-path bounds: only the first DEDUPE_MAX_UNITS distinct units are
+# MinHashed (later ones still merge with exact normalized copies), and a
+# unit is compared on its first UNIT_MAX_TOKENS tokens.
+DEDUPE_MAX_UNITS = int(os.getenv("SPE_DEDUPE_MAX_UNITS", "20000"))
+UNIT_MAX_TOKENS = 2048
+
+_PRIME = np.uint64(4294967311)  # smallest prime > 2**32
+_MASK32 = 0xFFFFFFFF
+_rng = np.random.RandomState(1337)
+_PERM_A = _rng.randint(1, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+# odd multipliers folding a band's rows into one int bucket key
+_BAND_MIX = _rng.randint(1, 2**62, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+
+_TOKEN = re.compile(r"[A-Za-z_]+|\d+|[^\sA-Za-z_\d]")
+_HEXISH = re.compile(r"\b(0x[0-9a-f]+|[0-9a-f]{8,}(-[0-9a-f]{4,})*)\b", re.IGNORECASE)
+_DIGITS = re.compile(r"(?<![A-Za-z_])\d+")
+
+
+def _normalize(unit: str) -> str:
+    # ids, addresses and counters vary between otherwise identical lines
+    return _DIGITS.sub("0", _HEXISH.sub("#", unit.lower()))
+
+
+def _shingle_hash(shingle: str) -> int:
+    # crc32, not hash(): str hashes are salted per process, so clusters
+    # would differ between workers and restarts
+    return zlib.crc32(shingle.encode("utf-8")) & _MASK32
+
+
+def _shingles(norm: str) -> List[int]:
+    toks = _TOKEN.findall(norm)[:UNIT_MAX_TOKENS]
+    if len(toks) < SHINGLE_WORDS:
+        return [_shingle_hash(" ".join(toks))]
+    return list({_shingle_hash(" ".join(toks[i:i + SHINGLE_WORDS]))
+                 for i in range(len(toks) - SHINGLE_WORDS + 1)})
+
+
+def minhash_signatures(units: Sequence[str], chunk_shingles: int = 16_384) -> np.ndarray:
+    """
+    (len(units), NUM_PERM) MinHash matrix for already-normalized units.
+    All shingles are hashed in large vectorised chunks and reduced per unit
+    with np.minimum.reduceat.
+    """
+    n = len(units)
+    sigs = np.empty((n, NUM_PERM), dtype=np.uint64)
+
+    start = 0
+    while start < n:
+        offsets: List[int] = []
+        flat: List[int] = []
+        end = start
+        while end < n and (not flat or len(flat) < chunk_shingles):
+            offsets.append(len(flat))
+            flat.extend(_shingles(units[end]))
+            end += 1
+
+        # in place: one (NUM_PERM, chunk) temporary, not three
+        hashed = _PERM_A[:, None] * np.asarray(flat, dtype=np.uint64)[None, :]
+        hashed += _PERM_B[:, None]
+        hashed %= _PRIME
+        sigs[start:end] = np.minimum.reduceat(hashed, np.asarray(offsets), axis=1).T
+        start = end
+
+    return sigs
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    (bands, rows) whose S-curve midpoint (1/b)^(1/r) is closest to threshold.
+    """
+    best = (num_perm, 1)
+    best_err = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+def near_duplicate_clusters(
+    units: Sequence[str],
+    threshold: float = NEAR_DUP_THRESHOLD,
+    max_units: int = DEDUPE_MAX_UNITS,
+) -> List[int]:
+    """
+    For every unit, the index of the first unit of its cluster (itself if new).
+    LSH banding keeps this ~O(n): each unit is compared only with the
+    representatives it shares a band bucket with. Distinct units past
+    max_units only cluster with exact (normalized) copies.
+    """
+    n = len(units)
+    if n == 0:
+        return []
+
+    # Units identical after normalization share a cluster without hashing.
+    first_of: Dict[str, int] = {}
+    uniq_units: List[str] = []
+    uniq_first: List[int] = []
+    unit_uniq: List[int] = []
+    for i, u in enumerate(units):
+        norm = _normalize(u)
+        j = first_of.get(norm)
+        if j is None:
+            j = first_of[norm] = len(uniq_units)
+            uniq_units.append(norm)
+            uniq_first.append(i)
+        unit_uniq.append(j)
+
+    uniq_rep = list(range(len(uniq_units)))
+    m = min(len(uniq_units), max_units)
+    sigs = minhash_signatures(uniq_units[:m])
+    bands, rows = lsh_params(threshold)
+    # int keys instead of per-band bytes: a colliding key only adds a
+    # candidate, which the Jaccard check below rejects
+    band_keys = [(sigs[:, b * rows:(b + 1) * rows] * _BAND_MIX[:rows]).sum(axis=1, dtype=np.uint64).tolist()
+                 for b in range(bands)]
+    buckets: List[Dict[int, int]] = [{} for _ in range(bands)]
+
+    for j in range(m):
+        match: Optional[int] = None
+        keys = [band_keys[b][j] for b in range(bands)]
+        for b, key in enumerate(keys):
+            cand = buckets[b].get(key)
+            if cand is None:
+                continue
+            # verify with the estimated Jaccard before merging
+            if np.count_nonzero(sigs[cand] == sigs[j]) >= threshold * NUM_PERM:
+                match = cand
+                break
+        if match is not None:
+            uniq_rep[j] = match
+            continue
+        for b, key in enumerate(keys):
+            buckets[b].setdefault(key, j)
+
+    return [uniq_first[uniq_rep[j]] for j in unit_uniq]
+
+
+def collapse_near_duplicates(
+    units: Sequence[str],
+    threshold: float = NEAR_DUP_THRESHOLD,
+) -> Tuple[List[str], int]:
+    """
+    Keep the first unit of each cluster and tag it with "(+N similar)".
+    Returns (kept units in original order, number of units removed).
+    """
+    if len(units) < 2:
+        return list(units), 0
+
+    # blank units pass through untouched
+    idx = [i for i, u in enumerate(units) if u.strip()]
+    rep_of = list(range(len(units)))
+    for pos, r in enumerate(near_duplicate_clusters([units[i] for i in idx], threshold)):
+        rep_of[idx[pos]] = idx[r]
+
+    extra: Dict[int, int] = {}
+    for i, r in enumerate(rep_of):
+        if r != i:
+            extra[r] = extra.get(r, 0) + 1
+
+    out: List[str] = []
+    for i, u in enumerate(units):
+        if rep_of[i] != i:
+            continue
+        if i in extra:
+            first, sep, rest = u.partition("\n")
+            u = f"{first} (+{extra[i]} similar){sep}{rest}"
+        out.append(u)
+    return out, len(units) - len(out)
+
+
+def log_blocks(lines: Sequence[str]) -> List[str]:
+    """
+    Group log lines into records: a line plus its indented continuation;
+    a traceback also absorbs its final exception line.
+    """
+    blocks: List[List[str]] = []
+    open_traceback = False
+    for ln in lines:
+        indented = ln[:1] in (" ", "\t")
+        if blocks and (indented or open_traceback) and ln.strip():
+            blocks[-1].append(ln)
+            if open_traceback and not indented:
+                open_traceback = False
+            continue
+        blocks.append([ln])
+        open_traceback = ln.lstrip().lower().startswith("traceback")
+    return ["\n".join(b) for b in blocks]
@@ -59,6 +59,22 @@ def _is_probably_logs(text: str) -> Tuple[bool, str]:
     return False, f"weak_signals(level_lines={level_lines}, date={has_date}, time={has_time})"
 
 
+# A one-delimiter table needs a header of short names ("name,age"); prose
+# with one comma per line is not data.
+HEADER_FIELD_MAX_CHARS = 32
+HEADER_FIELD_MAX_WORDS = 2
+
+
+def _header_like(fields: List[str]) -> bool:
+    for f in fields:
+        f = f.strip().strip('"')
+        if not f or len(f) > HEADER_FIELD_MAX_CHARS or len(f.split()) > HEADER_FIELD_MAX_WORDS:
+            return False
+        if f[-1] in ".!?:":
+            return False
+    return True
+
+
 def _is_probably_csv(text: str) -> Tuple[bool, str]:
     t = text.strip()
     if not t:
@@ -87,6 +103,10 @@ def _is_probably_csv(text: str) -> Tuple[bool, str]:
     mn, mx = min(with_delim), max(with_delim)
     if mx - mn > 2:
         return False, f"delimiter_variance_too_high({mn}->{mx})"
+    if mx == 1:
+        header = next(csv.reader([lines[0]], delimiter=delim), [])
+        if not _header_like(header):
+            return False, "two_columns_without_header"
 
     return True, f"dialect_delimiter:{delim!r}"
 
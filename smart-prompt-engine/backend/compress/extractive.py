@@ -0,0 +1,130 @@
+# backend/compress/extractive.py
+from __future__ import annotations
+import hashlib
+import re
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from backend.utils.cache import TTLCache
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+
+# Sentences encoded per chunk; bounds the similarity matrix to CHUNK x CHUNK.
+CHUNK_SENTENCES = 256
+# Candidates carried over from each chunk into the final MMR pass.
+CANDIDATES_PER_CHUNK = 24
+MMR_LAMBDA = 0.7
+MIN_SENTENCE_CHARS = 20
+
+_summary_cache = TTLCache(ttl_seconds=1800, max_items=200)
+
+
+def split_sentences(text: str) -> List[str]:
+    out: List[str] = []
+    for ln in (text or "").splitlines():
+        ln = re.sub(r"\s+", " ", ln).strip()
+        if not ln:
+            continue
+        for s in SENTENCE_SPLIT.split(ln):
+            s = s.strip()
+            if s:
+                out.append(s)
+    return out
+
+
+def _mmr(cand_vecs: np.ndarray, relevance: np.ndarray, k: int, lam: float) -> List[int]:
+    """
+    Maximal marginal relevance as matrix ops: keep a running vector of each
+    candidate's max similarity to the selected set.
+    """
+    m = cand_vecs.shape[0]
+    k = min(k, m)
+    selected: List[int] = []
+    max_sim = np.full(m, -1.0, dtype=np.float32)
+    available = np.ones(m, dtype=bool)
+
+    for _ in range(k):
+        redundancy = np.where(max_sim < 0, 0.0, max_sim)
+        scores = lam * relevance - (1.0 - lam) * redundancy
+        scores = np.where(available, scores, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, cand_vecs @ cand_vecs[best])
+
+    return selected
+
+
+def extract_key_sentences(
+    sentences: List[str],
+    rep: Any,
+    k: int,
+    lam: float = MMR_LAMBDA,
+) -> List[int]:
+    """
+    Pick k central + diverse sentences. Returns indices in MMR pick order
+    (most important first); callers restore original order.
+    """
+    n = len(sentences)
+    if n <= k:
+        return list(range(n))
+
+    cand_idx: List[int] = []
+    cand_vecs: List[np.ndarray] = []
+    centroid_sum: Optional[np.ndarray] = None
+
+    for start in range(0, n, CHUNK_SENTENCES):
+        chunk = sentences[start:start + CHUNK_SENTENCES]
+        vecs = np.asarray(rep.encode_batch(chunk), dtype=np.float32)
+
+        chunk_sum = vecs.sum(axis=0)
+        centroid_sum = chunk_sum if centroid_sum is None else centroid_sum + chunk_sum
+
+        # centrality within the chunk = similarity to the chunk centroid
+        centre = chunk_sum / (np.linalg.norm(chunk_sum) or 1.0)
+        centrality = vecs @ centre
+        lengths = np.fromiter((len(s) for s in chunk), dtype=np.int32, count=len(chunk))
+        centrality = np.where(lengths < MIN_SENTENCE_CHARS, centrality - 1.0, centrality)
+
+        top = np.argsort(-centrality)[:CANDIDATES_PER_CHUNK]
+        cand_idx.extend(int(start + i) for i in top)
+        cand_vecs.append(vecs[top])
+
+    cands = np.vstack(cand_vecs)
+    doc_centre = centroid_sum / (np.linalg.norm(centroid_sum) or 1.0)
+    relevance = cands @ doc_centre
+
+    picked = _mmr(cands, relevance, k, lam)
+    return [cand_idx[i] for i in picked]
+
+
+def _cache_key(text: str, k: int, lam: float) -> str:
+    raw = f"{k}|{lam}|{text}".encode("utf-8", errors="ignore")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def extractive_summary(
+    text: str,
+    rep: Any,
+    max_sentences: int = 12,
+    lam: float = MMR_LAMBDA,
+) -> Tuple[List[str], List[int]]:
+    """
+    Returns (sentences in original order, pick rank of each sentence).
+    Results are cached by content hash.
+    """
+    sentences = split_sentences(text)
+    k = min(max_sentences, max(3, (len(sentences) + 4) // 5))
+
+    key = _cache_key(text, k, lam)
+    cached = _summary_cache.get(key)
+    if cached is not None:
+        return cached
+
+    order = extract_key_sentences(sentences, rep, k, lam)
+    rank = {idx: r for r, idx in enumerate(order)}
+    chosen = sorted(order)
+    result = ([sentences[i] for i in chosen], [rank[i] for i in chosen])
+    _summary_cache.set(key, result)
+    return result
@@ -1,7 +1,12 @@
 # backend/compress/logs.py
 from __future__ import annotations
 import re
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
+
+from backend.compress.alias import apply_aliases
+from backend.compress.dedupe import NEAR_DUP_THRESHOLD, collapse_near_duplicates, log_blocks
+from backend.compress.stacks import FOLD_MARKER, STACK_LINE, fold_stack_traces
+from backend.compress.tokens import count_tokens, fit_lines
 
 
 LOG_LEVEL = re.compile(
@@ -22,6 +27,22 @@ LOG_KEYWORDS = (
 )
 
 
+EXC_LINE = re.compile(r"^\s*[\w.]*(Error|Exception|Exit|Interrupt)\b.*:|^\s*[\w.]*(Error|Exception)\s*$")
+
+
+def _log_line_priority(ln: str) -> int:
+    # Higher = kept longer when fitting a token budget.
+    if EXC_LINE.search(ln):
+        return 4
+    if TRACEBACK.search(ln) or "Exception in ASGI application" in ln:
+        return 3
+    if FILE_LINE.search(ln):
+        return 2
+    if ln.startswith((" ", "\t")):
+        return 1
+    return 0
+
+
 def detect_log_reason(text: str) -> Tuple[bool, str]:
     t = (text or "").strip()
     if not t:
@@ -54,7 +75,12 @@ def looks_like_log(text: str) -> bool:
     return ok
 
 
-def compress_logs(text: str) -> Dict[str, Any]:
+def compress_logs(
+    text: str,
+    target_tokens: Optional[int] = None,
+    near_dup_threshold: Optional[float] = NEAR_DUP_THRESHOLD,
+    aliases: bool = True,
+) -> Dict[str, Any]:
     raw = (text or "").strip()
     if not raw:
         return {
@@ -67,6 +93,18 @@ def compress_logs(text: str) -> Dict[str, Any]:
     lines_in = len(lines)
     chars_in = len(raw)
 
+    stats: Dict[str, Any] = {}
+    if near_dup_threshold:
+        # Repeated-but-not-identical records/tracebacks -> one copy + "(+N similar)"
+        blocks, removed = collapse_near_duplicates(log_blocks(lines), near_dup_threshold)
+        if removed:
+            lines = "\n".join(blocks).splitlines()
+        stats["near_duplicates_removed"] = removed
+
+    # Recursion / framework frames -> "frame × N" and "... N library frames"
+    lines, fold_stats = fold_stack_traces(lines)
+    stats.update(fold_stats)
+
     # Find the first "ERROR" / "Traceback" block start
     start_idx = None
     for i, ln in enumerate(lines):
@@ -87,23 +125,31 @@ def compress_logs(text: str) -> Dict[str, Any]:
             continue
         filtered.append(ln)
 
-    # Keep essential patterns
-    essentials = []
-    for ln in filtered:
+    # Keep essential patterns (by index, so chained blocks keep their order)
+    keep = set()
+    for i, ln in enumerate(filtered):
         if "Exception in ASGI application" in ln:
-            essentials.append(ln)
+            keep.add(i)
         elif "Traceback (most recent call last)" in ln:
-            essentials.append(ln)
+            keep.add(i)
         elif re.search(r'File ".*", line \d+', ln):
-            essentials.append(ln)
+            keep.add(i)
+            # the source line printed under a frame
+            nxt = filtered[i + 1] if i + 1 < len(filtered) else ""
+            if nxt[:1] in (" ", "\t") and nxt.strip() and not FILE_LINE.search(nxt) and not FOLD_MARKER.search(nxt):
+                keep.add(i + 1)
         elif re.search(r"(ModuleNotFoundError|TypeError|ValueError|KeyError|RuntimeError|Exception):", ln):
-            essentials.append(ln)
+            keep.add(i)
+        elif EXC_LINE.search(ln):
+            keep.add(i)
+        elif FOLD_MARKER.search(ln) or STACK_LINE.search(ln):
+            keep.add(i)
         elif ln.strip().startswith(("result =", "await", "raise", "import ")):
-            essentials.append(ln)
+            keep.add(i)
 
     # Add last 10 lines of filtered block as context (often includes cause)
-    tail = filtered[-10:] if len(filtered) > 10 else filtered
-    essentials.extend(tail)
+    keep.update(range(max(0, len(filtered) - 10), len(filtered)))
+    essentials = [filtered[i] for i in sorted(keep)]
 
     # Dedupe (stronger: normalize whitespace)
     seen = set()
@@ -112,13 +158,30 @@ def compress_logs(text: str) -> Dict[str, Any]:
         key = " ".join(ln.strip().split())
         if not key:
             continue
-        if key in seen:
+        # chain structure (Traceback headers, "Caused by:", ...) is never deduped
+        if key in seen and not (TRACEBACK.search(ln) or STACK_LINE.search(ln)):
             continue
         seen.add(key)
         out_lines.append(ln)
 
+    if target_tokens:
+        # Oldest low-priority lines go first; the final exception goes last.
+        prios = [_log_line_priority(ln) for ln in out_lines]
+        kept, tokens_out = fit_lines(out_lines, prios, target_tokens, drop_first="first")
+        stats["dropped_lines"] = len(out_lines) - len(kept)
+        out_lines = [out_lines[i] for i in kept]
+        stats["tokens_in"] = count_tokens(raw)
+        stats["tokens_out"] = tokens_out
+
     compressed = "\n".join(out_lines).strip()
 
+    if aliases:
+        # Repeated paths / package prefixes -> $P1 + legend (only if cheaper)
+        compressed, alias_stats = apply_aliases(compressed)
+        stats.update(alias_stats)
+        if alias_stats["aliases"] and "tokens_out" in stats:
+            stats["tokens_out"] = count_tokens(compressed)
+
     return {
         "detected_type": "logs",
         "compressed": compressed,
@@ -127,5 +190,6 @@ def compress_logs(text: str) -> Dict[str, Any]:
             "lines_out": len(out_lines),
             "chars_in": chars_in,
             "chars_out": len(compressed),
+            **stats,
         }
     }
@@ -0,0 +1,307 @@
+# backend/compress/segment.py
+from __future__ import annotations
+import csv
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.compress.detect import detect_type, _header_like, _is_probably_csv
+from backend.compress.stacks import JAVA_FRAME, PY_FRAME
+from backend.compress.tokens import count_tokens
+
+FENCE = re.compile(r"^\s*```\s*([\w+#.-]*)\s*$")
+TRACEBACK_START = re.compile(r"^\s*(Traceback \(most recent call last\):|Exception in thread\b)")
+CHAIN_LINE = re.compile(
+    r"^\s*(During handling of the above exception|The above exception was the direct cause"
+    r"|Caused by:|Suppressed:|Traceback \(most recent call last\):)"
+)
+MORE_LINE = re.compile(r"^\s*\.\.\. \d+ more\s*$")
+LOG_RECORD = re.compile(
+    r"^\s*(\[?\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}\S*\]?\s+)?\[?(INFO|ERROR|WARN|WARNING|DEBUG|CRITICAL|FATAL)\b"
+)
+CSV_DELIMS = (",", ";", "\t", "|")
+
+FENCE_LANG_TYPES = {
+    "json": "json",
+    "csv": "csv",
+    "tsv": "csv",
+    "log": "logs",
+    "logs": "logs",
+    "console": "logs",
+    "text": "text",
+    "txt": "text",
+    "markdown": "text",
+    "md": "text",
+}
+
+# Short prose (usually the user's actual question) is kept verbatim.
+PROSE_VERBATIM_CHARS = 600
+# Segments above this size are compressed on the shared pool.
+LARGE_SEGMENT_CHARS = 20_000
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="spe-segment")
+
+
+def _segment(kind: str, lines: List[str], start: int, fence_lang: Optional[str] = None) -> Dict[str, Any]:
+    return {"type": kind, "text": "\n".join(lines), "start_line": start, "fence": fence_lang}
+
+
+def _scan_traceback(lines: List[str], i: int) -> int:
+    """
+    Returns the index after the traceback starting at i: frames, source lines,
+    chained blocks and the final exception line of each block.
+    """
+    n = len(lines)
+    j = i + 1
+    after_frames = False
+    while j < n:
+        ln = lines[j]
+        if PY_FRAME.match(ln) or JAVA_FRAME.match(ln) or MORE_LINE.match(ln):
+            after_frames = True
+            j += 1
+        elif CHAIN_LINE.match(ln):
+            after_frames = False
+            j += 1
+        elif ln[:1] in (" ", "\t") and ln.strip():
+            j += 1
+        elif not ln.strip():
+            # blank lines only belong to the trace when a chained block follows
+            k = j
+            while k < n and not lines[k].strip():
+                k += 1
+            if k < n and CHAIN_LINE.match(lines[k]):
+                j = k
+                continue
+            break
+        elif after_frames or j == i + 1:
+            # exception line (or Java's "Exception in thread" header message)
+            j += 1
+            after_frames = False
+        else:
+            break
+    return j
+
+
+# _scan_json: the brackets never balanced before the end of the text
+UNBALANCED = -1
+
+
+def _scan_json(lines: List[str], i: int) -> Optional[int]:
+    """
+    String-aware brace balance from line i. Returns the index after the
+    closing line if the balanced text parses as JSON, None if it balances
+    but does not parse, UNBALANCED if it never balances.
+    """
+    depth = 0
+    in_str = False
+    esc = False
+    for j in range(i, len(lines)):
+        for ch in lines[j]:
+            if in_str:
+                if esc:
+                    esc = False
+                elif ch == "\\":
+                    esc = True
+                elif ch == '"':
+                    in_str = False
+            elif ch == '"':
+                in_str = True
+            elif ch in "{[":
+                depth += 1
+            elif ch in "}]":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        json.loads("\n".join(lines[i:j + 1]))
+                    except Exception:
+                        return None
+                    return j + 1
+    return UNBALANCED
+
+
+def _fields(line: str, delim: str) -> List[str]:
+    # quote-aware: "hello, world" is one field
+    try:
+        return next(csv.reader([line], delimiter=delim))
+    except (csv.Error, StopIteration):
+        return line.split(delim)
+
+
+def _scan_csv(lines: List[str], i: int) -> Tuple[Optional[int], int]:
+    """
+    A run of >= 3 lines whose (quote-aware) field count stays constant, with
+    real column structure: >= 3 fields, or 2 fields under a header-like
+    first row. Returns (end of the run or None, furthest line examined) so
+    the caller does not rescan a rejected run from each of its lines.
+    """
+    first = lines[i]
+    scanned = i + 1
+    for d in CSV_DELIMS:
+        if d not in first:
+            continue
+        head = _fields(first, d)
+        c = len(head)
+        if c < 2:
+            continue
+        j = i + 1
+        while j < len(lines) and lines[j].strip() and len(_fields(lines[j], d)) == c:
+            j += 1
+        if c == 2 and not _header_like(head):
+            # a table may still start further down this run, at its header
+            k = next((k for k in range(i + 1, j) if _header_like(_fields(lines[k], d))), j)
+            scanned = max(scanned, k)
+            continue
+        scanned = max(scanned, j)
+        if j - i < 3:
+            continue
+        ok, _ = _is_probably_csv("\n".join(lines[i:j]))
+        if ok:
+            return j, j
+    return None, scanned
+
+
+def segment_text(text: str) -> List[Dict[str, Any]]:
+    """
+    Split a paste into typed segments at code fences, traceback starts,
+    balanced JSON blobs and delimiter-consistent runs. Remaining prose is
+    typed with detect_type. Single pass (a rejected delimiter run is not
+    rescanned from its later lines), segments in original order.
+    """
+    lines = (text or "").splitlines()
+    n = len(lines)
+    segments: List[Dict[str, Any]] = []
+    prose: List[str] = []
+    prose_start = 0
+    json_possible = True
+    csv_checked_until = 0
+
+    def flush_prose() -> None:
+        if any(ln.strip() for ln in prose):
+            body = "\n".join(prose).strip("\n")
+            kind = detect_type(body).get("type", "text")
+            segments.append({"type": kind, "text": body, "start_line": prose_start, "fence": None})
+        prose.clear()
+
+    i = 0
+    while i < n:
+        ln = lines[i]
+
+        m = FENCE.match(ln)
+        if m:
+            j = i + 1
+            while j < n and not lines[j].strip().startswith("```"):
+                j += 1
+            lang = m.group(1).lower()
+            flush_prose()
+            segments.append(_segment(FENCE_LANG_TYPES.get(lang, "code"), lines[i + 1:j], i + 1, lang or ""))
+            i = j + 1
+            prose_start = i
+            continue
+
+        if TRACEBACK_START.match(ln) or (
+            i + 1 < n and JAVA_FRAME.match(lines[i + 1]) and not JAVA_FRAME.match(ln) and ln.strip()
+        ):
+            j = _scan_traceback(lines, i)
+            flush_prose()
+            segments.append(_segment("logs", lines[i:j], i))
+            i = j
+            prose_start = i
+            continue
+
+        if LOG_RECORD.match(ln) and i + 1 < n and LOG_RECORD.match(lines[i + 1]):
+            j = i + 1
+            while j < n and (LOG_RECORD.match(lines[j]) or (lines[j][:1] in (" ", "\t") and lines[j].strip())):
+                j += 1
+            flush_prose()
+            segments.append(_segment("logs", lines[i:j], i))
+            i = j
+            prose_start = i
+            continue
+
+        if json_possible and ln.lstrip()[:1] in ("{", "["):
+            j = _scan_json(lines, i)
+            if j == UNBALANCED:
+                # every later '{' line would rescan to EOF too
+                json_possible = False
+            elif j is not None:
+                flush_prose()
+                segments.append(_segment("json", lines[i:j], i))
+                i = j
+                prose_start = i
+                continue
+
+        if i >= csv_checked_until and any(d in ln for d in CSV_DELIMS):
+            j, csv_checked_until = _scan_csv(lines, i)
+            if j is not None:
+                flush_prose()
+                segments.append(_segment("csv", lines[i:j], i))
+                i = j
+                prose_start = i
+                continue
+
+        if not prose:
+            prose_start = i
+        prose.append(ln)
+        i += 1
+
+    flush_prose()
+    return segments
+
+
+def compress_segments(
+    segments: List[Dict[str, Any]],
+    compress_one: Callable[[str, str, Optional[int]], Dict[str, Any]],
+    target_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Route every segment to its compressor (large ones concurrently) and
+    reassemble in order. compress_one(kind, text, budget) -> compressor result.
+    """
+    budgets: List[Optional[int]] = [None] * len(segments)
+    if target_tokens:
+        seg_tokens = [max(1, count_tokens(s["text"])) for s in segments]
+        total = sum(seg_tokens)
+        budgets = [max(1, target_tokens * t // total) for t in seg_tokens]
+
+    def run(idx: int) -> Dict[str, Any]:
+        seg = segments[idx]
+        if seg["type"] == "text" and len(seg["text"]) <= PROSE_VERBATIM_CHARS:
+            t = seg["text"]
+            return {"detected_type": "text", "compressed": t,
+                    "stats": {"chars_in": len(t), "chars_out": len(t)}, "note": "kept verbatim"}
+        return compress_one(seg["type"], seg["text"], budgets[idx])
+
+    large = [i for i, s in enumerate(segments) if len(s["text"]) >= LARGE_SEGMENT_CHARS]
+    futures = {i: _pool.submit(run, i) for i in large} if len(large) > 1 else {}
+    results = [futures[i].result() if i in futures else run(i) for i in range(len(segments))]
+
+    parts: List[str] = []
+    seg_stats: List[Dict[str, Any]] = []
+    for seg, res in zip(segments, results):
+        comp = (res.get("compressed") or "").strip("\n") or seg["text"]
+        if len(comp) > len(seg["text"]):
+            comp = seg["text"]
+        if seg["fence"] is not None:
+            comp = f"```{seg['fence']}\n{comp}\n```"
+        parts.append(comp)
+
+        st = dict(res.get("stats") or {})
+        st["type"] = seg["type"]
+        st["start_line"] = seg["start_line"]
+        st["chars_in"] = len(seg["text"])
+        st["chars_out"] = len(comp)
+        if res.get("note"):
+            st["note"] = res["note"]
+        seg_stats.append(st)
+
+    compressed = "\n\n".join(parts)
+    return {
+        "detected_type": "mixed",
+        "compressed": compressed,
+        "stats": {
+            "chars_in": sum(len(s["text"]) for s in segments),
+            "chars_out": len(compressed),
+            "segments": seg_stats,
+        },
+    }
@@ -0,0 +1,398 @@
+# backend/compress/skeleton.py
+from __future__ import annotations
+import ast
+import re
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Bodies containing any of these are kept in full.
+KEEP_MARKERS = re.compile(
+    r"\b(TODO|FIXME|XXX|HACK|BUG)\b|#\s*(bug|error)\b|//\s*(bug|error)\b",
+    re.IGNORECASE,
+)
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+BACKTICKED = re.compile(r"`([^`\n]+)`")
+
+PY_DEF = re.compile(r"^(\s*)(async\s+def|def)\s+\w+")
+PY_HINT = re.compile(r"(?m)^\s*(async\s+def|def|class|import|from)\s+\w+")
+
+# Brace languages: only tokens that matter for block structure.
+BRACE_TOKENS = re.compile(
+    r"//[^\n]*"
+    r"|/\*.*?\*/"
+    r"|\"(?:\\.|[^\"\\\n])*\""
+    r"|'(?:\\.|[^'\\\n])*'"
+    r"|`(?:\\.|[^`\\])*`"
+    r"|[{};\n]",
+    re.DOTALL,
+)
+CONTROL_HEADER = re.compile(
+    r"^(\}\s*)?(if|else|for|foreach|while|switch|do|try|catch|finally|with|synchronized|using|lock)\b"
+)
+CONTAINER_HEADER = re.compile(r"\b(class|interface|struct|namespace|enum|trait|impl)\b")
+FUNCTION_HEADER = re.compile(
+    r"\)\s*(:\s*[\w<>\[\]\.,\s|?&*]+)?\s*(throws\s+[\w.,\s]+)?\s*(const|noexcept|override|final)?\s*$"
+    r"|=>\s*$"
+)
+HEADER_NAME = re.compile(r"([A-Za-z_$][\w$]*)\s*(=\s*(async\s*)?(function\b)?)?\s*\(")
+
+# A "function" spanning most of the file is a wrapper (IIFE, describe(...)),
+# so we look inside it instead of eliding everything.
+WRAPPER_SPAN_RATIO = 0.5
+
+# Replacing a single line with a marker saves nothing.
+MIN_ELIDED_LINES = 2
+
+
+def _strip_fence(text: str) -> str:
+    lines = text.splitlines()
+    if len(lines) >= 2 and lines[0].strip().startswith("```") and lines[-1].strip() == "```":
+        return "\n".join(lines[1:-1])
+    return text
+
+
+def _query_names(query: str, defined: Set[str]) -> Set[str]:
+    """
+    Names from the user's prompt that should pin a body:
+    identifier-looking words (snake_case, camelCase, backticked) and
+    any word that is also a name defined in the code.
+    """
+    q = query or ""
+    names: Set[str] = set()
+    for m in BACKTICKED.finditer(q):
+        names.update(WORD.findall(m.group(1)))
+    for w in WORD.findall(q):
+        if "_" in w or any(ch.isdigit() for ch in w) or re.search(r"[a-z][A-Z]", w):
+            names.add(w)
+        elif w in defined:
+            names.add(w)
+    return {n for n in names if len(n) >= 3}
+
+
+def _relevance_prefix(lines: List[str], names: Set[str]) -> List[int]:
+    """
+    prefix[i] = number of "keep" lines among lines[:i], so any body can be
+    checked in O(1) and the whole file is scanned exactly once.
+    """
+    prefix = [0] * (len(lines) + 1)
+    for i, ln in enumerate(lines):
+        hit = bool(KEEP_MARKERS.search(ln))
+        if not hit and names:
+            hit = not names.isdisjoint(WORD.findall(ln))
+        prefix[i + 1] = prefix[i] + (1 if hit else 0)
+    return prefix
+
+
+def _is_relevant(prefix: List[int], start: int, end: int) -> bool:
+    # start/end are 0-based inclusive line indices
+    return prefix[end + 1] - prefix[start] > 0
+
+
+def _render(lines: List[str], elisions: List[Tuple[int, int, str]]) -> List[str]:
+    """
+    elisions: sorted, non-overlapping (start, end, marker_line) ranges.
+    """
+    out: List[str] = []
+    i = 0
+    k = 0
+    n = len(lines)
+    while i < n:
+        if k < len(elisions) and i == elisions[k][0]:
+            out.append(elisions[k][2])
+            i = elisions[k][1] + 1
+            k += 1
+            continue
+        ln = lines[i]
+        # collapse runs of blank lines
+        if ln.strip() or (out and out[-1].strip()):
+            out.append(ln)
+        i += 1
+    while out and not out[-1].strip():
+        out.pop()
+    return out
+
+
+def _indent_of(line: str) -> str:
+    return line[: len(line) - len(line.lstrip())]
+
+
+# ---------- Python (ast) ----------
+
+def _py_defined_names(tree: ast.AST) -> Set[str]:
+    return {
+        n.name for n in ast.walk(tree)
+        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    }
+
+
+def _py_elisions(tree: ast.Module, lines: List[str], prefix: List[int]) -> Tuple[List[Tuple[int, int, str]], int, int]:
+    elisions: List[Tuple[int, int, str]] = []
+    elided = 0
+    kept = 0
+
+    def visit(body: List[ast.stmt]) -> None:
+        nonlocal elided, kept
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                visit(node.body)
+                continue
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+
+            fn_start = node.lineno - 1
+            fn_end = (node.end_lineno or node.lineno) - 1
+            stmts = node.body
+
+            first = stmts[0]
+            has_doc = (
+                isinstance(first, ast.Expr)
+                and isinstance(getattr(first, "value", None), ast.Constant)
+                and isinstance(first.value.value, str)
+            )
+            if has_doc:
+                if len(stmts) == 1:
+                    continue
+                start = (first.end_lineno or first.lineno)  # line after docstring
+                indent = _indent_of(lines[first.lineno - 1])
+            else:
+                start = first.lineno - 1
+                indent = _indent_of(lines[start])
+
+            # one-line defs (def f(): return x) have nothing to elide
+            if start <= fn_start or start > fn_end:
+                continue
+
+            n = fn_end - start + 1
+            if n < MIN_ELIDED_LINES:
+                continue
+            if _is_relevant(prefix, fn_start, fn_end):
+                kept += 1
+                continue
+
+            elisions.append((start, fn_end, f"{indent}...  # {n} lines elided"))
+            elided += 1
+
+    visit(tree.body)
+    elisions.sort()
+    return elisions, elided, kept
+
+
+def _py_indent_elisions(lines: List[str], prefix: List[int]) -> Tuple[List[Tuple[int, int, str]], int, int]:
+    """
+    Fallback for Python fragments that don't parse: bodies are the lines
+    indented deeper than their `def` line.
+    """
+    elisions: List[Tuple[int, int, str]] = []
+    elided = 0
+    kept = 0
+    n = len(lines)
+    i = 0
+    while i < n:
+        m = PY_DEF.match(lines[i])
+        if not m:
+            i += 1
+            continue
+
+        def_indent = len(m.group(1))
+        fn_start = i
+
+        # signature may span several lines; it ends at the first line ending with ':'
+        j = i
+        while j < n and j - i < 20 and not lines[j].rstrip().endswith(":"):
+            j += 1
+        if j >= n or j - i >= 20:
+            i += 1
+            continue
+
+        body_start = j + 1
+        k = body_start
+        last_body = j
+        while k < n:
+            ln = lines[k]
+            if ln.strip():
+                if len(ln) - len(ln.lstrip()) <= def_indent:
+                    break
+                last_body = k
+            k += 1
+
+        if last_body - body_start + 1 < MIN_ELIDED_LINES:
+            i = body_start
+            continue
+
+        if _is_relevant(prefix, fn_start, last_body):
+            kept += 1
+        else:
+            indent = _indent_of(lines[body_start]) or (" " * (def_indent + 4))
+            cnt = last_body - body_start + 1
+            elisions.append((body_start, last_body, f"{indent}...  # {cnt} lines elided"))
+            elided += 1
+        i = last_body + 1
+
+    return elisions, elided, kept
+
+
+# ---------- Brace languages (JS/TS/Java/C) ----------
+
+def _brace_blocks(text: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    One linear pass over the source. Returns matched blocks in opening order
+    and whether the braces were balanced.
+    """
+    blocks: List[Dict[str, Any]] = []
+    stack: List[int] = []
+    line = 0
+    boundary = 0
+    balanced = True
+
+    for m in BRACE_TOKENS.finditer(text):
+        tok = m.group(0)
+        if tok == "\n":
+            line += 1
+            continue
+        if tok[0] in "/\"'`":
+            line += tok.count("\n")
+            continue
+
+        if tok == "{":
+            header = text[boundary:m.start()].strip()
+            blocks.append({
+                "open": line,
+                "close": None,
+                "header": header,
+                "parent": stack[-1] if stack else None,
+            })
+            stack.append(len(blocks) - 1)
+            boundary = m.end()
+        elif tok == "}":
+            if stack:
+                blocks[stack.pop()]["close"] = line
+            else:
+                balanced = False
+            boundary = m.end()
+        else:  # ';'
+            boundary = m.end()
+
+    if stack:
+        balanced = False
+    return blocks, balanced
+
+
+def _classify_header(header: str) -> str:
+    # keep only the last logical line of the header (comments / decorators above it)
+    h = header.splitlines()[-1].strip() if header else ""
+    if not h:
+        return "other"
+    if CONTROL_HEADER.match(h):
+        return "control"
+    if CONTAINER_HEADER.search(h):
+        return "container"
+    if FUNCTION_HEADER.search(h):
+        return "function"
+    return "other"
+
+
+def _brace_defined_names(blocks: List[Dict[str, Any]]) -> Set[str]:
+    names: Set[str] = set()
+    for b in blocks:
+        h = b["header"].splitlines()[-1] if b["header"] else ""
+        for m in HEADER_NAME.finditer(h):
+            names.add(m.group(1))
+    return names
+
+
+def _brace_elisions(
+    blocks: List[Dict[str, Any]],
+    lines: List[str],
+    prefix: List[int],
+) -> Tuple[List[Tuple[int, int, str]], int, int]:
+    elisions: List[Tuple[int, int, str]] = []
+    elided = 0
+    kept = 0
+    total = max(1, len(lines))
+    # covered[i]: block i sits inside an elided or fully-kept function
+    covered = [False] * len(blocks)
+
+    for idx, b in enumerate(blocks):
+        parent = b["parent"]
+        if parent is not None and covered[parent]:
+            covered[idx] = True
+            continue
+        if b["close"] is None or _classify_header(b["header"]) != "function":
+            continue
+
+        open_line, close_line = b["open"], b["close"]
+        span = close_line - open_line + 1
+        if span / total > WRAPPER_SPAN_RATIO and span > 20:
+            continue  # wrapper: look inside instead
+        if close_line - open_line - 1 < MIN_ELIDED_LINES:
+            continue
+
+        covered[idx] = True
+        if _is_relevant(prefix, open_line, close_line):
+            kept += 1
+            continue
+
+        start, end = open_line + 1, close_line - 1
+        indent = _indent_of(lines[start]) if lines[start].strip() else _indent_of(lines[open_line]) + "    "
+        elisions.append((start, end, f"{indent}/* ... {end - start + 1} lines elided */"))
+        elided += 1
+
+    elisions.sort()
+    return elisions, elided, kept
+
+
+# ---------- Entry point ----------
+
+def skeletonize_code(text: str, query: str = "") -> Optional[Dict[str, Any]]:
+    """
+    Structural skeleton: signatures, docstrings and class members stay,
+    function bodies are elided unless they contain TODO/error markers or
+    names mentioned in `query` (usually the user's prompt).
+
+    Returns None when no strategy applies, so callers can fall back to
+    the line-based compressor.
+    """
+    src = _strip_fence((text or "").strip("\n"))
+    lines = src.splitlines()
+    if not lines:
+        return None
+
+    strategy = ""
+    elisions: List[Tuple[int, int, str]] = []
+    elided = kept = 0
+
+    tree = None
+    if PY_HINT.search(src):
+        try:
+            tree = ast.parse(src)
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            tree = None
+
+    if tree is not None:
+        names = _query_names(query, _py_defined_names(tree))
+        prefix = _relevance_prefix(lines, names)
+        elisions, elided, kept = _py_elisions(tree, lines, prefix)
+        strategy = "python_ast"
+    else:
+        blocks, balanced = _brace_blocks(src) if "{" in src else ([], True)
+        fn_blocks = [b for b in blocks if b["close"] is not None and _classify_header(b["header"]) == "function"]
+        if fn_blocks:
+            names = _query_names(query, _brace_defined_names(blocks))
+            prefix = _relevance_prefix(lines, names)
+            elisions, elided, kept = _brace_elisions(blocks, lines, prefix)
+            strategy = "brace_matcher" if balanced else "brace_matcher_partial"
+        elif any(PY_DEF.match(ln) for ln in lines):
+            defined = {m.group(0).split()[-1] for ln in lines for m in [PY_DEF.match(ln)] if m}
+            prefix = _relevance_prefix(lines, _query_names(query, defined))
+            elisions, elided, kept = _py_indent_elisions(lines, prefix)
+            strategy = "python_indent_fallback"
+
+    if not strategy:
+        return None
+
+    out = _render(lines, elisions)
+    return {
+        "lines": out,
+        "strategy": strategy,
+        "functions_elided": elided,
+        "functions_kept": kept,
+    }
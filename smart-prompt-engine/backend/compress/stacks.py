@@ -0,0 +1,183 @@
+# backend/compress/stacks.py
+from __future__ import annotations
+import re
+from typing import Dict, Any, List, Sequence, Tuple
+
+PY_FRAME = re.compile(r'^\s*File "(?P<file>[^"]*)", line (?P<line>\d+)(, in (?P<func>.*))?\s*$')
+JAVA_FRAME = re.compile(r"^\s*at\s+(?P<where>[A-Za-z0-9_.$<>]+)\(.*\)\s*$")
+CARET_LINE = re.compile(r"^\s*[\^~]+\s*$")
+
+PY_LIBRARY = re.compile(
+    r"(site-packages|dist-packages|/lib/python\d(\.\d+)?/|\\lib\\python\d|<frozen |/usr/lib/python)"
+)
+JAVA_LIBRARY_PREFIXES = (
+    "java.", "javax.", "jdk.", "sun.", "com.sun.", "kotlin.", "kotlinx.", "scala.",
+    "org.springframework.", "org.apache.", "org.hibernate.", "io.netty.",
+    "com.fasterxml.", "org.junit.", "reactor.", "io.reactivex.",
+)
+
+# Lines this module emits that compress_logs must keep.
+FOLD_MARKER = re.compile(r"^\s*(\.\.\. \d+ library frames|\[previous \d+ frames repeated)|\s× \d+$")
+STACK_LINE = re.compile(
+    r"^\s*at\s+[A-Za-z0-9_.$<>]+\(|^\s*Caused by:|^\s*Suppressed:|^\s*\.\.\. \d+ more\s*$"
+    r"|^During handling of the above exception|^The above exception was the direct cause"
+    r"|^\s*\[Previous line repeated"
+)
+
+MAX_CYCLE = 4
+
+
+class _Frame:
+    __slots__ = ("lines", "key", "library", "package")
+
+    def __init__(self, lines: List[str], key: str, library: bool, package: str):
+        self.lines = lines
+        self.key = key
+        self.library = library
+        self.package = package
+
+
+def _py_package(path: str) -> str:
+    p = path.replace("\\", "/")
+    for marker in ("site-packages/", "dist-packages/"):
+        if marker in p:
+            return p.split(marker, 1)[1].split("/", 1)[0].split(".", 1)[0]
+    if "<frozen " in p:
+        return "importlib"
+    return "stdlib"
+
+
+def _java_package(where: str) -> str:
+    parts = where.split(".")
+    return ".".join(parts[:2]) if len(parts) > 2 else where
+
+
+def _fold_repeats(frames: List[_Frame]) -> Tuple[List[List[str]], int]:
+    """
+    Run-length fold of repeated frames (recursion) and short repeated cycles
+    (mutual recursion). Each position is compared at most MAX_CYCLE ** 2
+    times, so this stays linear in the number of frames.
+    """
+    out: List[List[str]] = []
+    folded = 0
+    n = len(frames)
+    i = 0
+    while i < n:
+        best_p, best_r = 1, 1
+        for p in range(1, MAX_CYCLE + 1):
+            if i + 2 * p > n:
+                break
+            r = 1
+            while i + (r + 1) * p <= n and all(
+                frames[i + r * p + k].key == frames[i + k].key for k in range(p)
+            ):
+                r += 1
+            min_r = 2 if p == 1 else 3
+            if r >= min_r and r * p > best_r * best_p:
+                best_p, best_r = p, r
+
+        if best_r == 1:
+            out.append(frames[i].lines)
+            i += 1
+            continue
+
+        folded += (best_r - 1) * best_p
+        if best_p == 1:
+            lines = list(frames[i].lines)
+            lines[0] = f"{lines[0]}  × {best_r}"
+            out.append(lines)
+        else:
+            for k in range(best_p):
+                out.append(frames[i + k].lines)
+            indent = re.match(r"^\s*", frames[i].lines[0]).group(0)
+            out.append([f"{indent}[previous {best_p} frames repeated × {best_r}]"])
+        i += best_r * best_p
+    return out, folded
+
+
+def _fold_block(frames: List[_Frame]) -> Tuple[List[str], Dict[str, int]]:
+    stats = {"frames_in": len(frames), "repeated_folded": 0, "library_collapsed": 0}
+    if not frames:
+        return [], stats
+
+    # Library runs collapse to one line, but the innermost frame (where the
+    # exception was raised) is always kept verbatim.
+    groups: List[Tuple[bool, List[_Frame]]] = []
+    for idx, fr in enumerate(frames):
+        lib = fr.library and idx != len(frames) - 1
+        if groups and groups[-1][0] == lib:
+            groups[-1][1].append(fr)
+        else:
+            groups.append((lib, [fr]))
+
+    out: List[str] = []
+    for lib, run in groups:
+        if lib and len(run) > 1:
+            pkgs: List[str] = []
+            for fr in run:
+                if fr.package not in pkgs:
+                    pkgs.append(fr.package)
+            indent = re.match(r"^\s*", run[0].lines[0]).group(0)
+            out.append(f"{indent}... {len(run)} library frames ({', '.join(pkgs[:4])})")
+            stats["library_collapsed"] += len(run) - 1
+            continue
+        folded, n_folded = _fold_repeats(run)
+        stats["repeated_folded"] += n_folded
+        for lines in folded:
+            out.extend(lines)
+    return out, stats
+
+
+def fold_stack_traces(lines: Sequence[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    One linear pass over log lines. Python (`File "...", line N`) and Java
+    (`at pkg.Class.m(File.java:N)`) frame runs are folded:
+    - repeated frames / cycles -> "frame × N"
+    - consecutive library frames -> "... N library frames (pkg, ...)"
+    - user frames, exception lines and chain separators are kept as-is
+    Everything that is not a frame passes through unchanged.
+    """
+    out: List[str] = []
+    frames: List[_Frame] = []
+    stats: Dict[str, Any] = {"frames_in": 0, "frames_out": 0, "repeated_folded": 0, "library_collapsed": 0}
+
+    def flush() -> None:
+        if not frames:
+            return
+        folded, st = _fold_block(frames)
+        out.extend(folded)
+        stats["frames_in"] += st["frames_in"]
+        stats["repeated_folded"] += st["repeated_folded"]
+        stats["library_collapsed"] += st["library_collapsed"]
+        frames.clear()
+
+    for ln in lines:
+        m = PY_FRAME.match(ln)
+        if m:
+            path = m.group("file")
+            key = f"{path}:{m.group('line')}:{m.group('func') or ''}"
+            frames.append(_Frame([ln], key, bool(PY_LIBRARY.search(path)), _py_package(path)))
+            continue
+
+        m = JAVA_FRAME.match(ln)
+        if m:
+            where = m.group("where")
+            lib = where.startswith(JAVA_LIBRARY_PREFIXES)
+            frames.append(_Frame([ln], ln.strip(), lib, _java_package(where)))
+            continue
+
+        if frames and CARET_LINE.match(ln):
+            continue  # 3.11+ error-position markers add nothing once folded
+
+        # source line printed under a Python frame
+        if frames and len(frames[-1].lines) == 1 and PY_FRAME.match(frames[-1].lines[0]) \
+                and ln[:1] in (" ", "\t") and ln.strip():
+            frames[-1].lines.append(ln)
+            continue
+
+        flush()
+        out.append(ln)
+
+    flush()
+    stats["frames_out"] = stats["frames_in"] - stats["repeated_folded"] - stats["library_collapsed"]
+    return out, stats
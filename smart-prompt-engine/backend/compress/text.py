@@ -1,9 +1,23 @@
 from __future__ import annotations
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from backend.compress.dedupe import NEAR_DUP_THRESHOLD, collapse_near_duplicates
+from backend.compress.extractive import extractive_summary
+from backend.compress.tokens import PINNED, count_tokens, fit_lines
 
-def compress_text(text: str) -> Dict[str, Any]:
+TEXT_MODES = ("bullets", "extractive")
+
+
+def compress_text(
+    text: str,
+    target_tokens: Optional[int] = None,
+    mode: str = "bullets",
+    rep: Any = None,
+    near_dup_threshold: Optional[float] = NEAR_DUP_THRESHOLD,
+) -> Dict[str, Any]:
+    if mode not in TEXT_MODES:
+        raise ValueError(f"unknown text mode {mode!r}; expected one of {', '.join(TEXT_MODES)}")
     raw = (text or "").strip()
     if not raw:
         return {"detected_type": "empty", "compressed": "", "stats": {"chars_in": 0, "chars_out": 0}}
@@ -11,6 +25,12 @@ def compress_text(text: str) -> Dict[str, Any]:
     # Remove extra blank lines
     lines = [ln.strip() for ln in raw.splitlines() if ln.strip()]
 
+    stats: Dict[str, Any] = {}
+    if near_dup_threshold:
+        # Paragraphs that are almost the same -> one copy + "(+N similar)"
+        lines, removed = collapse_near_duplicates(lines, near_dup_threshold)
+        stats["near_duplicates_removed"] = removed
+
     # Keep first line as title if it looks like a heading
     title = lines[0] if len(lines[0]) < 80 else ""
 
@@ -23,7 +43,15 @@ def compress_text(text: str) -> Dict[str, Any]:
 
     # Take top N bullets, plus a note
     max_bullets = 12
-    kept = bullets[:max_bullets]
+
+    if mode == "extractive" and rep is not None:
+        # Most central + diverse sentences from the whole document, original order.
+        body = "\n".join(lines[1:] if title else lines)
+        kept, ranks = extractive_summary(body, rep, max_sentences=max_bullets)
+        stats["strategy"] = "extractive_mmr"
+    else:
+        kept = bullets[:max_bullets]
+        ranks = list(range(len(kept)))
 
     out = []
     if title:
@@ -31,10 +59,27 @@ def compress_text(text: str) -> Dict[str, Any]:
     out.append("Key points:")
     out.extend(f"- {b}" for b in kept)
 
+    if target_tokens:
+        # Title and heading stay; least important (or later) bullets are dropped first.
+        worst = len(ranks)
+        prios = []
+        r = 0
+        for ln in out:
+            if ln.startswith("- ") and r < len(ranks):
+                prios.append(worst - ranks[r])
+                r += 1
+            else:
+                prios.append(PINNED)
+        keep_idx, tokens_out = fit_lines(out, prios, target_tokens, drop_first="last")
+        stats["dropped_lines"] = len(out) - len(keep_idx)
+        out = [out[i] for i in keep_idx]
+        stats["tokens_in"] = count_tokens(raw)
+        stats["tokens_out"] = tokens_out
+
     compressed = "\n".join(out).strip()
 
     return {
         "detected_type": "text",
         "compressed": compressed,
-        "stats": {"chars_in": len(raw), "chars_out": len(compressed)}
+        "stats": {"chars_in": len(raw), "chars_out": len(compressed), **stats}
     }
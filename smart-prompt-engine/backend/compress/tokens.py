@@ -0,0 +1,118 @@
+# backend/compress/tokens.py
+from __future__ import annotations
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.utils.cache import ByteLRUCache
+
+# Rough BPE-like estimate: words split into ~4 char pieces, each symbol is a token.
+_EST_TOKENS = re.compile(r"[A-Za-z]{1,4}|\d{1,3}|[^\sA-Za-z\d]")
+
+# Lines longer than this are counted directly instead of going through the LRU.
+_CACHE_MAX_LEN = 2000
+# The cache keys are the lines themselves, so it is bounded by their size
+# (plus per-entry overhead for the str object and LRU node).
+TOKEN_CACHE_MAX_BYTES = int(float(os.getenv("SPE_TOKEN_CACHE_MB", "8")) * 1024 * 1024)
+_ENTRY_OVERHEAD = 160
+
+# fit_lines priority for lines that are never dropped (legends, headers).
+PINNED = sys.maxsize
+
+_tokenizer: Optional[Any] = None
+_cache = ByteLRUCache(max_bytes=TOKEN_CACHE_MAX_BYTES, size_of=lambda n: 0)
+_stats: Dict[str, Any] = {"fallbacks": 0, "last_fallback_error": None}
+
+
+def set_tokenizer(tokenizer: Any) -> None:
+    """
+    Use a real tokenizer (e.g. the all-MiniLM tokenizer loaded by
+    sentence-transformers: `rep.model.tokenizer`) for token counts.
+    """
+    global _tokenizer, _cache
+    _tokenizer = tokenizer
+    _cache = ByteLRUCache(max_bytes=TOKEN_CACHE_MAX_BYTES, size_of=lambda n: 0)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_EST_TOKENS.findall(text or ""))
+
+
+def _count_uncached(text: str) -> Tuple[int, bool]:
+    """
+    (count, exact). A tokenizer error falls back to the estimate, which is
+    counted and never cached, so the next call tries the tokenizer again.
+    """
+    if _tokenizer is None:
+        return estimate_tokens(text), True
+    try:
+        return len(_tokenizer.encode(text, add_special_tokens=False)), True
+    except Exception as e:
+        _stats["fallbacks"] += 1
+        _stats["last_fallback_error"] = f"{type(e).__name__}: {e}"
+        return estimate_tokens(text), False
+
+
+def count_tokens(text: str) -> int:
+    t = text or ""
+    if not t:
+        return 0
+    if len(t) > _CACHE_MAX_LEN:
+        return _count_uncached(t)[0]
+    cache = _cache
+    n = cache.get(t)
+    if n is None:
+        n, exact = _count_uncached(t)
+        if exact:
+            cache.set(t, n, size=len(t) + _ENTRY_OVERHEAD)
+    return n
+
+
+def token_count_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "tokenizer": type(_tokenizer).__name__ if _tokenizer is not None else None,
+        "cache_items": len(_cache.store),
+        "cache_bytes": _cache.bytes,
+        "cache_max_bytes": _cache.max_bytes,
+        "cache_evictions": _cache.evictions,
+    }
+
+
+def fit_lines(
+    lines: Sequence[str],
+    priorities: Sequence[int],
+    target_tokens: int,
+    drop_first: str = "last",
+    reserve_tokens: int = 0,
+) -> Tuple[List[int], int]:
+    """
+    Drop lowest-priority lines until the rest fits in target_tokens.
+    Every line is counted once; the running total is updated as lines go,
+    so the output is never re-tokenized.
+
+    drop_first: among equal priorities, drop "last" or "first" lines first.
+    Lines with priority PINNED are kept even if the result stays over budget.
+    Returns (kept line indices in original order, tokens of the kept lines).
+    """
+    counts = [count_tokens(ln) for ln in lines]
+    total = sum(counts)
+    budget = max(0, target_tokens - reserve_tokens)
+    if total <= budget:
+        return list(range(len(lines))), total
+
+    if drop_first == "first":
+        order = sorted(range(len(lines)), key=lambda i: (priorities[i], i))
+    else:
+        order = sorted(range(len(lines)), key=lambda i: (priorities[i], -i))
+
+    dropped = set()
+    for i in order:
+        if total <= budget or priorities[i] >= PINNED:
+            break
+        dropped.add(i)
+        total -= counts[i]
+
+    kept = [i for i in range(len(lines)) if i not in dropped]
+    return kept, total
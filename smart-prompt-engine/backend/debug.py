@@ -0,0 +1,152 @@
+# backend/debug.py
+"""
+On-demand diagnostics for live workers (no py-spy needed):
+
+- sample_stacks: polls sys._current_frames() at `hz` for `seconds` and
+  returns collapsed stacks ("thread;outer;...;inner count"), ready for
+  flamegraph.pl / speedscope. Nothing runs between sessions, so idle
+  overhead is zero.
+- tracemalloc_diff: traces allocations for `seconds` and returns the top
+  allocation sites by size growth.
+
+Both are exposed by /debug/* endpoints only when SPE_DEBUG_ENDPOINTS=1,
+and additionally require X-SPE-Debug-Token when SPE_DEBUG_TOKEN is set.
+"""
+from __future__ import annotations
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+MAX_SECONDS = 60.0
+MAX_HZ = 1000
+MAX_TRACE_FRAMES = 25
+
+# One profiling session at a time per worker.
+_session_lock = threading.Lock()
+_THREAD_SUFFIX = re.compile(r"[_-]?\d+$")
+
+
+def debug_enabled() -> bool:
+    return os.getenv("SPE_DEBUG_ENDPOINTS", "").strip().lower() in ("1", "true", "yes")
+
+
+def token_ok(token: Optional[str]) -> bool:
+    expected = os.getenv("SPE_DEBUG_TOKEN", "")
+    if not expected:
+        return True
+    return hmac.compare_digest(expected, token or "")
+
+
+def _frame_label(frame, with_lines: bool) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    where = "/".join(parts[-2:])
+    if with_lines:
+        return f"{code.co_name} ({where}:{frame.f_lineno})"
+    return f"{code.co_name} ({where})"
+
+
+def _thread_names() -> Dict[int, str]:
+    # pool threads are numbered (spe-encode_3); group them per pool
+    return {t.ident: _THREAD_SUFFIX.sub("", t.name) for t in threading.enumerate() if t.ident is not None}
+
+
+class Busy(Exception):
+    pass
+
+
+def sample_stacks(seconds: float = 10.0, hz: int = 100, with_lines: bool = False,
+                  idle: bool = False) -> Dict[str, Any]:
+    """
+    Collapsed-stack profile of every other thread. Threads parked in
+    wait/select/sleep are skipped unless idle=True.
+    """
+    seconds = max(0.1, min(MAX_SECONDS, seconds))
+    hz = max(1, min(MAX_HZ, hz))
+    if not _session_lock.acquire(blocking=False):
+        raise Busy("another profiling session is running")
+    try:
+        me = threading.get_ident()
+        interval = 1.0 / hz
+        stacks: Counter = Counter()
+        names = _thread_names()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        next_t = time.monotonic()
+        while time.monotonic() < deadline:
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                if not idle and frame.f_code.co_name in ("wait", "select", "poll", "sleep", "_worker", "accept"):
+                    continue
+                chain: List[str] = []
+                f = frame
+                while f is not None:
+                    chain.append(_frame_label(f, with_lines))
+                    f = f.f_back
+                if tid not in names:
+                    names = _thread_names()
+                chain.append(names.get(tid, f"thread-{tid}"))
+                stacks[";".join(reversed(chain))] += 1
+            samples += 1
+            next_t += interval
+            time.sleep(max(0.0, next_t - time.monotonic()))
+    finally:
+        _session_lock.release()
+
+    collapsed = "\n".join(f"{k} {v}" for k, v in stacks.most_common())
+    return {"seconds": seconds, "hz": hz, "samples": samples, "collapsed": collapsed}
+
+
+def tracemalloc_diff(seconds: float = 10.0, top: int = 25, frames: int = 5,
+                     key_type: str = "lineno") -> Dict[str, Any]:
+    """
+    Snapshot, wait, snapshot again and diff: top allocation sites by size
+    growth over the window. Tracing is stopped afterwards unless it was
+    already running (it slows every allocation down noticeably).
+    """
+    seconds = max(0.1, min(MAX_SECONDS, seconds))
+    frames = max(1, min(MAX_TRACE_FRAMES, frames))
+    key_type = key_type if key_type in ("lineno", "filename", "traceback") else "lineno"
+    if not _session_lock.acquire(blocking=False):
+        raise Busy("another profiling session is running")
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        if not was_tracing:
+            tracemalloc.start(frames)
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+        before = tracemalloc.take_snapshot().filter_traces(filters)
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+        _session_lock.release()
+
+    stats = after.compare_to(before, key_type)
+    return {
+        "seconds": seconds,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [
+            {
+                "size_diff_bytes": st.size_diff,
+                "size_bytes": st.size,
+                "count_diff": st.count_diff,
+                "count": st.count,
+                "traceback": [f"{fr.filename}:{fr.lineno}" for fr in st.traceback],
+            }
+            for st in stats[:max(1, top)]
+        ],
+    }
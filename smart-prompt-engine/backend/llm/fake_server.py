@@ -0,0 +1,297 @@
+# backend/llm/fake_server.py
+"""
+Local stand-in for the OpenAI chat.completions API (stdlib only).
+
+    python -m backend.llm.fake_server --port 8099 --latency lognormal:800:0.4 \\
+        --error-rate 0.02 --rate-limit-rate 0.01 --max-rps 50
+
+    SPE_LLM_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake uvicorn backend.api:app
+
+With response_format=json_object it answers the rewrite USER_TEMPLATE
+contract (provided_info / missing_info / rewrite_cards / intent), derived
+deterministically from the prompt so the post-processing sees realistic
+input. Plain requests (GapReasoner) get a short text answer.
+
+Latency specs: fixed:MS | uniform:LO_MS:HI_MS | lognormal:MEDIAN_MS:SIGMA.
+Failure injection: --error-rate (500), --rate-limit-rate (429 with
+Retry-After), --max-rps (429 above that rate), --stall-rate (hangs for
+--stall-s, to exercise client deadlines). POST /_config changes any of
+these at runtime; GET /_stats returns counters.
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_PROMPT_RE = re.compile(r"User prompt:\n(.*?)\n\nReturn ONLY JSON", re.S)
+# "- field: ____" lines and inline "Fill these: a: ____, b: ____"
+_BLANK_RE = re.compile(r"([A-Za-z][\w/-]*(?: [\w/-]+){0,3})\s*:\s*_{3,}")
+_MONEY_RE = re.compile(r"[$€£₹]\s?\d[\d,]*(?:\.\d+)?|\b\d[\d,]*\s?(?:usd|dollars|rs|inr|eur)\b", re.I)
+
+INTENT_RULES: List[Tuple[str, re.Pattern]] = [
+    ("debugging", re.compile(r"\b(bugs?|errors?|exceptions?|traceback|fix\w*|crash\w*|fail\w*|broken)\b", re.I)),
+    ("decision", re.compile(r"\b(should i|best|which|vs\.?|recommend|suggest|compare|choose)\b", re.I)),
+    ("estimation", re.compile(r"\b(how much|how long|how many|estimate|cost)\b", re.I)),
+    ("instruction", re.compile(r"\b(how (do|to|can)|steps?|step by step|guide|write|create|build)\b", re.I)),
+    ("explanation", re.compile(r"\b(why|explain|what is|what are|difference)\b", re.I)),
+]
+
+# intent -> [(field, example, optional)]
+FIELDS: Dict[str, List[Tuple[str, str, bool]]] = {
+    "debugging": [("language_version", "Python 3.11", False), ("error_message", "TypeError: ...", False),
+                  ("expected_behavior", "returns a list", False), ("what_you_tried", "pinned the dependency", False),
+                  ("environment", "macOS 14, venv", True), ("code_snippet", "minimal repro", True)],
+    "decision": [("budget_max", "$500", False), ("region", "USA", False), ("priorities", "battery, camera", False),
+                 ("must_haves", "5G, 128GB", False), ("timeline", "this month", True), ("brand_preference", "none", True)],
+    "estimation": [("scope", "3-page site", False), ("region", "USA", False), ("quality_level", "production", False),
+                   ("timeline", "6 weeks", True)],
+    "instruction": [("skill_level", "beginner", False), ("tools_available", "stove, pan", False),
+                    ("output_format", "numbered steps", False), ("time_limit", "30 min", True)],
+    "explanation": [("audience_level", "high school", False), ("depth", "short overview", False),
+                    ("examples_wanted", "yes, 2", True)],
+    "other": [("goal", "what you want out of this", False), ("context", "who it is for", False),
+              ("constraints", "length, tone", False), ("output_format", "bullet list", True)],
+}
+
+
+def _intent(prompt: str) -> str:
+    for name, rx in INTENT_RULES:
+        if rx.search(prompt):
+            return name
+    return "other"
+
+
+def _mentioned(prompt: str, field: str) -> bool:
+    low = prompt.lower()
+    if field == "budget_max" and _MONEY_RE.search(prompt):
+        return True
+    return any(w in low for w in field.split("_") if len(w) > 3)
+
+
+def rewrite_payload(prompt: str) -> Dict[str, Any]:
+    """
+    Schema-valid answer for the rewrite USER_TEMPLATE contract.
+    """
+    rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+    intent = _intent(prompt)
+    first_line = next((ln.strip() for ln in prompt.splitlines() if ln.strip()), prompt.strip())
+    first_line = re.split(r"\s*fill these", first_line, flags=re.I)[0][:240]
+
+    provided = []
+    money = _MONEY_RE.search(prompt)
+    if money:
+        provided.append({"field": "budget_max", "value": money.group(0), "evidence": money.group(0)})
+
+    blanks = [b.strip().replace(" ", "_").replace("/", "_").lower() for b in _BLANK_RE.findall(prompt)]
+    if "fill these" in prompt.lower():
+        # only fields still blank
+        missing = [{"field": f, "why": "still blank", "example": "...", "evidence": "not mentioned",
+                    "optional": False} for f in blanks[:4]]
+    else:
+        candidates = [f for f in FIELDS[intent] if not _mentioned(prompt, f[0])]
+        required = [f for f in candidates if not f[2]][:rng.randint(2, 4)]
+        optional = [f for f in candidates if f[2]][:rng.randint(0, 2)]
+        missing = [{"field": f, "why": f"needed to tailor the answer ({intent})", "example": ex,
+                    "evidence": "not mentioned", "optional": opt} for f, ex, opt in required + optional]
+
+    def card(lead: str) -> str:
+        req = [m for m in missing if not m["optional"]]
+        opt = [m for m in missing if m["optional"]]
+        req_lines = "\n".join(f"- {m['field']}: ____ ({m['example']})" for m in req) or "- none ✅"
+        opt_lines = "\n".join(f"- {m['field']}: ____ ({m['example']})" for m in opt) or "- none"
+        return f"{lead}{first_line}\n\nFill these (required):\n{req_lines}\n\nFill these (optional):\n{opt_lines}"
+
+    return {
+        "provided_info": provided,
+        "missing_info": missing,
+        "rewrite_cards": [card(""), card("Please help: "), card("Step by step, ")],
+        "intent": intent,
+    }
+
+
+def text_payload(prompt: str) -> str:
+    fields = [f for f, _, opt in FIELDS[_intent(prompt)] if not opt and not _mentioned(prompt, f)]
+    return "Missing: " + ", ".join(f.replace("_", " ") for f in fields[:3]) + "."
+
+
+class FakeConfig:
+    def __init__(self, latency: str = "lognormal:600:0.4", error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after_s: float = 1.0, max_rps: float = 0.0,
+                 stall_rate: float = 0.0, stall_s: float = 60.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_s = retry_after_s
+        self.max_rps = max_rps
+        self.stall_rate = stall_rate
+        self.stall_s = stall_s
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = max_rps
+        self._refill_at = time.monotonic()
+        self.stats: Dict[str, int] = {"requests": 0, "ok": 0, "error_500": 0, "rate_limited": 0, "stalled": 0}
+
+    def update(self, **kw: Any) -> None:
+        for k, v in kw.items():
+            if k in ("latency",):
+                setattr(self, k, str(v))
+            elif k in ("error_rate", "rate_limit_rate", "retry_after_s", "max_rps", "stall_rate", "stall_s"):
+                setattr(self, k, float(v))
+
+    def sample_latency_s(self) -> float:
+        kind, *args = self.latency.split(":")
+        a = [float(x) for x in args]
+        with self._lock:
+            if kind == "fixed":
+                ms = a[0]
+            elif kind == "uniform":
+                ms = self.rng.uniform(a[0], a[1])
+            elif kind == "lognormal":
+                ms = a[0] * math.exp(self.rng.gauss(0, a[1] if len(a) > 1 else 0.5))
+            else:
+                raise ValueError(f"unknown latency spec: {self.latency}")
+        return max(0.0, ms) / 1000
+
+    def over_rate(self) -> bool:
+        if self.max_rps <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_rps, self._tokens + (now - self._refill_at) * self.max_rps)
+            self._refill_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return False
+            return True
+
+    def roll(self, p: float) -> bool:
+        with self._lock:
+            return p > 0 and self.rng.random() < p
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+
+def make_handler(cfg: FakeConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, as the SDK's httpx client expects
+        # headers and body go out in separate writes; without this, Nagle +
+        # delayed ACK add ~40 ms to every response
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status: int, message: str, etype: str, code: str,
+                   headers: Optional[Dict[str, str]] = None) -> None:
+            self._send(status, {"error": {"message": message, "type": etype, "code": code, "param": None}}, headers)
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") == "/_stats":
+                self._send(200, {**cfg.stats, "config": {k: v for k, v in vars(cfg).items()
+                                                          if not k.startswith("_") and k not in ("rng", "stats")}})
+            else:
+                self._error(404, "not found", "invalid_request_error", "not_found")
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._error(400, "invalid JSON body", "invalid_request_error", "invalid_json")
+
+            if self.path.rstrip("/") == "/_config":
+                cfg.update(**body)
+                return self._send(200, {"ok": True})
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._error(404, "not found", "invalid_request_error", "not_found")
+
+            cfg.count("requests")
+            if cfg.over_rate() or cfg.roll(cfg.rate_limit_rate):
+                cfg.count("rate_limited")
+                return self._error(429, "Rate limit reached (fake server)", "requests", "rate_limit_exceeded",
+                                   {"Retry-After": f"{cfg.retry_after_s:g}"})
+            if cfg.roll(cfg.stall_rate):
+                cfg.count("stalled")
+                time.sleep(cfg.stall_s)
+            else:
+                time.sleep(cfg.sample_latency_s())
+            if cfg.roll(cfg.error_rate):
+                cfg.count("error_500")
+                return self._error(500, "The server had an error (fake server)", "server_error", "server_error")
+
+            messages = body.get("messages") or []
+            user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+            if (body.get("response_format") or {}).get("type") == "json_object":
+                m = _PROMPT_RE.search(user)
+                content = json.dumps(rewrite_payload(m.group(1) if m else user), ensure_ascii=False)
+            else:
+                content = text_payload(user)
+
+            cfg.count("ok")
+            self._send(200, {
+                "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "system_fingerprint": "fake",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop", "logprobs": None}],
+                "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(user) + len(content)) // 4},
+            })
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8099, cfg: Optional[FakeConfig] = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(cfg or FakeConfig()))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fake OpenAI-compatible chat.completions server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency", default="lognormal:600:0.4")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0)
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    ap.add_argument("--max-rps", type=float, default=0.0)
+    ap.add_argument("--stall-rate", type=float, default=0.0)
+    ap.add_argument("--stall-s", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+    cfg = FakeConfig(args.latency, args.error_rate, args.rate_limit_rate, args.retry_after, args.max_rps,
+                     args.stall_rate, args.stall_s, args.seed)
+    cfg.sample_latency_s()  # validate the spec early
+    server = serve(args.host, args.port, cfg)
+    print(f"[fake-openai] http://{args.host}:{args.port}/v1  latency={args.latency}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
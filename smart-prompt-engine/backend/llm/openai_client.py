@@ -1,8 +1,12 @@
 # backend/llm/openai_client.py
 from __future__ import annotations
+import json
 import os
 from typing import Optional, Any, Dict
 
+from backend.llm.resilience import ResilienceConfig, ResilientCaller, UpstreamError
+from backend.metrics import stage
+
 try:
     from openai import OpenAI
 except Exception:
@@ -13,8 +17,17 @@ class LLMError(Exception):
     pass
 
 
+class LLMTimeout(LLMError):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """Circuit breaker is open: the upstream failed repeatedly."""
+
+
 class OpenAITextClient:
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini",
+                 base_url: Optional[str] = None, resilience: Optional[ResilienceConfig] = None):
         if OpenAI is None:
             raise LLMError(
                 "openai package not installed. Run: pip install openai")
@@ -36,14 +49,21 @@ class OpenAITextClient:
                 "OPENAI_API_KEY contains non-ASCII characters. Remove quotes/smart quotes and keep only the raw key."
             ) from e
 
-        self.client = OpenAI(api_key=key)
+        # SPE_LLM_BASE_URL points the client at a local OpenAI-compatible
+        # server (tests, load tests). Retries are ours, not the SDK's.
+        base_url = base_url or os.getenv("SPE_LLM_BASE_URL") or None
+        self.client = OpenAI(api_key=key, base_url=base_url, max_retries=0)
         self.model = model
+        self.resilient = ResilientCaller(resilience or ResilienceConfig.from_env(), name="openai")
 
-    def complete_json(self, system: str, user: str, temperature: float = 0.3, max_tokens: int = 700) -> Dict[str, Any]:
+    def complete_json(self, system: str, user: str, temperature: float = 0.3, max_tokens: int = 700,
+                      deadline_s: Optional[float] = None) -> Dict[str, Any]:
         """
-        Forces valid JSON output using response_format=json_object
+        Forces valid JSON output using response_format=json_object.
+        Retries, hedging and the circuit breaker are applied per
+        ResilienceConfig; deadline_s bounds the whole call.
         """
-        try:
+        def attempt(timeout_s: float) -> Dict[str, Any]:
             resp = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -53,9 +73,42 @@ class OpenAITextClient:
                 temperature=temperature,
                 max_tokens=max_tokens,
                 response_format={"type": "json_object"},  # key fix
+                timeout=timeout_s,
             )
             content = resp.choices[0].message.content or "{}"
-            import json
             return json.loads(content)
+
+        return self._call(attempt, deadline_s)
+
+    def complete_text(self, system: str, user: str, temperature: float = 0.2, max_tokens: int = 150,
+                      deadline_s: Optional[float] = None) -> str:
+        """
+        Plain-text completion with the same retry / breaker policy.
+        """
+        def attempt(timeout_s: float) -> str:
+            resp = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout_s,
+            )
+            return (resp.choices[0].message.content or "").strip()
+
+        return self._call(attempt, deadline_s)
+
+    def _call(self, attempt, deadline_s: Optional[float]) -> Any:
+        try:
+            with stage("llm_call"):
+                return self.resilient.call(attempt, deadline_s)
+        except UpstreamError as e:
+            if e.kind == "unavailable":
+                raise LLMUnavailable(str(e)) from e
+            if e.kind == "timeout":
+                raise LLMTimeout(str(e)) from e
+            raise LLMError(str(e)) from e
         except Exception as e:
             raise LLMError(str(e)) from e
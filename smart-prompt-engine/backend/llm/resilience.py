@@ -0,0 +1,277 @@
+# backend/llm/resilience.py
+"""
+Fail-fast policy around a single upstream call:
+
+- deadline: the whole call (all attempts, backoff included) must finish
+  within deadline_s; each attempt gets min(attempt_timeout_s, remaining).
+- retries: only retryable failures (timeouts, connection errors, 408/409/
+  429/5xx), with full-jitter exponential backoff; Retry-After is honoured
+  when it still fits the deadline.
+- hedging (optional): if an attempt is still running after the recent p95
+  latency, a second identical request is sent and the first success wins.
+  Capped at hedge_max_ratio of calls.
+- circuit breaker: after `failure_threshold` consecutive upstream failures
+  calls fail immediately for `reset_timeout_s`, then one probe is let
+  through (half-open).
+
+Attempt latency and outcome are recorded in backend.metrics.
+"""
+from __future__ import annotations
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from backend.metrics import LLM_ATTEMPT_HISTOGRAM, LLM_CALL_COUNTER, registry
+from backend.tracing import span
+
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_NAMES = ("Timeout", "APITimeoutError", "APIConnectionError", "ConnectionError", "ReadTimeout")
+MIN_ATTEMPT_S = 0.2
+LATENCY_SAMPLES = 200
+MIN_HEDGE_SAMPLES = 20
+
+_hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="spe-llm-hedge")
+
+
+class UpstreamError(Exception):
+    """
+    Raised by the resilient caller; `kind` is timeout | unavailable |
+    retryable | fatal.
+    """
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+@dataclass
+class ResilienceConfig:
+    deadline_s: float = 20.0
+    attempt_timeout_s: float = 10.0
+    max_attempts: int = 3
+    backoff_base_s: float = 0.25
+    backoff_max_s: float = 2.0
+    hedge: bool = False
+    hedge_min_delay_s: float = 0.3
+    hedge_max_ratio: float = 0.1
+    failure_threshold: int = 5
+    reset_timeout_s: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "ResilienceConfig":
+        env = os.getenv
+        return cls(
+            deadline_s=float(env("SPE_LLM_DEADLINE_S", cls.deadline_s)),
+            attempt_timeout_s=float(env("SPE_LLM_ATTEMPT_TIMEOUT_S", cls.attempt_timeout_s)),
+            max_attempts=int(env("SPE_LLM_MAX_ATTEMPTS", cls.max_attempts)),
+            hedge=env("SPE_LLM_HEDGE", "").strip().lower() in ("1", "true", "yes"),
+            failure_threshold=int(env("SPE_LLM_BREAKER_FAILURES", cls.failure_threshold)),
+            reset_timeout_s=float(env("SPE_LLM_BREAKER_RESET_S", cls.reset_timeout_s)),
+        )
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if getattr(exc, "code", None) == "insufficient_quota" or "insufficient_quota" in str(exc):
+        return False  # a 429 that no retry will fix
+    status = status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(exc, (TimeoutError, ConnectionError)) or any(
+        n in type(exc).__name__ for n in RETRYABLE_NAMES
+    )
+
+
+def retry_after_s(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe_out = False
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                self.state = "half_open"
+                self._probe_out = False
+            if self.state == "half_open":
+                now = time.monotonic()
+                # a probe that never reported back is treated as lost
+                if not self._probe_out or now - self._probe_at >= self.reset_timeout_s:
+                    self._probe_out = True
+                    self._probe_at = now
+                    return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_out = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_out = False
+
+
+class ResilientCaller:
+    def __init__(self, config: Optional[ResilienceConfig] = None, name: str = "openai"):
+        self.config = config or ResilienceConfig()
+        self.name = name
+        self.breaker = CircuitBreaker(self.config.failure_threshold, self.config.reset_timeout_s)
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._keys: Dict[str, Any] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # -------- metrics --------
+
+    def _record(self, outcome: str, seconds: Optional[float] = None) -> None:
+        keys = self._keys.get(outcome)
+        if keys is None:
+            labels = f'upstream="{self.name}",outcome="{outcome}"'
+            keys = self._keys[outcome] = ((LLM_CALL_COUNTER, labels), (LLM_ATTEMPT_HISTOGRAM, labels))
+        registry.inc(keys[0])
+        if seconds is not None:
+            registry.observe(keys[1], seconds)
+
+    def p95_s(self) -> Optional[float]:
+        lat = sorted(self._latencies)
+        if len(lat) < MIN_HEDGE_SAMPLES:
+            return None
+        return lat[int(0.95 * (len(lat) - 1))]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95_s()
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "consecutive_failures": self.breaker.failures,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+    # -------- calls --------
+
+    def _attempt(self, fn: Callable[[float], Any], timeout_s: float, hedge: bool) -> Any:
+        t0 = time.monotonic()
+        with span("llm_attempt", hedge=hedge):
+            try:
+                result = fn(timeout_s)
+            except BaseException as e:
+                self._record("retryable" if is_retryable(e) else "fatal", time.monotonic() - t0)
+                raise
+        dt = time.monotonic() - t0
+        self._latencies.append(dt)
+        self._record("ok", dt)
+        return result
+
+    def _hedged(self, fn: Callable[[float], Any], timeout_s: float) -> Any:
+        delay = self.p95_s()
+        budget_ok = self.hedges < self.config.hedge_max_ratio * max(1, self.calls)
+        if delay is None or not budget_ok:
+            return self._attempt(fn, timeout_s, False)
+        delay = max(self.config.hedge_min_delay_s, delay)
+        if delay >= timeout_s:
+            return self._attempt(fn, timeout_s, False)
+
+        primary = _hedge_pool.submit(contextvars.copy_context().run, self._attempt, fn, timeout_s, False)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self.hedges += 1
+        backup = _hedge_pool.submit(contextvars.copy_context().run, self._attempt, fn, timeout_s - delay, True)
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=timeout_s, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                if fut.exception() is None:
+                    if fut is backup:
+                        self.hedge_wins += 1
+                    return fut.result()
+                error = fut.exception()
+        raise error or TimeoutError("hedged attempts timed out")
+
+    def call(self, fn: Callable[[float], Any], deadline_s: Optional[float] = None) -> Any:
+        """
+        fn(timeout_s) performs one upstream request and returns the result.
+        """
+        cfg = self.config
+        self.calls += 1
+        deadline = time.monotonic() + (cfg.deadline_s if deadline_s is None else deadline_s)
+        last: Optional[BaseException] = None
+        for attempt in range(cfg.max_attempts):
+            # deadline first: a half-open probe granted to a call that then
+            # skips its attempt would never be recorded
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_ATTEMPT_S:
+                break
+            if not self.breaker.allow():
+                self._record("circuit_open")
+                raise UpstreamError("unavailable", f"{self.name} circuit open after repeated failures; failing fast")
+            timeout_s = min(cfg.attempt_timeout_s, remaining)
+            try:
+                if cfg.hedge:
+                    result = self._hedged(fn, timeout_s)
+                else:
+                    result = self._attempt(fn, timeout_s, False)
+            except BaseException as e:
+                last = e
+                if not is_retryable(e):
+                    # the upstream answered; it is healthy, the request is not
+                    self.breaker.record_success()
+                    raise UpstreamError("fatal", str(e)) from e
+                self.breaker.record_failure()
+                backoff = random.uniform(0, min(cfg.backoff_max_s, cfg.backoff_base_s * 2 ** attempt))
+                backoff = max(backoff, retry_after_s(e) or 0.0)
+                if attempt + 1 >= cfg.max_attempts or time.monotonic() + backoff + MIN_ATTEMPT_S > deadline:
+                    break
+                time.sleep(backoff)
+                continue
+            self.breaker.record_success()
+            return result
+
+        if last is None:
+            self._record("deadline")
+            raise UpstreamError("timeout", f"{self.name} deadline exceeded")
+        kind = "timeout" if isinstance(last, TimeoutError) or "Timeout" in type(last).__name__ else "retryable"
+        raise UpstreamError(kind, f"{self.name} failed after retries: {last}") from last
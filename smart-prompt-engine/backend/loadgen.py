@@ -0,0 +1,254 @@
+# backend/loadgen.py
+"""
+End-to-end load generator for a running backend (stdlib HTTP client).
+
+    # upstream stand-in, then the API pointed at it
+    python -m backend.llm.fake_server --latency lognormal:700:0.5 --error-rate 0.01
+    SPE_LLM_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake python -m backend.serve --workers 2
+
+    python -m backend.loadgen --duration 60 --concurrency 32 --mix score=70,compress=10,rewrite=20 \\
+        --corpus backend/storage/feedback.jsonl --corpus ../requests.jsonl
+
+Prompts are replayed from the corpora (.jsonl rows with a prompt/body/text
+field, or plain text lines). /score is driven the way the extension does
+it: each simulated user types a prompt a few words per request under its
+own X-SPE-User. /compress gets synthetic log, traceback and JSON pastes.
+
+Closed loop by default (--concurrency workers back to back). With --rate
+arrivals are open loop (Poisson) and latency is measured from the
+scheduled start, so queueing in the client is not hidden.
+"""
+from __future__ import annotations
+import argparse
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from backend.compress.bench import synthetic_log_lines, synthetic_traceback_corpus
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "storage" / "feedback.jsonl"
+ENDPOINTS = {"score": "/score", "compress": "/compress", "rewrite": "/rewrite_suggestions", "optimize": "/optimize"}
+FALLBACK_PROMPTS = [
+    "Suggest a good phone under $500",
+    "How do I fix this TypeError in my Python script?",
+    "Explain the difference between TCP and UDP",
+    "Write a cover letter for a data analyst role",
+    "How long does it take to learn Spanish?",
+]
+
+
+def load_corpus(paths: List[str]) -> List[str]:
+    prompts: List[str] = []
+    for p in paths:
+        path = Path(p)
+        if not path.exists():
+            print(f"[loadgen] skipping missing corpus {p}")
+            continue
+        with path.open(encoding="utf-8") as f:
+            for ln in f:
+                ln = ln.strip()
+                if not ln:
+                    continue
+                if path.suffix == ".jsonl":
+                    try:
+                        row = json.loads(ln)
+                    except ValueError:
+                        continue
+                    text = next((row[k] for k in ("prompt", "body", "text", "title")
+                                 if isinstance(row.get(k), str) and row[k].strip()), "")
+                else:
+                    text = ln
+                if text.strip():
+                    prompts.append(text[:4000])
+    return prompts or list(FALLBACK_PROMPTS)
+
+
+def compress_payloads(seed: int = 3) -> List[str]:
+    rnd = random.Random(seed)
+    rows = [{"id": i, "status": rnd.choice(["ok", "failed", "pending"]), "region": rnd.choice(["us", "eu", "in"]),
+             "latency_ms": rnd.randint(5, 900)} for i in range(400)]
+    return [
+        "\n".join(synthetic_log_lines(2000, seed=seed)),
+        synthetic_traceback_corpus(60, seed=seed),
+        json.dumps(rows, indent=2),
+    ]
+
+
+class Workload:
+    """
+    Builds the next request for a worker; score sessions are per worker.
+    """
+
+    def __init__(self, prompts: List[str], mix: Dict[str, float], seed: int):
+        self.prompts = prompts
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.compress = compress_payloads()
+        self.rnd = random.Random(seed)
+        self._sessions: Dict[int, Tuple[List[str], int]] = {}
+        self._lock = threading.Lock()
+
+    def next(self, worker: int) -> Tuple[str, Dict[str, Any], str]:
+        with self._lock:
+            kind = self.rnd.choices(self.kinds, self.weights)[0]
+            if kind == "score":
+                words, pos = self._sessions.pop(worker, None) or (self.rnd.choice(self.prompts).split(), 0)
+                pos = min(len(words), pos + self.rnd.randint(1, 4))
+                if pos < len(words):
+                    self._sessions[worker] = (words, pos)
+                return kind, {"prompt": " ".join(words[:pos])}, f"loadgen-{worker}"
+            if kind == "compress":
+                return kind, {"text": self.rnd.choice(self.compress)}, f"loadgen-{worker}"
+            return kind, {"prompt": self.rnd.choice(self.prompts)}, f"loadgen-{worker}"
+
+
+class Results:
+    def __init__(self):
+        self.lat: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float, outcome: str) -> None:
+        with self._lock:
+            self.lat.setdefault(kind, []).append(seconds)
+            o = self.outcomes.setdefault(kind, {})
+            o[outcome] = o.get(outcome, 0) + 1
+
+
+def _outcome(status: int, body: bytes) -> str:
+    if status != 200:
+        return str(status)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return "bad_json"
+    if isinstance(data, dict) and data.get("error"):
+        return f"error:{data['error']}"
+    return "ok"
+
+
+def _worker(i: int, base: str, workload: Workload, results: Results, stop_at: float,
+            jobs: Optional["queue.Queue[Optional[float]]"], timeout_s: float) -> None:
+    url = urlparse(base)
+    conn_cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(url.hostname, url.port, timeout=timeout_s)
+    while True:
+        if jobs is not None:
+            scheduled = jobs.get()
+            if scheduled is None:
+                break
+        else:
+            if time.monotonic() >= stop_at:
+                break
+            scheduled = time.monotonic()
+        kind, payload, user = workload.next(i)
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            conn.request("POST", ENDPOINTS[kind], body=body,
+                         headers={"Content-Type": "application/json", "X-SPE-User": user})
+            resp = conn.getresponse()
+            data = resp.read()
+            outcome = _outcome(resp.status, data)
+        except Exception as e:
+            outcome = f"client:{type(e).__name__}"
+            conn.close()
+            conn = conn_cls(url.hostname, url.port, timeout=timeout_s)
+        results.add(kind, time.monotonic() - scheduled, outcome)
+    conn.close()
+
+
+def _pct(vals: List[float], q: float) -> float:
+    return vals[min(len(vals) - 1, int(q * len(vals)))] if vals else 0.0
+
+
+def report(results: Results, elapsed: float) -> str:
+    out = [f"{'endpoint':<10} {'n':>7} {'rps':>8} {'ok%':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+           f"{'max ms':>9}  outcomes"]
+    for kind in sorted(results.lat):
+        lat = sorted(results.lat[kind])
+        outcomes = results.outcomes[kind]
+        ok = outcomes.get("ok", 0)
+        out.append(
+            f"{kind:<10} {len(lat):>7} {len(lat) / elapsed:>8.1f} {100 * ok / len(lat):>6.1f} "
+            f"{_pct(lat, .5) * 1000:>9.1f} {_pct(lat, .9) * 1000:>9.1f} {_pct(lat, .99) * 1000:>9.1f} "
+            f"{lat[-1] * 1000:>9.1f}  " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))
+        )
+    total = sum(len(v) for v in results.lat.values())
+    out.append(f"total {total} requests in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} rps)")
+    return "\n".join(out)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(base: str, duration_s: float, concurrency: int, mix: Dict[str, float], prompts: List[str],
+        rate: Optional[float] = None, timeout_s: float = 60.0, seed: int = 0) -> Tuple[Results, float]:
+    workload = Workload(prompts, mix, seed)
+    results = Results()
+    jobs: Optional["queue.Queue[Optional[float]]"] = queue.Queue() if rate else None
+    t0 = time.monotonic()
+    stop_at = t0 + duration_s
+    threads = [threading.Thread(target=_worker, args=(i, base, workload, results, stop_at, jobs, timeout_s),
+                                daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    if jobs is not None:
+        rnd = random.Random(seed)
+        next_t = t0
+        while next_t < stop_at:
+            time.sleep(max(0.0, next_t - time.monotonic()))
+            jobs.put(next_t)
+            next_t += rnd.expovariate(rate)
+        for _ in threads:
+            jobs.put(None)
+    for t in threads:
+        t.join()
+    return results, time.monotonic() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load generator for /score, /compress and /rewrite_suggestions")
+    ap.add_argument("--base", default="http://127.0.0.1:8000")
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--rate", type=float, default=None, help="open-loop arrivals per second (Poisson)")
+    ap.add_argument("--mix", default="score=70,compress=10,rewrite=20")
+    ap.add_argument("--corpus", action="append", default=None)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = ap.parse_args()
+
+    prompts = load_corpus(args.corpus or [str(DEFAULT_CORPUS)])
+    mix = parse_mix(args.mix)
+    print(f"[loadgen] {len(prompts)} prompts, mix={mix}, "
+          f"{'rate=%g/s' % args.rate if args.rate else 'closed loop'}, concurrency={args.concurrency}", flush=True)
+    results, elapsed = run(args.base, args.duration, args.concurrency, mix, prompts, args.rate,
+                           args.timeout, args.seed)
+    if args.json:
+        print(json.dumps({
+            "elapsed_s": elapsed,
+            "endpoints": {k: {"n": len(v), "outcomes": results.outcomes[k],
+                              "p50_ms": _pct(sorted(v), .5) * 1000, "p99_ms": _pct(sorted(v), .99) * 1000}
+                          for k, v in results.lat.items()},
+        }, indent=2))
+    else:
+        print(report(results, elapsed))
+
+
+if __name__ == "__main__":
+    main()
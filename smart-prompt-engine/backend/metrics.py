@@ -0,0 +1,211 @@
+# backend/metrics.py
+"""
+Low-overhead metrics with Prometheus text export.
+
+Every thread writes only to its own shard (no locks on the hot path);
+/metrics sums the shards. Recording a stage costs ~1 µs; inside a traced
+request (backend.tracing) it is also recorded as a span:
+
+    from backend.metrics import stage
+    with stage("encode"):
+        vec = rep.encode(text)
+"""
+from __future__ import annotations
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from backend.tracing import span
+
+# Seconds; +Inf is implicit.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_HISTOGRAM = "spe_stage_duration_seconds"
+REQUEST_HISTOGRAM = "spe_request_duration_seconds"
+REQUEST_COUNTER = "spe_requests_total"
+LLM_ATTEMPT_HISTOGRAM = "spe_llm_attempt_duration_seconds"
+LLM_CALL_COUNTER = "spe_llm_attempts_total"
+
+HELP = {
+    STAGE_HISTOGRAM: "Latency of pipeline stages",
+    REQUEST_HISTOGRAM: "End-to-end request latency per endpoint",
+    REQUEST_COUNTER: "Requests per endpoint and status",
+    LLM_ATTEMPT_HISTOGRAM: "Latency of individual upstream LLM attempts by outcome",
+    LLM_CALL_COUNTER: "Upstream LLM attempts by outcome (ok, retryable, fatal, circuit_open, deadline)",
+}
+
+# (metric name, rendered label set) -> one metric series
+Key = Tuple[str, str]
+# collector() -> [(name, type, help, [(labels, value)])]
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[str, float]]]]]
+
+
+class _Shard:
+    __slots__ = ("hist", "counters")
+
+    def __init__(self):
+        # per bucket (non-cumulative, last = +Inf) counts, then the sum
+        self.hist: Dict[Key, List[float]] = {}
+        self.counters: Dict[Key, float] = {}
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()  # shard registration + export only
+        self._collectors: List[Collector] = []
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def observe(self, key: Key, seconds: float) -> None:
+        hist = self._shard().hist
+        h = hist.get(key)
+        if h is None:
+            h = hist[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        h[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        h[-1] += seconds
+
+    def inc(self, key: Key, value: float = 1) -> None:
+        counters = self._shard().counters
+        counters[key] = counters.get(key, 0) + value
+
+    def register_collector(self, fn: Collector) -> None:
+        self._collectors.append(fn)
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.hist.clear()
+                shard.counters.clear()
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (0.0.4).
+        """
+        hists: Dict[Key, List[float]] = {}
+        counters: Dict[Key, float] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, h in list(shard.hist.items()):
+                acc = hists.setdefault(key, [0] * len(h))
+                for i, v in enumerate(h):
+                    acc[i] += v
+            for key, v in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + v
+
+        out: List[str] = []
+        for name in sorted({k[0] for k in hists}):
+            out.append(f"# HELP {name} {HELP.get(name, name)}")
+            out.append(f"# TYPE {name} histogram")
+            for (n, labels), h in sorted(hists.items()):
+                if n != name:
+                    continue
+                sep = "," if labels else ""
+                cum = 0
+                for bound, c in zip(LATENCY_BUCKETS + ("+Inf",), h[:-1]):
+                    cum += c
+                    out.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cum}')
+                out.append(f"{name}_sum{{{labels}}} {h[-1]:.6f}")
+                out.append(f"{name}_count{{{labels}}} {cum}")
+
+        for name in sorted({k[0] for k in counters}):
+            out.append(f"# HELP {name} {HELP.get(name, name)}")
+            out.append(f"# TYPE {name} counter")
+            for (n, labels), v in sorted(counters.items()):
+                if n == name:
+                    out.append(f"{name}{{{labels}}} {v:g}")
+
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                for labels, v in samples:
+                    out.append(f"{name}{{{labels}}} {v:g}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+_stage_keys: Dict[str, Key] = {}
+
+
+def _label_value(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _StageTimer:
+    __slots__ = ("key", "t0", "span")
+
+    def __init__(self, key: Key, name: str):
+        self.key = key
+        self.span = span(name)
+
+    def __enter__(self) -> "_StageTimer":
+        self.span.__enter__()
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        registry.observe(self.key, perf_counter() - self.t0)
+        self.span.__exit__(*exc)
+        return False
+
+
+def stage(name: str) -> _StageTimer:
+    key = _stage_keys.get(name)
+    if key is None:
+        key = _stage_keys[name] = (STAGE_HISTOGRAM, f'stage="{_label_value(name)}"')
+    return _StageTimer(key, name)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task overhead): request
+    latency histogram + count per endpoint and status. Unknown paths are
+    folded into endpoint="other" to keep label cardinality bounded.
+    """
+
+    def __init__(self, app, routes_from=None):
+        self.app = app
+        self.routes_from = routes_from
+        self._known: Dict[str, str] = {}
+        self._counter_keys: Dict[Tuple[str, int], Key] = {}
+
+    def _endpoint(self, path: str) -> str:
+        if not self._known and self.routes_from is not None:
+            self._known = {r.path: _label_value(r.path) for r in self.routes_from.routes if hasattr(r, "path")}
+        return self._known.get(path, "other")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = self._endpoint(scope.get("path", ""))
+            registry.observe((REQUEST_HISTOGRAM, f'endpoint="{endpoint}"'), perf_counter() - t0)
+            ckey = self._counter_keys.get((endpoint, status))
+            if ckey is None:
+                ckey = self._counter_keys[(endpoint, status)] = (
+                    REQUEST_COUNTER, f'endpoint="{endpoint}",status="{status}"'
+                )
+            registry.inc(ckey)
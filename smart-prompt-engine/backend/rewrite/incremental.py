@@ -0,0 +1,123 @@
+# backend/rewrite/incremental.py
+"""
+Follow-up rewrites without the LLM.
+
+Every result returned by /rewrite_suggestions is indexed by the first line
+and fill-field set of each of its cards. When a prompt comes back that is
+one of those cards with some ____ blanks filled in, the previous result is
+updated locally: filled fields move to provided_info, the remaining blanks
+become required/optional missing, and score and cards are recomputed.
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from backend.rewrite.suggestions import _normalize_cards, split_fill_block
+from backend.utils.cache import TTLCache, content_hash, normalize_prompt
+
+FILLED = "filled in Fill block"
+DETAILS_TAIL = re.compile(r"\s*Details: .*$")
+
+
+def card_signature(text: str) -> Optional[Tuple[str, FrozenSet[str]]]:
+    """
+    (normalized first line, field names in the Fill block) of a card or
+    of a prompt built from one; None without a Fill block.
+    """
+    parsed = split_fill_block(normalize_prompt(text))
+    if parsed is None:
+        return None
+    head, items = parsed
+    return head.lower(), frozenset(i["field"].lower() for i in items)
+
+
+def _card_head(card: str) -> str:
+    return card.strip().splitlines()[0].strip() if card and card.strip() else ""
+
+
+def _filled_value(value: str, example: str) -> str:
+    # "US (e.g. US)" -> "US" when the user typed over the blank only
+    if example and value.endswith(f"({example})"):
+        value = value[: -len(example) - 2].strip()
+    return value
+
+
+class CardIndex:
+    """
+    Issued rewrite results by card signature, scoped per model + user and
+    expiring like rewrite_cache.
+    """
+
+    def __init__(self, ttl_seconds: int = 600, max_items: int = 2000):
+        self._cache = TTLCache(ttl_seconds=ttl_seconds, max_items=max_items)
+
+    def __len__(self) -> int:
+        return len(self._cache.store)
+
+    @staticmethod
+    def _key(scope: str, sig: Tuple[str, FrozenSet[str]]) -> str:
+        return content_hash(scope, sig[0], "|".join(sorted(sig[1])))
+
+    def add(self, scope: str, result: Dict[str, Any]) -> None:
+        for card in result.get("rewrite_cards") or []:
+            sig = card_signature(card) if isinstance(card, str) else None
+            if sig is not None:
+                self._cache.set(self._key(scope, sig), result)
+
+    def lookup(self, scope: str, prompt: str) -> Optional[Dict[str, Any]]:
+        sig = card_signature(prompt)
+        if sig is None:
+            return None
+        return self._cache.get(self._key(scope, sig))
+
+
+def refill(prompt: str, base: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recompute `base` (an issued result) for `prompt`, one of its cards
+    with some blanks filled in.
+    """
+    head, items = split_fill_block(prompt) or ("", [])
+    known = {
+        (m.get("field") or "").lower(): m
+        for m in (base.get("required_missing") or []) + (base.get("optional_missing") or [])
+        if isinstance(m, dict)
+    }
+
+    provided: Dict[str, Dict[str, Any]] = {
+        (p.get("field") or "").lower(): p for p in base.get("provided_info") or [] if isinstance(p, dict)
+    }
+    required: List[Dict[str, Any]] = []
+    optional: List[Dict[str, Any]] = []
+    for item in items:
+        field, value = item["field"], item["value"]
+        prev = known.get(field.lower(), {})
+        if "____" in value:
+            missing = {
+                "field": field,
+                "optional": item["optional"],
+                "why": prev.get("why", ""),
+                "example": prev.get("example", ""),
+                "evidence": "blank in Fill block",
+            }
+            (optional if item["optional"] else required).append(missing)
+        elif value and not re.fullmatch(r"none\W*", value.lower()):
+            value = _filled_value(value, prev.get("example", ""))
+            provided[field.lower()] = {"field": field, "value": value, "evidence": FILLED}
+
+    # Filled values go into the card text; the Fill block only keeps blanks.
+    details = "; ".join(f"{p['field']}: {p['value']}" for p in provided.values() if p.get("evidence") == FILLED)
+    heads = [DETAILS_TAIL.sub("", h) for h in [head] + [_card_head(c) for c in base.get("rewrite_cards") or []]]
+    heads = list(dict.fromkeys(h for h in heads if h))
+    if details:
+        heads = [f"{h} Details: {details}." for h in heads]
+    cards = _normalize_cards(head, required[:4], optional[:2], heads[:3])
+
+    return {
+        "provided_info": list(provided.values())[:10],
+        "missing_info": (required[:4] + optional[:2]),
+        "required_missing": required[:4],
+        "optional_missing": optional[:2],
+        "rewrite_cards": cards,
+        "intent": base.get("intent", "other"),
+        "score": max(20, 100 - 20 * len(required) - 5 * len(optional)),
+    }
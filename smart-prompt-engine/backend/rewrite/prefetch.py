@@ -0,0 +1,179 @@
+# backend/rewrite/prefetch.py
+"""
+Speculative rewrite prefetch driven by /score.
+
+The extension asks for rewrite cards only after the user stops typing, so
+the user waits out the whole LLM call. /score sees the prompt first: when
+one session sends the same prompt on `stable_calls` successive calls over
+at least stable_s (the extension re-scores once typing settles), the
+prompt is long enough and it scores below "good", the rewrite is started
+in the background. A real /rewrite_suggestions request then finds it in
+rewrite_cache or joins the call still in flight.
+
+Guards:
+- low priority: only while the llm pool has no queue and idle workers;
+- at most max_inflight prefetches at once, per_user_per_min per user;
+- a prefetch nobody claimed is cancelled as soon as that session's prompt
+  changes.
+
+hit_rate = prefetches later claimed by a real request / prefetches started.
+"""
+from __future__ import annotations
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from backend.utils.cache import SimpleRateLimiter, TTLCache, normalize_prompt
+
+# (prompt, user_id) -> (cache key, task), or None if cached / already in flight
+StartFn = Callable[[str, str], Optional[Tuple[str, "asyncio.Task"]]]
+
+
+@dataclass
+class PrefetchConfig:
+    enabled: bool = False
+    stable_calls: int = 2
+    stable_s: float = 1.0
+    min_chars: int = 12
+    good_score: int = 75
+    per_user_per_min: int = 6
+    max_inflight: int = 4
+
+    @classmethod
+    def from_env(cls) -> "PrefetchConfig":
+        env = os.getenv
+        return cls(
+            enabled=env("SPE_PREFETCH", "").strip().lower() in ("1", "true", "yes"),
+            stable_calls=int(env("SPE_PREFETCH_STABLE_CALLS", cls.stable_calls)),
+            stable_s=float(env("SPE_PREFETCH_STABLE_MS", cls.stable_s * 1000)) / 1000,
+            min_chars=int(env("SPE_PREFETCH_MIN_CHARS", cls.min_chars)),
+            per_user_per_min=int(env("SPE_PREFETCH_PER_USER_PER_MIN", cls.per_user_per_min)),
+            max_inflight=int(env("SPE_PREFETCH_MAX_INFLIGHT", cls.max_inflight)),
+        )
+
+
+class _Session:
+    __slots__ = ("prompt", "seen", "first_at", "key", "tried")
+
+    def __init__(self, prompt: str, now: float):
+        self.prompt = prompt
+        self.seen = 1
+        self.first_at = now
+        self.key: Optional[str] = None
+        self.tried = False
+
+
+class Prefetcher:
+    def __init__(self, config: PrefetchConfig, start: StartFn, has_capacity: Callable[[], bool],
+                 max_sessions: int = 10_000):
+        self.config = config
+        self._start = start
+        self._has_capacity = has_capacity
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._budget = SimpleRateLimiter(max_requests=config.per_user_per_min, window_seconds=60)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._claimed: Set[str] = set()
+        # finished prefetches no request has used yet
+        self._ready = TTLCache(ttl_seconds=600, max_items=5000)
+        self.stats: Dict[str, int] = {
+            "started": 0, "completed": 0, "failed": 0, "cancelled": 0,
+            "hits": 0, "hits_inflight": 0, "skipped_capacity": 0, "skipped_budget": 0,
+        }
+
+    # -------- /score side --------
+
+    def observe(self, session: str, user_id: str, prompt: str, result: Dict[str, Any]) -> None:
+        if not self.config.enabled:
+            return
+        cfg = self.config
+        prompt = normalize_prompt(prompt)
+        now = time.monotonic()
+        s = self._sessions.get(session)
+        if s is None or s.prompt != prompt:
+            if s is not None and s.key is not None:
+                self._cancel(s.key)
+            self._sessions[session] = _Session(prompt, now)
+            self._sessions.move_to_end(session)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return
+
+        s.seen += 1
+        if s.tried or s.seen < cfg.stable_calls or now - s.first_at < cfg.stable_s:
+            return
+        score = result.get("score") if isinstance(result, dict) else None
+        if (len(prompt) < cfg.min_chars or not isinstance(score, (int, float)) or score >= cfg.good_score
+                or "fill these (required):" in prompt.lower()):
+            s.tried = True
+            return
+        if len(self._inflight) >= cfg.max_inflight or not self._has_capacity():
+            self.stats["skipped_capacity"] += 1  # retried on the next /score call
+            return
+        s.tried = True
+        if not self._budget.allow(user_id):
+            self.stats["skipped_budget"] += 1
+            return
+        started = self._start(prompt, user_id)
+        if started is None:
+            return
+        key, task = started
+        s.key = key
+        self._inflight[key] = task
+        self.stats["started"] += 1
+        task.add_done_callback(lambda t: self._done(key, t))
+
+    def _cancel(self, key: str) -> None:
+        task = self._inflight.get(key)
+        if task is None or key in self._claimed or task.done():
+            return
+        task.cancel()
+        self.stats["cancelled"] += 1
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        claimed = key in self._claimed
+        self._claimed.discard(key)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.stats["failed"] += 1
+            return
+        self.stats["completed"] += 1
+        if not claimed:
+            self._ready.set(key, True)
+
+    # -------- /rewrite_suggestions side --------
+
+    def claim(self, key: str) -> bool:
+        """
+        True if a prefetch produced (or is producing) this key's result;
+        each prefetch counts as a hit once.
+        """
+        task = self._inflight.get(key)
+        if task is not None and not task.cancelling() and key not in self._claimed:
+            self._claimed.add(key)
+            self.stats["hits"] += 1
+            self.stats["hits_inflight"] += 1
+            return True
+        if self._ready.get(key) is not None:
+            self._ready.store.pop(key, None)
+            self.stats["hits"] += 1
+            return True
+        return False
+
+    def metrics(self) -> Dict[str, Any]:
+        started = self.stats["started"]
+        return {
+            **self.stats,
+            "enabled": self.config.enabled,
+            "inflight": len(self._inflight),
+            "hit_rate": round(self.stats["hits"] / started, 4) if started else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self.stats:
+            self.stats[k] = 0
@@ -7,6 +7,8 @@ import re
 from typing import Any, Dict, List
 
 from backend.llm.openai_client import OpenAITextClient, LLMError
+from backend.metrics import stage
+from backend.tracing import span
 
 
 SYSTEM = """You are a prompt doctor. You improve prompts BEFORE they are sent to an AI.
@@ -83,6 +85,17 @@ Rules:
 """
 SYSTEM_VERSION = "v3.2"
 
+# LocalScorer dimension -> (fill field, example) for cards built without the LLM.
+LOCAL_DIM_FIELDS = {
+    "goal": ("goal", "what outcome you want"),
+    "context": ("context", "background, who it is for"),
+    "constraints": ("constraints", "time, budget, preferences"),
+    "inputs": ("key_inputs", "numbers, code, errors, examples"),
+    "format": ("output_format", "steps, table, bullets, code"),
+    "detail_level": ("detail_level", "beginner or advanced, brief or detailed"),
+}
+LOCAL_OPTIONAL_DIMS = {"format", "detail_level"}
+
 
 # ---------- Normalization / safety helpers ----------
 
@@ -314,7 +327,29 @@ def _extract_fill_fields(prompt: str) -> set[str]:
     return fields
 
 
-def _extract_blank_fill_items(prompt: str) -> tuple[bool, List[Dict[str, Any]]]:
+# "- field: value" items; the lookahead keeps "400 - 500" inside a value
+# when the prompt arrives with its newlines collapsed.
+_FILL_ITEM_SPLIT = re.compile(r"(?:^|\s)-\s+(?=[\w][\w ./&()]*:)")
+
+
+def _parse_fill_items(block: str, optional: bool) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for chunk in _FILL_ITEM_SPLIT.split(block):
+        m = re.match(r"^\s*([^:]+):\s*(.*)$", chunk.strip(), flags=re.DOTALL)
+        if not m:
+            continue
+        field = _clean_field_name(m.group(1).strip())
+        if field:
+            out.append({"field": field, "value": " ".join(m.group(2).split()), "optional": optional})
+    return out
+
+
+def split_fill_block(prompt: str) -> tuple[str, List[Dict[str, Any]]] | None:
+    """
+    (text before the Fill block, [{"field", "value", "optional"}]) for a
+    prompt with a "Fill these (required):" block, else None. Works on
+    line-based and whitespace-collapsed prompts alike.
+    """
     p = prompt or ""
     low = p.lower()
     req_marker = "fill these (required):"
@@ -322,42 +357,95 @@ def _extract_blank_fill_items(prompt: str) -> tuple[bool, List[Dict[str, Any]]]:
 
     req_pos = low.find(req_marker)
     if req_pos < 0:
-        return False, []
+        return None
 
     opt_pos = low.find(opt_marker, req_pos)
     req_block = p[req_pos + len(req_marker): opt_pos if opt_pos >= 0 else len(p)]
     opt_block = p[opt_pos + len(opt_marker):] if opt_pos >= 0 else ""
+    items = _parse_fill_items(req_block, optional=False) + _parse_fill_items(opt_block, optional=True)
+    return p[:req_pos].strip(), items
 
-    def _parse_block(block: str, optional: bool) -> List[Dict[str, Any]]:
-        out: List[Dict[str, Any]] = []
-        for raw in block.splitlines():
-            line = raw.strip()
-            if not line.startswith("-"):
-                continue
-            if "none" in line.lower():
-                continue
 
-            m = re.match(r"^\s*-\s*([^:]+):\s*(.*)$", line)
-            if not m:
-                continue
-            field = _clean_field_name(m.group(1).strip())
-            rhs = (m.group(2) or "").strip()
-            if (not field) or ("____" not in rhs):
-                continue
+def _extract_blank_fill_items(prompt: str) -> tuple[bool, List[Dict[str, Any]]]:
+    parsed = split_fill_block(prompt)
+    if parsed is None:
+        return False, []
+
+    out: List[Dict[str, Any]] = []
+    for item in parsed[1]:
+        rhs = item["value"]
+        if "none" in rhs.lower() or "____" not in rhs:
+            continue
+        ex_match = re.search(r"\(([^)]*)\)\s*$", rhs)
+        ex = ex_match.group(1).strip() if ex_match else ""
+        out.append({
+            "field": item["field"],
+            "optional": item["optional"],
+            "why": "",
+            "example": ex,
+            "evidence": "blank in Fill block",
+        })
+    return True, out
+
+
+def _local_first_lines(prompt: str, local_cards: Any) -> List[str]:
+    """
+    One-line card openers from LocalScorer's template cards: the user's
+    first line plus the template instruction, minus its "Include: ..." tail.
+    """
+    head = (prompt or "").strip().splitlines()[0].strip() if (prompt or "").strip() else ""
+    if head and head[-1] not in ".?!":
+        head += "."
+    out: List[str] = []
+    for card in (local_cards if isinstance(local_cards, list) else []):
+        if not isinstance(card, str):
+            continue
+        tail = card.split("\n\n", 1)[1] if "\n\n" in card else ""
+        tail = re.sub(r"\s*(Include|Consider|Missing):.*$", "", tail.strip(), flags=re.DOTALL).strip()
+        out.append(f"{head} {tail}".strip() if tail else head)
+    return out
+
 
-            ex_match = re.search(r"\(([^)]*)\)\s*$", rhs)
-            ex = ex_match.group(1).strip() if ex_match else ""
-            out.append({
+def local_rewrite_suggestions(prompt: str, local: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Same schema as get_rewrite_suggestions, built from a LocalScorer result
+    (no LLM): missing dimensions become fill fields, cards use the same
+    Fill block format. provided_info is unknown locally and left empty.
+    """
+    p = (prompt or "").strip()
+    has_fill_block, blank_fill_items = _extract_blank_fill_items(p)
+    if has_fill_block:
+        missing_info = _sanitize_missing_info(blank_fill_items)
+    else:
+        missing_info = []
+        for dim in local.get("missing_dimensions") or []:
+            if dim not in LOCAL_DIM_FIELDS:
+                continue
+            field, example = LOCAL_DIM_FIELDS[dim]
+            missing_info.append({
                 "field": field,
-                "optional": optional,
+                "optional": dim in LOCAL_OPTIONAL_DIMS,
                 "why": "",
-                "example": ex,
-                "evidence": "blank in Fill block",
+                "example": example,
+                "evidence": "not mentioned",
             })
-        return out
+        missing_info = _sanitize_missing_info(missing_info)
+
+    required_missing = [m for m in missing_info if not m.get("optional", False)]
+    optional_missing = [m for m in missing_info if m.get("optional", False)]
+    with span("normalize_cards"):
+        rewrite_cards = _normalize_cards(
+            p, required_missing, optional_missing, _local_first_lines(p, local.get("rewrite_cards")))
 
-    items = _parse_block(req_block, optional=False) + _parse_block(opt_block, optional=True)
-    return True, items
+    return {
+        "provided_info": [],
+        "missing_info": missing_info[:6],
+        "required_missing": required_missing[:4],
+        "optional_missing": optional_missing[:2],
+        "rewrite_cards": rewrite_cards[:3],
+        "intent": local.get("intent", "other"),
+        "score": max(20, 100 - 20 * len(required_missing) - 5 * len(optional_missing)),
+    }
 
 
 # ---------- Main function ----------
@@ -377,37 +465,42 @@ def get_rewrite_suggestions(prompt: str, client: OpenAITextClient) -> Dict[str,
     except LLMError:
         raise
 
-    provided_info = data.get("provided_info", [])
-    if has_fill_block:
-        # Hard rule: once prompt contains a Fill block, only track fields still blank (____).
-        missing_info = _sanitize_missing_info(blank_fill_items)
-    else:
-        missing_info = _sanitize_missing_info(data.get("missing_info", []))
-        missing_info = _drop_already_provided_fields(provided_info, missing_info)
-        missing_info = [m for m in missing_info if not _field_is_already_covered(p, m)]
-        missing_info = _postprocess_missing(p, missing_info)
-
-    required_missing = [
-        m for m in missing_info if not m.get("optional", False)]
-    optional_missing = [m for m in missing_info if m.get("optional", False)]
-
-    # LLM-based score: required fields only
-    llm_score = max(20, 100 - 20 * len(required_missing) - 5 * len(optional_missing))
-
-    # Normalize rewrite cards to our strict format
-    rewrite_cards = _normalize_cards(
-        p, required_missing, optional_missing, data.get("rewrite_cards", []))
-    rewrite_cards = [_clean_rewrite_card(c) for c in rewrite_cards if isinstance(c, str)]
-
-    if not isinstance(provided_info, list):
-        raise LLMError("Bad JSON schema from LLM (provided_info not list).")
-
-    return {
-        "provided_info": provided_info[:10],
-        "missing_info": missing_info[:6],
-        "required_missing": required_missing[:4],
-        "optional_missing": optional_missing[:2],
-        "rewrite_cards": rewrite_cards[:3],
-        "intent": data.get("intent", "other"),
-        "score": llm_score,
-    }
+    with stage("rewrite_postprocess"):
+        provided_info = data.get("provided_info", [])
+        if has_fill_block:
+            # Hard rule: once prompt contains a Fill block, only track fields still blank (____).
+            with span("sanitize_missing_info"):
+                missing_info = _sanitize_missing_info(blank_fill_items)
+        else:
+            with span("sanitize_missing_info"):
+                missing_info = _sanitize_missing_info(data.get("missing_info", []))
+                missing_info = _drop_already_provided_fields(provided_info, missing_info)
+                missing_info = [m for m in missing_info if not _field_is_already_covered(p, m)]
+            with span("postprocess_missing"):
+                missing_info = _postprocess_missing(p, missing_info)
+
+        required_missing = [
+            m for m in missing_info if not m.get("optional", False)]
+        optional_missing = [m for m in missing_info if m.get("optional", False)]
+
+        # LLM-based score: required fields only
+        llm_score = max(20, 100 - 20 * len(required_missing) - 5 * len(optional_missing))
+
+        # Normalize rewrite cards to our strict format
+        with span("normalize_cards"):
+            rewrite_cards = _normalize_cards(
+                p, required_missing, optional_missing, data.get("rewrite_cards", []))
+            rewrite_cards = [_clean_rewrite_card(c) for c in rewrite_cards if isinstance(c, str)]
+
+        if not isinstance(provided_info, list):
+            raise LLMError("Bad JSON schema from LLM (provided_info not list).")
+
+        return {
+            "provided_info": provided_info[:10],
+            "missing_info": missing_info[:6],
+            "required_missing": required_missing[:4],
+            "optional_missing": optional_missing[:2],
+            "rewrite_cards": rewrite_cards[:3],
+            "intent": data.get("intent", "other"),
+            "score": llm_score,
+        }
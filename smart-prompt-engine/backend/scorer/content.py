@@ -0,0 +1,58 @@
+# backend/scorer/content.py
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from backend.compress.segment import LOG_RECORD, segment_text
+from backend.scorer.representation import LONG_MAX_CHARS
+
+# The long-text encoder never looks past this many chars, so anything
+# beyond it is not worth carrying (or tokenizing).
+MAX_INSTRUCTION_CHARS = LONG_MAX_CHARS
+# Single-line prompts up to this size skip segmentation entirely.
+FAST_PATH_CHARS = 400
+
+ATTACHMENT_TYPES = ("code", "logs", "json", "csv")
+
+
+def split_prompt(prompt: str) -> Dict[str, Any]:
+    """
+    Separate the natural-language instruction from pasted code / logs /
+    data regions. Returns:
+      instruction: prose only, bounded to MAX_INSTRUCTION_CHARS
+      attachments: [{"type", "chars"}] in paste order
+      truncated:   instruction was cut to the bound
+    """
+    text = (prompt or "").strip()
+    if len(text) <= FAST_PATH_CHARS and "\n" not in text:
+        return {"instruction": text, "attachments": [], "truncated": False}
+
+    prose: List[str] = []
+    attachments: List[Dict[str, Any]] = []
+    for seg in segment_text(text):
+        if seg["type"] in ATTACHMENT_TYPES:
+            attachments.append({"type": seg["type"], "chars": len(seg["text"])})
+        else:
+            # stray single log records between tracebacks are not instruction
+            prose.extend(ln for ln in seg["text"].splitlines() if not LOG_RECORD.match(ln))
+
+    # A bare paste with no prose: its head is the best available signal.
+    instruction = "\n".join(prose).strip() or text
+    truncated = len(instruction) > MAX_INSTRUCTION_CHARS
+    if truncated:
+        instruction = instruction[:MAX_INSTRUCTION_CHARS]
+    return {"instruction": instruction, "attachments": attachments, "truncated": truncated}
+
+
+def attachment_features(attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Cheap per-type features for the scorer (no embedding involved).
+    """
+    types = [a["type"] for a in attachments]
+    return {
+        "attachment_types": sorted(set(types)),
+        "attachment_chars": sum(a["chars"] for a in attachments),
+        "has_code": "code" in types,
+        "has_logs": "logs" in types,
+        "has_data": "json" in types or "csv" in types,
+    }
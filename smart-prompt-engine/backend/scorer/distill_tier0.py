@@ -0,0 +1,202 @@
+# backend/scorer/distill_tier0.py
+"""
+Distill the tier-0 hashing scorer from LocalScorer outputs.
+
+    python -m backend.scorer.distill_tier0 --corpus backend/storage/feedback.jsonl \
+        --corpus prompts.txt --out backend/scorer/tier0.npz
+
+Corpus files are .jsonl (a "prompt" field per line) or plain text (one
+prompt per line). Every prompt is also used at typing-time prefixes, since
+that is what tier-0 sees. Writes the model plus <out>.report.json with
+held-out agreement, coverage and latency numbers.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import Ridge
+
+from backend.scorer.content import split_prompt
+from backend.scorer.local_score import LocalScorer
+from backend.scorer.representation import PromptRepresentation
+from backend.scorer.tier0 import (
+    DEFAULT_MODEL_PATH, DIM_BAND, N_FEATURES, Tier0Model, Tier0Scorer, featurize, split_outputs,
+)
+
+PREFIX_FRACTIONS = (0.3, 0.6)
+TARGET_INTENT_AGREEMENT = 0.95
+MARGIN_GRID = np.round(np.arange(0.0, 0.2001, 0.005), 3)
+
+
+def load_corpus(paths: List[str]) -> List[str]:
+    prompts: List[str] = []
+    for p in paths:
+        for ln in Path(p).read_text(encoding="utf-8").splitlines():
+            ln = ln.strip()
+            if not ln:
+                continue
+            if p.endswith(".jsonl"):
+                try:
+                    ln = (json.loads(ln).get("prompt") or "").strip()
+                except Exception:
+                    continue
+            if ln:
+                prompts.append(ln)
+    return list(dict.fromkeys(prompts))
+
+
+def typing_prefixes(prompt: str) -> List[str]:
+    words = prompt.split()
+    out = []
+    for f in PREFIX_FRACTIONS:
+        k = int(len(words) * f)
+        if k >= 2:
+            out.append(" ".join(words[:k]))
+    return out
+
+
+def feature_matrix(texts: List[str]) -> sparse.csr_matrix:
+    rows, cols, vals = [], [], []
+    for r, t in enumerate(texts):
+        idx, v = featurize(t)
+        rows.append(np.full(len(idx), r))
+        cols.append(idx)
+        vals.append(v)
+    return sparse.csr_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(texts), N_FEATURES), dtype=np.float32,
+    )
+
+
+def _pct(xs: List[float], q: float) -> float:
+    return float(np.percentile(xs, q)) if xs else 0.0
+
+
+def agreement_report(scorer: LocalScorer, t0: Tier0Scorer, prompts: List[str],
+                     targets: np.ndarray, outputs: List[str]) -> Dict[str, Any]:
+    rows = []
+    for p, y in zip(prompts, targets):
+        parts = split_prompt(p)
+        full_i, full_d = split_outputs(dict(zip(outputs, y.tolist())))
+        pred_i, pred_d = split_outputs(t0.model.predict(parts["instruction"]))
+        full = scorer.score_from_similarities(p, parts, full_i, full_d)
+        fast = scorer.score_from_similarities(p, parts, pred_i, pred_d, tier="tier0")
+        top = sorted(pred_i.values(), reverse=True)
+        rows.append({
+            "margin": top[0] - top[1],
+            "dims_clear": all(abs(v - scorer.cfg.dim_threshold) >= DIM_BAND for v in pred_d.values()),
+            "intent": fast["intent"] == full["intent"],
+            "missing": set(fast["missing_dimensions"]) == set(full["missing_dimensions"]),
+            "score_err": abs(fast["score"] - full["score"]),
+        })
+
+    def summarize(sel: List[Dict[str, Any]]) -> Dict[str, float]:
+        n = max(1, len(sel))
+        return {
+            "n": len(sel),
+            "intent_agreement": sum(r["intent"] for r in sel) / n,
+            "missing_dims_exact": sum(r["missing"] for r in sel) / n,
+            "score_mae": sum(r["score_err"] for r in sel) / n,
+        }
+
+    # Smallest margin whose confident subset meets the intent-agreement target.
+    min_margin = float(MARGIN_GRID[-1])
+    for m in MARGIN_GRID:
+        sel = [r for r in rows if r["margin"] >= m and r["dims_clear"]]
+        if sel and summarize(sel)["intent_agreement"] >= TARGET_INTENT_AGREEMENT:
+            min_margin = float(m)
+            break
+
+    confident = [r for r in rows if r["margin"] >= min_margin and r["dims_clear"]]
+    return {
+        "all": summarize(rows),
+        "confident": summarize(confident),
+        "coverage": len(confident) / max(1, len(rows)),
+        "min_margin": min_margin,
+    }
+
+
+def latency_report(scorer: LocalScorer, t0: Tier0Scorer, prompts: List[str], n_full: int = 200) -> Dict[str, Any]:
+    fast_ms, full_ms = [], []
+    for p in prompts:
+        t = time.perf_counter()
+        parts = split_prompt(p)
+        t0.model.predict(parts["instruction"])
+        fast_ms.append((time.perf_counter() - t) * 1000)
+    for p in prompts[:n_full]:
+        t = time.perf_counter()
+        scorer.score(p)
+        full_ms.append((time.perf_counter() - t) * 1000)
+    return {
+        "tier0_predict_ms": {"p50": _pct(fast_ms, 50), "p99": _pct(fast_ms, 99)},
+        "full_score_ms": {"p50": _pct(full_ms, 50), "p99": _pct(full_ms, 99)},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Distill the tier-0 hashing scorer from LocalScorer")
+    ap.add_argument("--corpus", action="append", required=True)
+    ap.add_argument("--out", default=str(DEFAULT_MODEL_PATH))
+    ap.add_argument("--alpha", type=float, default=1.0)
+    ap.add_argument("--val-frac", type=float, default=0.2)
+    ap.add_argument("--seed", type=int, default=13)
+    args = ap.parse_args()
+
+    base = load_corpus(args.corpus)
+    rnd = random.Random(args.seed)
+    rnd.shuffle(base)
+    n_val = max(1, int(len(base) * args.val_frac))
+    # split by source prompt so prefixes of a val prompt never leak into train
+    train_src, val_src = base[n_val:], base[:n_val]
+    train = [q for p in train_src for q in [p, *typing_prefixes(p)]]
+    val = [q for p in val_src for q in [p, *typing_prefixes(p)]]
+    print(f"prompts: {len(base)}  train: {len(train)}  val: {len(val)}")
+
+    rep = PromptRepresentation()
+    scorer = LocalScorer(rep)
+    outputs = [f"intent:{k}" for k in scorer.intent_vecs] + [f"dim:{k}" for k in scorer.dim_vecs]
+
+    def targets(texts: List[str]) -> np.ndarray:
+        ys = []
+        for t in texts:
+            i, d = scorer.similarities(split_prompt(t)["instruction"])
+            ys.append([i[k[7:]] if k.startswith("intent:") else d[k[4:]] for k in outputs])
+        return np.asarray(ys, dtype=np.float32)
+
+    t = time.perf_counter()
+    y_train, y_val = targets(train), targets(val)
+    print(f"teacher targets:  {time.perf_counter() - t:.1f} s")
+
+    X = feature_matrix([split_prompt(p)["instruction"] for p in train])
+    model = Ridge(alpha=args.alpha).fit(X, y_train)
+    tier0 = Tier0Model(model.coef_.T, model.intercept_, outputs)
+    t0 = Tier0Scorer(tier0, scorer)
+
+    report = agreement_report(scorer, t0, val, y_val, outputs)
+    tier0.min_margin = report["min_margin"]
+    report.update(latency_report(scorer, t0, val))
+    report.update({"train": len(train), "val": len(val), "alpha": args.alpha})
+
+    out = Path(args.out)
+    tier0.save(out)
+    Path(str(out) + ".report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"intent agreement: {report['all']['intent_agreement']:.3f} all, "
+          f"{report['confident']['intent_agreement']:.3f} confident")
+    print(f"missing dims:     {report['all']['missing_dims_exact']:.3f} all, "
+          f"{report['confident']['missing_dims_exact']:.3f} confident")
+    print(f"score MAE:        {report['all']['score_mae']:.2f} all, {report['confident']['score_mae']:.2f} confident")
+    print(f"coverage:         {report['coverage']:.1%} at min_margin={report['min_margin']}")
+    print(f"tier0 predict:    p50 {report['tier0_predict_ms']['p50']:.3f} ms  p99 {report['tier0_predict_ms']['p99']:.3f} ms")
+    print(f"full score:       p50 {report['full_score_ms']['p50']:.1f} ms  p99 {report['full_score_ms']['p99']:.1f} ms")
+    print(f"saved:            {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,32 @@
-from openai import OpenAI
-import os
+from __future__ import annotations
+from typing import Optional
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from backend.llm.openai_client import LLMError, OpenAITextClient
+
+SYSTEM = (
+    "You are a helpful assistant that analyzes a user prompt "
+    "and explains what additional information is missing "
+    "to give a high-quality answer. "
+    "Do NOT assume values. Use natural language."
+)
 
 
 class GapReasoner:
     """
-    Uses OpenAI (new SDK) to detect missing information in prompts
+    Uses the shared LLM client to detect missing information in prompts.
+    The client is injected (no OpenAI client is built at import time), so
+    the app starts without a key and tests can point it at a fake server.
     """
 
+    def __init__(self, client: Optional[OpenAITextClient] = None):
+        self.client = client
+
     def reason(self, prompt: str) -> str:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # cheaper + fast (recommended)
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a helpful assistant that analyzes a user prompt "
-                        "and explains what additional information is missing "
-                        "to give a high-quality answer. "
-                        "Do NOT assume values. Use natural language."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+        if self.client is None:
+            raise LLMError("LLM not configured. Set OPENAI_API_KEY and restart backend.")
+        return self.client.complete_text(
+            system=SYSTEM,
+            user=prompt,
             temperature=0.2,
-            max_tokens=150
+            max_tokens=150,
         )
-
-        return response.choices[0].message.content.strip()
@@ -5,6 +5,8 @@ from dataclasses import dataclass
 from typing import Dict, List, Any, Tuple
 import numpy as np
 
+from backend.metrics import stage
+from backend.scorer.content import attachment_features, split_prompt
 from backend.scorer.representation import PromptRepresentation
 
 
@@ -37,6 +39,14 @@ class LocalScoreConfig:
     # If score above this, you can show “Looks good”
     good_score_threshold: int = 75
 
+    # Pooling for instructions longer than one model window ("mean" | "attention")
+    long_pooling: str = "mean"
+
+    # Pasted code/logs/data count as provided inputs (min similarity)
+    attachment_inputs_sim: float = 0.45
+    # Pasted logs/tracebacks nudge intent towards debugging
+    logs_debugging_bonus: float = 0.05
+
 
 class LocalScorer:
     """
@@ -253,10 +263,45 @@ class LocalScorer:
                 "debug": {"note": "Empty prompt"}
             }
 
-        prompt_vec = self.rep.encode(prompt)
-
-        intent, top_sim, intent_sims = self.detect_intent(prompt_vec)
-        missing_dims, dim_sims = self.detect_missing_dimensions(prompt_vec)
+        # Only the (bounded) instruction is embedded; pasted blobs become
+        # cheap features, so latency stays flat for long pastes.
+        parts = split_prompt(prompt)
+        intent_sims, dim_sims = self.similarities(parts["instruction"])
+        return self.score_from_similarities(prompt, parts, intent_sims, dim_sims)
+
+    def similarities(self, instruction: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Raw cosine similarities of the instruction to every intent and
+        dimension prototype (the targets tier-0 is distilled from).
+        """
+        with stage("encode"):
+            prompt_vec = self.rep.encode_long(instruction, pooling=self.cfg.long_pooling)
+        with stage("intent_dimension"):
+            _, _, intent_sims = self.detect_intent(prompt_vec)
+            _, dim_sims = self.detect_missing_dimensions(prompt_vec)
+        return intent_sims, dim_sims
+
+    def score_from_similarities(
+        self,
+        prompt: str,
+        parts: Dict[str, Any],
+        intent_sims: Dict[str, float],
+        dim_sims: Dict[str, float],
+        tier: str = "full",
+    ) -> Dict[str, Any]:
+        features = attachment_features(parts["attachments"])
+        intent_sims = dict(intent_sims)
+        dim_sims = dict(dim_sims)
+
+        if features["has_logs"]:
+            intent_sims["debugging"] += self.cfg.logs_debugging_bonus
+        intent = max(intent_sims, key=intent_sims.get)
+        top_sim = intent_sims[intent]
+
+        if parts["attachments"]:
+            dim_sims["inputs"] = max(dim_sims["inputs"], self.cfg.attachment_inputs_sim)
+        missing_dims = [d for d in self.dim_vecs if dim_sims[d] < self.cfg.dim_threshold]
+        missing_dims.sort(key=lambda d: dim_sims[d])
         scores = self.compute_scores(missing_dims, dim_sims, top_sim)
 
         score_100 = int(round(100.0 * scores["overall"]))
@@ -276,6 +321,7 @@ class LocalScorer:
             "score": score_100,
             "label": label,
             "intent": intent,
+            "tier": tier,
             **scores,
             "missing_dimensions": missing_dims,
             "missing_items": missing_items,
@@ -288,6 +334,11 @@ class LocalScorer:
                 "intent_similarities": {k: float(v) for k, v in intent_sims.items()},
                 "dimension_similarities": {k: float(v) for k, v in dim_sims.items()},
                 "dim_threshold": self.cfg.dim_threshold,
+                "content": {
+                    **features,
+                    "instruction_chars": len(parts["instruction"]),
+                    "instruction_truncated": parts["truncated"],
+                },
             }
         }
 
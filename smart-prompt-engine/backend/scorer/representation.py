@@ -3,6 +3,38 @@ import numpy as np
 from typing import List, Dict
 from collections import Counter
 
+# MiniLM truncates at 256 word-pieces (~1k chars of English); 4k chars is
+# always past that, so longer input is cut before tokenizing it at all.
+ENCODE_MAX_CHARS = 4096
+
+# Long-text mode: pre-truncate, window into overlapping chunks, encode the
+# chunks in one batch and pool. MAX_CHUNKS bounds the cost per call.
+LONG_MAX_CHARS = 8000
+CHUNK_CHARS = 1000
+CHUNK_OVERLAP = 200
+MAX_CHUNKS = 8
+POOL_TEMPERATURE = 0.1
+
+
+def _chunk_windows(text: str, chunk_chars: int, overlap: int) -> List[str]:
+    """
+    Overlapping windows whose ends snap back to whitespace (no split words).
+    """
+    chunks: List[str] = []
+    start = 0
+    n = len(text)
+    while start < n:
+        end = min(n, start + chunk_chars)
+        if end < n:
+            cut = text.rfind(" ", start + chunk_chars // 2, end)
+            if cut > 0:
+                end = cut
+        chunks.append(text[start:end].strip())
+        if end >= n:
+            break
+        start = max(start + 1, end - overlap)
+    return [c for c in chunks if c]
+
 
 class PromptRepresentation:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
@@ -16,9 +48,58 @@ class PromptRepresentation:
         """
         Convert prompt text into an embedding vector.
         """
-        embedding = self.model.encode(text, normalize_embeddings=True)
+        embedding = self.model.encode(text[:ENCODE_MAX_CHARS], normalize_embeddings=True)
         return embedding
 
+    def encode_long(
+        self,
+        text: str,
+        max_chars: int = LONG_MAX_CHARS,
+        chunk_chars: int = CHUNK_CHARS,
+        overlap: int = CHUNK_OVERLAP,
+        max_chunks: int = MAX_CHUNKS,
+        pooling: str = "mean",
+    ) -> np.ndarray:
+        """
+        Embedding for text longer than the model window.
+        Chunks are encoded in one batch and pooled ("mean", or "attention":
+        softmax weights by similarity to the centroid) into one normalized
+        vector. Short text goes through encode() unchanged.
+        """
+        text = (text or "")[:max_chars]
+        if len(text) <= chunk_chars:
+            return self.encode(text)
+
+        chunks = _chunk_windows(text, chunk_chars, overlap)
+        if len(chunks) > max_chunks:
+            # evenly spaced, always keeping the first and last window
+            idx = np.linspace(0, len(chunks) - 1, max_chunks).round().astype(int)
+            chunks = [chunks[i] for i in sorted(set(idx.tolist()))]
+
+        vecs = self.encode_batch(chunks)
+        if pooling == "attention":
+            centroid = vecs.mean(axis=0)
+            logits = vecs @ centroid / POOL_TEMPERATURE
+            w = np.exp(logits - logits.max())
+            pooled = (w[:, None] * vecs).sum(axis=0) / w.sum()
+        else:
+            pooled = vecs.mean(axis=0)
+
+        norm = float(np.linalg.norm(pooled))
+        return pooled / norm if norm > 0 else pooled
+
+    def encode_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Encode many texts in batched forward passes.
+        Returns a (len(texts), dim) array of normalized vectors.
+        """
+        return self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+
 
 class RequirementInferencer:
     def __init__(self, llm_client):
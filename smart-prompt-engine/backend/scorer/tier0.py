@@ -0,0 +1,184 @@
+# backend/scorer/tier0.py
+"""
+Tier-0 scorer: a linear model over hashed word / word-bigram / char-n-gram
+features that predicts LocalScorer's intent and dimension similarities
+without a transformer forward pass. Distilled offline with
+`python -m backend.scorer.distill_tier0`.
+"""
+from __future__ import annotations
+import os
+import re
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.metrics import stage
+from backend.scorer.content import split_prompt
+
+N_FEATURES = 2 ** 17
+CHAR_NGRAMS = (3, 4)
+# Typing-time prompts are short; features past this are not worth hashing.
+MAX_FEATURE_CHARS = 2000
+FEATURE_VERSION = 1
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent / "tier0.npz"
+# Intent margin below which tier-0 defers (distillation stores a fitted value).
+DEFAULT_MIN_MARGIN = 0.04
+# A dimension this close to the threshold is a coin flip -> defer.
+DIM_BAND = 0.015
+
+WORD = re.compile(r"[a-z0-9_']+")
+
+
+def _hash(key: str) -> Tuple[int, float]:
+    # Stable across processes (unlike hash()); top bit gives the sign.
+    h = zlib.crc32(key.encode("utf-8"))
+    return h % N_FEATURES, (1.0 if h & 0x80000000 else -1.0)
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str) -> Tuple[Tuple[int, float], ...]:
+    # Words repeat across keystrokes, so their unigram + char n-grams are cached.
+    feats = [_hash("w:" + word)]
+    padded = f" {word} "
+    for n in CHAR_NGRAMS:
+        for i in range(len(padded) - n + 1):
+            feats.append(_hash("c:" + padded[i:i + n]))
+    return tuple(feats)
+
+
+def featurize(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sparse (indices, values): signed hashed counts, sublinear tf, l2-normalized.
+    """
+    words = WORD.findall((text or "")[:MAX_FEATURE_CHARS].lower())
+    acc: Dict[int, float] = {}
+    for w in words:
+        for idx, sign in _word_features(w):
+            acc[idx] = acc.get(idx, 0.0) + sign
+    for a, b in zip(words, words[1:]):
+        idx, sign = _hash(f"b:{a} {b}")
+        acc[idx] = acc.get(idx, 0.0) + sign
+
+    if not acc:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idx = np.fromiter(acc.keys(), dtype=np.int64, count=len(acc))
+    vals = np.fromiter(acc.values(), dtype=np.float32, count=len(acc))
+    vals = np.sign(vals) * (1.0 + np.log(np.abs(vals) + 1e-9).clip(min=0.0))
+    norm = float(np.linalg.norm(vals))
+    if norm > 0:
+        vals /= norm
+    return idx, vals.astype(np.float32)
+
+
+class Tier0Model:
+    """
+    outputs = x @ W + b over the hashed features; output names are
+    "intent:<name>" / "dim:<name>" so the model is tied to the prototype set
+    it was distilled from.
+    """
+
+    def __init__(self, W: np.ndarray, b: np.ndarray, outputs: List[str], min_margin: float = DEFAULT_MIN_MARGIN):
+        self.W = W.astype(np.float32)
+        self.b = b.astype(np.float32)
+        self.outputs = list(outputs)
+        self.min_margin = float(min_margin)
+
+    def predict(self, text: str) -> Dict[str, float]:
+        idx, vals = featurize(text)
+        out = self.b + (vals @ self.W[idx] if len(idx) else 0.0)
+        return {name: float(v) for name, v in zip(self.outputs, out)}
+
+    def save(self, path: Path) -> None:
+        np.savez_compressed(
+            path, W=self.W, b=self.b, outputs=np.asarray(self.outputs),
+            min_margin=np.float32(self.min_margin),
+            n_features=np.int64(N_FEATURES), feature_version=np.int64(FEATURE_VERSION),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Tier0Model"]:
+        path = Path(path)
+        if not path.exists():
+            return None
+        z = np.load(path, allow_pickle=False)
+        if int(z["n_features"]) != N_FEATURES or int(z["feature_version"]) != FEATURE_VERSION:
+            return None  # distilled with a different featurizer
+        return cls(z["W"], z["b"], [str(o) for o in z["outputs"]], float(z["min_margin"]))
+
+
+def split_outputs(pred: Dict[str, float]) -> Tuple[Dict[str, float], Dict[str, float]]:
+    intent_sims = {k[7:]: v for k, v in pred.items() if k.startswith("intent:")}
+    dim_sims = {k[4:]: v for k, v in pred.items() if k.startswith("dim:")}
+    return intent_sims, dim_sims
+
+
+class Tier0Scorer:
+    """
+    Keystroke-rate scoring: predicted similarities go through the same
+    LocalScorer post-processing as the full path. Returns None when the
+    prediction is too close to a decision boundary to trust.
+    """
+
+    def __init__(self, model: Tier0Model, local_scorer):
+        self.model = model
+        self.local = local_scorer
+        expected = [f"intent:{k}" for k in local_scorer.intent_vecs] + [f"dim:{k}" for k in local_scorer.dim_vecs]
+        if sorted(expected) != sorted(model.outputs):
+            raise ValueError("tier-0 model was distilled from a different prototype set")
+
+    @classmethod
+    def load(cls, local_scorer, path: Optional[str] = None) -> Optional["Tier0Scorer"]:
+        model = Tier0Model.load(Path(path or os.getenv("SPE_TIER0_PATH", "") or DEFAULT_MODEL_PATH))
+        if model is None:
+            return None
+        try:
+            return cls(model, local_scorer)
+        except ValueError:
+            return None
+
+    def confident(self, intent_sims: Dict[str, float], dim_sims: Dict[str, float]) -> bool:
+        top = sorted(intent_sims.values(), reverse=True)
+        if len(top) > 1 and top[0] - top[1] < self.model.min_margin:
+            return False
+        thr = self.local.cfg.dim_threshold
+        return all(abs(v - thr) >= DIM_BAND for v in dim_sims.values())
+
+    def score(self, prompt: str) -> Optional[Dict[str, Any]]:
+        prompt = (prompt or "").strip()
+        if not prompt:
+            return None
+        t0 = time.perf_counter()
+        parts = split_prompt(prompt)
+        with stage("tier0_predict"):
+            intent_sims, dim_sims = split_outputs(self.model.predict(parts["instruction"]))
+        if not self.confident(intent_sims, dim_sims):
+            return None
+        out = self.local.score_from_similarities(prompt, parts, intent_sims, dim_sims, tier="tier0")
+        out["debug"]["tier0_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        return out
+
+
+class TypingTracker:
+    """
+    Per-user gap between consecutive /score calls. Calls closer together
+    than fast_gap_s mean the user is still typing.
+    """
+
+    def __init__(self, fast_gap_s: float = 2.0, max_users: int = 10_000):
+        self.fast_gap_s = fast_gap_s
+        self.max_users = max_users
+        self.last: Dict[str, float] = {}
+
+    def is_typing_fast(self, user_id: str, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        prev = self.last.get(user_id)
+        self.last[user_id] = now
+        if len(self.last) > self.max_users:
+            cutoff = now - self.fast_gap_s
+            self.last = {k: v for k, v in self.last.items() if v >= cutoff}
+        return prev is not None and now - prev <= self.fast_gap_s
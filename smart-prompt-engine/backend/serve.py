@@ -0,0 +1,173 @@
+# backend/serve.py
+"""
+Pre-fork production launcher.
+
+    python -m backend.serve --host 0.0.0.0 --port 8000 --workers 4
+
+The parent imports backend.api once (loading the encoder), warms it and
+binds the listening socket, then forks the workers. Model weights are
+shared copy-on-write instead of being loaded per worker. Each worker
+gets cpus // workers torch intra-op threads so cores are not
+oversubscribed. Dead workers are restarted with exponential backoff; a
+slot whose worker dies within MIN_UPTIME_S MAX_FAST_FAILURES times in a
+row (e.g. a startup crash) stops the server with exit code 1, so the
+supervisor sees the failure. SIGTERM/SIGINT stop all.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, Tuple
+
+MIN_UPTIME_S = 10.0
+MAX_FAST_FAILURES = 5
+RESTART_BACKOFF_S = 0.5
+RESTART_BACKOFF_MAX_S = 30.0
+
+
+def _set_torch_threads(n: int) -> None:
+    try:
+        import torch
+        torch.set_num_threads(n)
+    except Exception:
+        pass
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, threads: int, log_level: str) -> None:
+    import uvicorn
+    from backend import api
+
+    _set_torch_threads(threads)
+    config = uvicorn.Config(api.app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    if not server.started:  # uvicorn returns quietly when lifespan startup fails
+        raise RuntimeError("worker startup failed")
+
+
+def _restart_delay(fast_failures: int) -> float:
+    return min(RESTART_BACKOFF_MAX_S, RESTART_BACKOFF_S * 2 ** max(0, fast_failures - 1))
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 2
+    ap = argparse.ArgumentParser(description="Pre-fork Smart Prompt Engine server")
+    ap.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    ap.add_argument("--workers", type=int, default=int(os.getenv("SPE_WORKERS", max(1, cpus // 2))))
+    ap.add_argument("--threads-per-worker", type=int, default=int(os.getenv("SPE_TORCH_THREADS", 0)))
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args()
+    threads = args.threads_per_worker or max(1, cpus // args.workers)
+
+    # Single-threaded torch in the parent: no intra-op thread pool exists
+    # at fork time, which is what makes forking after warmup safe.
+    _set_torch_threads(1)
+    t0 = time.perf_counter()
+    from backend import api
+    api.warmup()
+    print(f"[serve] model loaded + warmed in {time.perf_counter() - t0:.1f}s "
+          f"({args.workers} workers x {threads} torch threads)", flush=True)
+
+    sock = _bind(args.host, args.port)
+    # Keep the collector from touching (and so copying) the shared heap.
+    gc.freeze()
+
+    children: Dict[int, Tuple[int, float]] = {}  # pid -> (slot, started)
+    restart_at: Dict[int, float] = {}  # slot -> monotonic time
+    fast_failures = [0] * args.workers
+    stopping = False
+    exit_code = 0
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 1
+            try:
+                _run_worker(sock, threads, args.log_level)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(args.workers):
+        spawn(slot)
+
+    while children or (restart_at and not stopping):
+        now = time.monotonic()
+        for slot, at in list(restart_at.items()):
+            if at <= now and not stopping:
+                del restart_at[slot]
+                spawn(slot)
+        try:
+            if restart_at:
+                # a restart is due soon: poll instead of blocking in wait()
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    time.sleep(0.1)
+                    continue
+            else:
+                pid, status = os.wait()
+        except ChildProcessError:
+            if restart_at and not stopping:
+                time.sleep(0.1)
+                continue
+            break
+        except InterruptedError:
+            continue
+        slot, started = children.pop(pid, (None, 0.0))
+        if slot is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        uptime = time.monotonic() - started
+        fast_failures[slot] = fast_failures[slot] + 1 if uptime < MIN_UPTIME_S else 0
+        if fast_failures[slot] >= MAX_FAST_FAILURES:
+            print(f"[serve] worker slot {slot} died {fast_failures[slot]} times within {MIN_UPTIME_S:.0f}s "
+                  f"of starting (last exit {code}); giving up", flush=True)
+            exit_code = 1
+            stop(signal.SIGTERM, None)
+            continue
+        delay = _restart_delay(fast_failures[slot])
+        print(f"[serve] worker {pid} exited ({code}) after {uptime:.1f}s; restarting in {delay:.1f}s", flush=True)
+        restart_at[slot] = time.monotonic() + delay
+
+    sock.close()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
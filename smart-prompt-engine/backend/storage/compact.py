@@ -0,0 +1,431 @@
+# backend/storage/compact.py
+"""
+Columnar compaction of closed feedback segments.
+
+A chunk (chunk-<ts min ms>-<ts max ms>-<id>.npz, zlib-compressed) stores one
+array per column. String columns are dictionary-encoded: int32 codes plus
+a dictionary stored as one UTF-8 blob + offsets. prompt and card_text share
+one dictionary, so a text repeated across events (or used as both) is
+stored once. Fields outside the fixed columns go to a dictionary-encoded
+JSON "extra" column. Each chunk also carries its source segment names and
+the summary aggregates of its events.
+
+    python -m backend.storage.compact run
+    python -m backend.storage.compact query --type rewrite_click --since 2026-01-01 --columns ts,intent
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.storage import feedback
+
+try:
+    import fcntl
+except Exception:  # not available on Windows
+    fcntl = None  # type: ignore
+
+CHUNK_VERSION = 1
+FIXED_FIELDS = ("ts", "type", "intent", "card_index", "prompt", "card_text")
+DICT_COLUMNS = ("type", "intent", "extra")
+TEXT_COLUMNS = ("prompt", "card_text")
+COLUMNS = FIXED_FIELDS + ("extra",)
+DEFAULT_QUERY_COLUMNS = ("ts", "type", "intent", "card_index")
+# an exited writer may still be mid-batch when its segment ages out
+CLOSE_GRACE_S = 60.0
+
+_SEGMENT_NAME = re.compile(r"^feedback-(\d+)-(\d+)\.jsonl$")
+_CHUNK_NAME = re.compile(r"^chunk-(\d+)-(\d+)-[0-9a-f]+\.npz$")
+
+
+# -----------------------------
+# Dictionary encoding
+# -----------------------------
+
+
+def _encode(values: Sequence[Optional[str]], index: Dict[str, int], entries: List[str]) -> np.ndarray:
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        if v is None:
+            codes[i] = -1
+            continue
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(entries)
+            entries.append(v)
+        codes[i] = code
+    return codes
+
+
+def _pack_dict(entries: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    raw = [e.encode("utf-8") for e in entries]
+    offsets = np.zeros(len(raw) + 1, dtype=np.int64)
+    if raw:
+        offsets[1:] = np.cumsum([len(r) for r in raw])
+    return np.frombuffer(b"".join(raw), dtype=np.uint8), offsets
+
+
+def _unpack_dict(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _as_text(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    return v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+
+
+def write_chunk(directory: Path, events: List[Dict[str, Any]], sources: List[str],
+                agg: Dict[str, Any]) -> Path:
+    events = sorted(events, key=lambda e: float(e.get("ts", 0) or 0))
+    arrays: Dict[str, np.ndarray] = {
+        "ts": np.array([float(e.get("ts", 0) or 0) for e in events], dtype=np.float64),
+        "card_index": np.array(
+            [e["card_index"] if isinstance(e.get("card_index"), int) else -1 for e in events], dtype=np.int32
+        ),
+    }
+    for col in DICT_COLUMNS:
+        index: Dict[str, int] = {}
+        entries: List[str] = []
+        if col == "extra":
+            values = [
+                json.dumps({k: v for k, v in e.items() if k not in FIXED_FIELDS}, ensure_ascii=False, sort_keys=True)
+                if any(k not in FIXED_FIELDS for k in e) else None
+                for e in events
+            ]
+        else:
+            values = [_as_text(e.get(col)) for e in events]
+        arrays[col] = _encode(values, index, entries)
+        arrays[f"{col}.dict"], arrays[f"{col}.offsets"] = _pack_dict(entries)
+
+    texts_index: Dict[str, int] = {}
+    texts: List[str] = []
+    for col in TEXT_COLUMNS:
+        arrays[col] = _encode([_as_text(e.get(col)) for e in events], texts_index, texts)
+    arrays["texts.dict"], arrays["texts.offsets"] = _pack_dict(texts)
+
+    ts = arrays["ts"]
+    lo, hi = (float(ts[0]), float(ts[-1])) if len(ts) else (0.0, 0.0)
+    meta = {"version": CHUNK_VERSION, "rows": len(events), "ts_min": lo, "ts_max": hi,
+            "sources": sources, "agg": agg}
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+
+    name = f"chunk-{int(lo * 1000)}-{int(hi * 1000)}-{uuid.uuid4().hex[:8]}.npz"
+    tmp = directory / f".{name}.tmp.npz"
+    np.savez_compressed(tmp, **arrays)
+    tmp.replace(directory / name)
+    return directory / name
+
+
+class Chunk:
+    """
+    Lazy reader: np.load on an .npz only inflates the members accessed, so
+    a query touches just the columns (and dictionaries) it needs.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        self._dicts: Dict[str, List[str]] = {}
+        self.meta: Dict[str, Any] = json.loads(self._npz["meta"].tobytes().decode("utf-8"))
+
+    def close(self) -> None:
+        self._npz.close()
+
+    def array(self, col: str) -> np.ndarray:
+        return self._npz[col]
+
+    def dictionary(self, col: str) -> List[str]:
+        name = "texts" if col in TEXT_COLUMNS else col
+        if name not in self._dicts:
+            self._dicts[name] = _unpack_dict(self._npz[f"{name}.dict"], self._npz[f"{name}.offsets"])
+        return self._dicts[name]
+
+    def codes_for(self, col: str, values: Iterable[str]) -> np.ndarray:
+        wanted = set(values)
+        return np.array([i for i, v in enumerate(self.dictionary(col)) if v in wanted], dtype=np.int32)
+
+    def values(self, col: str, rows: np.ndarray) -> List[Any]:
+        arr = self.array(col)[rows]
+        if col == "ts":
+            return arr.tolist()
+        if col == "card_index":
+            return [None if v < 0 else int(v) for v in arr]
+        d = self.dictionary(col)
+        if col == "extra":
+            return [None if c < 0 else json.loads(d[c]) for c in arr]
+        return [None if c < 0 else d[c] for c in arr]
+
+    @classmethod
+    def tail_events(cls, path: Path, n: int) -> List[Dict[str, Any]]:
+        """
+        Last n events (by ts) rebuilt as the original dicts.
+        """
+        chunk = cls(path)
+        try:
+            rows = np.arange(max(0, chunk.meta["rows"] - n), chunk.meta["rows"])
+            cols = {c: chunk.values(c, rows) for c in COLUMNS}
+        finally:
+            chunk.close()
+        out = []
+        for i in range(len(rows)):
+            e = {c: cols[c][i] for c in FIXED_FIELDS if cols[c][i] is not None}
+            e.update(cols["extra"][i] or {})
+            out.append(e)
+        return out
+
+
+_meta_cache: Dict[str, Dict[str, Any]] = {}
+
+
+def chunk_paths(directory: Path) -> List[Path]:
+    if not directory.exists():
+        return []
+    return sorted(p for p in directory.glob("chunk-*.npz") if _CHUNK_NAME.match(p.name))
+
+
+def chunk_meta(path: Path) -> Dict[str, Any]:
+    # chunks are immutable once renamed into place
+    key = str(path)
+    meta = _meta_cache.get(key)
+    if meta is None:
+        chunk = Chunk(path)
+        meta = _meta_cache[key] = chunk.meta
+        chunk.close()
+    return meta
+
+
+def compacted_sources(directory: Path) -> set:
+    out = set()
+    for p in chunk_paths(directory):
+        out.update(chunk_meta(p)["sources"])
+    return out
+
+
+# -----------------------------
+# Compaction
+# -----------------------------
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def closed_segments(directory: Path, now: Optional[float] = None,
+                    max_age_s: float = feedback.SEGMENT_MAX_AGE_S) -> List[Path]:
+    """
+    A segment is closed when its writer moved on to a newer segment, when
+    it is older than the rotation age (writers rotate before appending to
+    an aged segment), or when its writer process is gone.
+    """
+    now = time.time() if now is None else now
+    segs: List[Tuple[int, int, Path]] = []
+    for p in directory.glob("feedback-*.jsonl"):
+        m = _SEGMENT_NAME.match(p.name)
+        if m:
+            segs.append((int(m.group(1)), int(m.group(2)), p))
+    newest: Dict[int, int] = {}
+    for pid, start, _ in segs:
+        newest[pid] = max(newest.get(pid, 0), start)
+    out = []
+    for pid, start, p in segs:
+        if (start < newest[pid] or start / 1000 + max_age_s + CLOSE_GRACE_S < now
+                or (pid != os.getpid() and not _pid_alive(pid))):
+            out.append(p)
+    return sorted(out)
+
+
+@contextmanager
+def _exclusive(directory: Path):
+    """
+    Non-blocking cross-process lock; yields False if another compaction
+    is running.
+    """
+    if fcntl is None:
+        yield True
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    with (directory / ".compact.lock").open("w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _remove_segment(path: Path) -> None:
+    for p in (path, path.with_name(path.name + feedback.AGG_SUFFIX)):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def compact(directory: Path = feedback.FEEDBACK_DIR, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fold every closed segment into one new chunk, then delete them. A crash
+    between the two leaves segments that the chunk already lists as
+    sources; readers skip those and the next run deletes them.
+    """
+    directory = Path(directory)
+    if not directory.exists():
+        return {"segments": 0, "events": 0}
+    with _exclusive(directory) as locked:
+        if not locked:
+            return {"skipped": "another compaction is running"}
+        done = compacted_sources(directory)
+        for side in directory.glob("feedback-*.jsonl" + feedback.AGG_SUFFIX):
+            # re-saved by a reader after its segment was compacted
+            if not side.with_name(side.name[:-len(feedback.AGG_SUFFIX)]).exists():
+                side.unlink(missing_ok=True)
+        segments = []
+        for p in closed_segments(directory, now):
+            if p.name in done:
+                _remove_segment(p)
+            else:
+                segments.append(p)
+        if not segments:
+            return {"segments": 0, "events": 0}
+
+        events: List[Dict[str, Any]] = []
+        bytes_in = 0
+        for p in segments:
+            bytes_in += p.stat().st_size
+            events.extend(feedback._parse(p.read_bytes().split(b"\n")))
+        agg = feedback._empty_agg()
+        for e in events:
+            feedback._fold(agg, e)
+
+        path = write_chunk(directory, events, [p.name for p in segments], agg)
+        for p in segments:
+            _remove_segment(p)
+        return {
+            "segments": len(segments),
+            "events": len(events),
+            "chunk": path.name,
+            "bytes_in": bytes_in,
+            "bytes_out": path.stat().st_size,
+        }
+
+
+# -----------------------------
+# Query
+# -----------------------------
+
+
+def _filter_rows(chunk: Chunk, start: Optional[float], end: Optional[float],
+                 types: Optional[Sequence[str]], intents: Optional[Sequence[str]]) -> np.ndarray:
+    n = chunk.meta["rows"]
+    mask = np.ones(n, dtype=bool)
+    if start is not None or end is not None:
+        ts = chunk.array("ts")
+        if start is not None:
+            mask &= ts >= start
+        if end is not None:
+            mask &= ts < end
+    if types:
+        mask &= np.isin(chunk.array("type"), chunk.codes_for("type", types))
+    if intents:
+        mask &= np.isin(chunk.array("intent"), chunk.codes_for("intent", intents))
+    return np.flatnonzero(mask)
+
+
+def _matches(e: Dict[str, Any], start: Optional[float], end: Optional[float],
+             types: Optional[Sequence[str]], intents: Optional[Sequence[str]]) -> bool:
+    ts = float(e.get("ts", 0) or 0)
+    return ((start is None or ts >= start) and (end is None or ts < end)
+            and (not types or e.get("type") in types) and (not intents or e.get("intent") in intents))
+
+
+def query(start: Optional[float] = None, end: Optional[float] = None,
+          types: Optional[Sequence[str]] = None, intents: Optional[Sequence[str]] = None,
+          columns: Sequence[str] = DEFAULT_QUERY_COLUMNS,
+          directory: Path = feedback.FEEDBACK_DIR) -> List[Dict[str, Any]]:
+    """
+    Events in [start, end) matching the type / intent filters, with only
+    the requested columns ("extra" holds any other fields). Chunks outside
+    the time range are skipped by name; live segments are scanned.
+    """
+    directory = Path(directory)
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown columns: {unknown} (available: {COLUMNS})")
+    out: List[Dict[str, Any]] = []
+
+    for p in chunk_paths(directory):
+        m = _CHUNK_NAME.match(p.name)
+        lo, hi = int(m.group(1)) / 1000, int(m.group(2)) / 1000
+        if (start is not None and hi < start - 0.001) or (end is not None and lo >= end):
+            continue
+        chunk = Chunk(p)
+        try:
+            rows = _filter_rows(chunk, start, end, types, intents)
+            if len(rows):
+                cols = {c: chunk.values(c, rows) for c in columns}
+                out.extend(dict(zip(columns, vals)) for vals in zip(*(cols[c] for c in columns)))
+        finally:
+            chunk.close()
+
+    for p in feedback._segment_paths(directory):
+        for e in feedback._parse(p.read_bytes().split(b"\n")):
+            if _matches(e, start, end, types, intents):
+                extra = {k: v for k, v in e.items() if k not in FIXED_FIELDS} or None
+                out.append({c: (extra if c == "extra" else e.get(c)) for c in columns})
+
+    out.sort(key=lambda r: r.get("ts") or 0)
+    return out
+
+
+def _parse_time(s: Optional[str]) -> Optional[float]:
+    if not s:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return datetime.fromisoformat(s).timestamp()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Feedback segment compaction and queries")
+    ap.add_argument("--dir", default=str(feedback.FEEDBACK_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("run", help="compact closed segments into a columnar chunk")
+    q = sub.add_parser("query", help="filter events (JSON lines on stdout)")
+    q.add_argument("--since", default=None, help="unix seconds or ISO date")
+    q.add_argument("--until", default=None, help="unix seconds or ISO date")
+    q.add_argument("--type", action="append", default=None)
+    q.add_argument("--intent", action="append", default=None)
+    q.add_argument("--columns", default=",".join(DEFAULT_QUERY_COLUMNS))
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        print(json.dumps(compact(Path(args.dir)), indent=2))
+    elif args.cmd == "query":
+        rows = query(_parse_time(args.since), _parse_time(args.until), args.type, args.intent,
+                     [c.strip() for c in args.columns.split(",") if c.strip()], Path(args.dir))
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
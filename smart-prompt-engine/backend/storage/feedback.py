@@ -1,43 +1,498 @@
 # backend/storage/feedback.py
+"""
+Feedback event log.
+
+append_feedback only enqueues; a background thread writes batches (one
+write() per batch) to a per-process segment file, so pre-forked workers
+never interleave lines and requests never wait on the disk. Segments
+(feedback-<pid>-<start ms>.jsonl) rotate by size or age; closed ones are
+compacted into columnar chunks by backend.storage.compact.
+
+    SPE_FEEDBACK_DIR=...              segment directory (default backend/storage/feedback)
+    SPE_FEEDBACK_FSYNC=interval       always | interval | off
+    SPE_FEEDBACK_SEGMENT_MB=16        rotate after this many bytes
+    SPE_FEEDBACK_SEGMENT_AGE_S=3600   ... or this many seconds
+    SPE_FEEDBACK_AUTOCOMPACT=1        compact closed segments after each rotation
+
+Reads never scan whole files: read_recent seeks backwards from the end of
+each segment, and summary() folds only bytes appended since the last call
+into per-segment aggregates, persisted next to the segment (.agg.json) so
+a restart resumes from the saved offset.
+"""
 from __future__ import annotations
+import atexit
 import json
+import os
+import queue
+import threading
 import time
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from backend.metrics import stage
+
+STORAGE_DIR = Path(__file__).resolve().parent
+# Single-file log written before segments existed; still read.
+FEEDBACK_PATH = STORAGE_DIR / "feedback.jsonl"
+FEEDBACK_DIR = Path(os.getenv("SPE_FEEDBACK_DIR", "") or STORAGE_DIR / "feedback")
+
+MAX_QUEUE = 10_000
+BATCH_SIZE = 256
+FLUSH_INTERVAL_S = 0.5
+FSYNC_POLICY = os.getenv("SPE_FEEDBACK_FSYNC", "interval").strip().lower()
+FSYNC_INTERVAL_S = 1.0
+# A failed write is retried on a fresh segment this many times, backing off
+# between attempts, before the batch is dropped (counted).
+WRITE_RETRIES = 3
+RETRY_BACKOFF_S = 0.1
+RETRY_BACKOFF_MAX_S = 5.0
+
+SEGMENT_MAX_BYTES = int(float(os.getenv("SPE_FEEDBACK_SEGMENT_MB", "16")) * 1024 * 1024)
+SEGMENT_MAX_AGE_S = float(os.getenv("SPE_FEEDBACK_SEGMENT_AGE_S", "3600"))
+AUTO_COMPACT = os.getenv("SPE_FEEDBACK_AUTOCOMPACT", "1").strip().lower() in ("1", "true", "yes")
+
+TAIL_BLOCK = 64 * 1024
+AGG_SUFFIX = ".agg.json"
+# read_recent() / summary() retry when a segment is compacted away while
+# it is being read
+SNAPSHOT_ATTEMPTS = 3
+
+
+class FeedbackWriter:
+    """
+    Bounded queue + batch flusher. A full queue drops the event (counted)
+    rather than blocking the request; so does a batch that still fails to
+    write after WRITE_RETRIES attempts.
+    """
+
+    def __init__(self, directory: Path = FEEDBACK_DIR, fsync: str = FSYNC_POLICY,
+                 max_queue: int = MAX_QUEUE, batch_size: int = BATCH_SIZE,
+                 flush_interval_s: float = FLUSH_INTERVAL_S, max_segment_bytes: int = SEGMENT_MAX_BYTES,
+                 max_segment_age_s: float = SEGMENT_MAX_AGE_S, auto_compact: bool = AUTO_COMPACT):
+        self.directory = Path(directory)
+        self.fsync = fsync if fsync in ("always", "interval", "off") else "interval"
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age_s = max_segment_age_s
+        self.auto_compact = auto_compact
+        self.q: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.failed_batches = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.compaction_failures = 0
+        self.last_compaction_error: Optional[str] = None
+        self._pid: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._last_fsync = 0.0
+        self.path: Optional[Path] = None  # current segment
+        self._seg_started = 0.0
+        self._seg_bytes = 0
+        self._compactor: Optional[threading.Thread] = None
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        thread = self._thread
+        # first event in this (forked) process, or the writer thread died
+        if self._pid != os.getpid() or thread is None or not thread.is_alive():
+            self._start()
+        try:
+            self.q.put_nowait(json.dumps(event, ensure_ascii=False) + "\n")
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._pid == os.getpid():
+                if self._thread is not None and self._thread.is_alive():
+                    return
+                # same process, dead thread: keep what is queued
+                self.restarts += 1
+                self._abandon_segment()
+            else:
+                # a forked child inherits the parent's queue contents and file
+                self.q = queue.Queue(maxsize=self.q.maxsize)
+                self._file = None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="spe-feedback-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self.q.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                continue
+            if first is None:
+                self._drain_and_close()
+                return
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_with_retry(batch)
+            if stop:
+                self._drain_and_close()
+                return
+
+    def _open_segment(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._seg_started = time.time()
+        self.path = self.directory / f"feedback-{os.getpid()}-{int(self._seg_started * 1000)}.jsonl"
+        self._file = self.path.open("ab")
+        self._seg_bytes = 0
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        if self.fsync != "off":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
 
-FEEDBACK_PATH = Path(__file__).resolve().parent / "feedback.jsonl"
+    def _abandon_segment(self) -> None:
+        f, self._file = self._file, None
+        if f is not None:
+            try:
+                f.close()
+            except Exception:
+                pass
+
+    def _compact_soon(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+
+        def run() -> None:
+            from backend.storage.compact import compact
+            try:
+                compact(self.directory)
+            except Exception as e:
+                self.compaction_failures += 1
+                self.last_compaction_error = f"{type(e).__name__}: {e}"
+
+        self._compactor = threading.Thread(target=run, name="spe-feedback-compact", daemon=True)
+        self._compactor.start()
+
+    def _write(self, batch: List[str]) -> None:
+        rotated = False
+        with stage("feedback_flush"):
+            # Age is checked before every write, so a segment older than
+            # max_segment_age_s is never appended to again (compact relies on it).
+            if self._file is not None and (self._seg_bytes >= self.max_segment_bytes
+                                           or time.time() - self._seg_started >= self.max_segment_age_s):
+                self._close_segment()
+                self.rotations += 1
+                rotated = True
+            if self._file is None:
+                self._open_segment()
+            data = "".join(batch).encode("utf-8")
+            self._file.write(data)
+            self._file.flush()
+            self._seg_bytes += len(data)
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= FSYNC_INTERVAL_S):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+        self.written += len(batch)
+        self.batches += 1
+        if rotated and self.auto_compact:
+            self._compact_soon()
+
+    def _write_with_retry(self, batch: List[str]) -> None:
+        """
+        Never raises: a failed write (disk full, directory gone) abandons the
+        segment so the retry opens a fresh one. A torn line left in the old
+        segment is skipped by readers.
+        """
+        for attempt in range(WRITE_RETRIES):
+            if attempt:
+                time.sleep(min(RETRY_BACKOFF_MAX_S, RETRY_BACKOFF_S * 2 ** (attempt - 1)))
+            try:
+                self._write(batch)
+                return
+            except Exception as e:
+                self.write_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._abandon_segment()
+        self.failed_batches += 1
+        self.dropped += len(batch)
+
+    def _drain_and_close(self) -> None:
+        rest: List[str] = []
+        while True:
+            try:
+                item = self.q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                rest.append(item)
+        if rest:
+            self._write_with_retry(rest)
+        try:
+            self._close_segment()
+        except Exception as e:
+            self.write_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._abandon_segment()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Flush everything queued and stop the writer thread.
+        """
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            if self._thread.is_alive():
+                self.q.put(None)
+                self._thread.join(timeout)
+            else:
+                self._drain_and_close()  # thread died: flush from here
+            self._thread = None
+            self._pid = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": self.q.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+            "failed_batches": self.failed_batches,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "compaction_failures": self.compaction_failures,
+            "last_compaction_error": self.last_compaction_error,
+            "segment": self.path.name if self.path else None,
+            "fsync": self.fsync,
+        }
+
+
+writer = FeedbackWriter()
+atexit.register(writer.close)
 
 
 def append_feedback(event: Dict[str, Any]) -> None:
     event = dict(event)
     event["ts"] = event.get("ts", time.time())
-    FEEDBACK_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with FEEDBACK_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    with stage("feedback_write"):
+        writer.submit(event)
 
 
-def read_recent(limit: int = 200) -> List[Dict[str, Any]]:
-    if not FEEDBACK_PATH.exists():
-        return []
-    lines = FEEDBACK_PATH.read_text(encoding="utf-8").splitlines()[-limit:]
+def _segment_paths(directory: Optional[Path] = None, done: Optional[set] = None) -> List[Path]:
+    """
+    JSONL segments not yet folded into a chunk (plus the legacy log for
+    the default directory). done: segment names already in a chunk, if
+    the caller has them.
+    """
+    from backend.storage.compact import compacted_sources
+
+    directory = directory or FEEDBACK_DIR
+    paths = sorted(directory.glob("feedback-*.jsonl")) if directory.exists() else []
+    if paths:
+        if done is None:
+            done = compacted_sources(directory)
+        paths = [p for p in paths if p.name not in done]
+    if directory == FEEDBACK_DIR and FEEDBACK_PATH.exists():
+        paths.insert(0, FEEDBACK_PATH)
+    return paths
+
+
+def _parse(lines: List[bytes]) -> List[Dict[str, Any]]:
     out = []
     for ln in lines:
         try:
             out.append(json.loads(ln))
         except Exception:
-            continue
+            continue  # blank or torn line
     return out
 
 
-def summary(limit: int = 500) -> Dict[str, Any]:
-    events = read_recent(limit=limit)
-    clicks = [e for e in events if e.get("type") == "rewrite_click"]
-    by_intent = {}
-    for e in clicks:
-        intent = e.get("intent", "other")
-        by_intent[intent] = by_intent.get(intent, 0) + 1
+def tail_lines(path: Path, n: int, block: int = TAIL_BLOCK) -> List[bytes]:
+    """
+    Last n non-empty lines, reading blocks backwards from the end.
+    """
+    if n <= 0:
+        return []
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        buf = b""
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]  # cut mid-line
+    return [ln for ln in lines if ln.strip()][-n:]
+
+
+def read_recent(limit: int = 200) -> List[Dict[str, Any]]:
+    for _ in range(SNAPSHOT_ATTEMPTS - 1):
+        try:
+            return _read_recent(limit)
+        except FileNotFoundError:
+            continue  # compacted mid-read; its chunk is listed next time
+    return _read_recent(limit, skip_missing=True)
+
+
+def _read_recent(limit: int, skip_missing: bool = False) -> List[Dict[str, Any]]:
+    from backend.storage.compact import Chunk, chunk_meta, chunk_paths
+
+    def tail_segment(p: Path) -> List[Dict[str, Any]]:
+        try:
+            return _parse(tail_lines(p, limit))
+        except FileNotFoundError:
+            if skip_missing:
+                return []
+            raise
+
+    # (newest event time, reader) for compacted chunks and live segments;
+    # chunks first, as in summary(), so no segment is read twice
+    metas = [(p, chunk_meta(p)) for p in chunk_paths(FEEDBACK_DIR)]
+    sources = [(meta["ts_max"], lambda p=p: Chunk.tail_events(p, limit)) for p, meta in metas]
+    for p in _segment_paths(done={name for _, m in metas for name in m["sources"]}):
+        try:
+            mtime = p.stat().st_mtime
+        except FileNotFoundError:
+            if skip_missing:
+                continue
+            raise
+        sources.append((mtime, lambda p=p: tail_segment(p)))
+    sources.sort(key=lambda s: s[0], reverse=True)
+
+    out: List[Dict[str, Any]] = []
+    for newest, read in sources:
+        # once we have enough events and this source predates the
+        # limit-th newest, nothing older can make the cut
+        if len(out) >= limit:
+            out.sort(key=lambda e: e.get("ts", 0), reverse=True)
+            del out[limit:]
+            if newest < out[-1].get("ts", 0):
+                break
+        out.extend(read())
+    out.sort(key=lambda e: e.get("ts", 0))
+    return out[-limit:]
+
+
+# -----------------------------
+# Incremental aggregates
+# -----------------------------
+
+
+def _empty_agg() -> Dict[str, Any]:
+    return {"events": 0, "by_type": {}, "clicks_by_intent": {}, "clicks_by_card_index": {}}
+
+
+def _fold(agg: Dict[str, Any], event: Dict[str, Any]) -> None:
+    agg["events"] += 1
+    etype = str(event.get("type", "unknown"))
+    agg["by_type"][etype] = agg["by_type"].get(etype, 0) + 1
+    if etype == "rewrite_click":
+        intent = str(event.get("intent", "other"))
+        agg["clicks_by_intent"][intent] = agg["clicks_by_intent"].get(intent, 0) + 1
+        idx = str(event.get("card_index", "unknown"))
+        agg["clicks_by_card_index"][idx] = agg["clicks_by_card_index"].get(idx, 0) + 1
+
+
+def _merge(into: Dict[str, Any], agg: Dict[str, Any]) -> None:
+    into["events"] += agg["events"]
+    for field in ("by_type", "clicks_by_intent", "clicks_by_card_index"):
+        for k, v in agg[field].items():
+            into[field][k] = into[field].get(k, 0) + v
+
+
+def _sidecar(path: Path) -> Path:
+    return path.with_name(path.name + AGG_SUFFIX)
+
+
+def _load_sidecar(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        state = json.loads(_sidecar(path).read_text(encoding="utf-8"))
+        return state if isinstance(state.get("offset"), int) else None
+    except Exception:
+        return None
+
+
+def _save_sidecar(path: Path, state: Dict[str, Any]) -> None:
+    side = _sidecar(path)
+    tmp = side.with_name(f"{side.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    tmp.replace(side)
+
+
+# path -> {"offset": bytes folded, "agg": {...}}
+_agg_state: Dict[str, Dict[str, Any]] = {}
+_agg_lock = threading.Lock()
+
+
+def segment_aggregates(path: Path) -> Dict[str, Any]:
+    """
+    Aggregates for one segment, folding in only complete lines appended
+    after the last saved offset.
+    """
+    key = str(path)
+    size = path.stat().st_size
+    state = _agg_state.get(key) or _load_sidecar(path) or {"offset": 0, "agg": _empty_agg()}
+    if state["offset"] > size:  # truncated or replaced
+        state = {"offset": 0, "agg": _empty_agg()}
+    if state["offset"] < size:
+        with path.open("rb") as f:
+            f.seek(state["offset"])
+            chunk = f.read(size - state["offset"])
+        end = chunk.rfind(b"\n") + 1  # leave a torn last line for next time
+        if end:
+            agg = json.loads(json.dumps(state["agg"]))
+            for event in _parse(chunk[:end].split(b"\n")):
+                _fold(agg, event)
+            state = {"offset": state["offset"] + end, "agg": agg}
+            _save_sidecar(path, state)
+    _agg_state[key] = state
+    return state["agg"]
+
+
+def summary() -> Dict[str, Any]:
+    from backend.storage.compact import chunk_meta, chunk_paths
+
+    with _agg_lock:
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            # Chunks are listed once, before the segments: a segment named in
+            # any chunk's sources is counted there only. A segment that vanishes
+            # while being read went into a chunk newer than this snapshot, so
+            # start over rather than lose it.
+            metas = [chunk_meta(p) for p in chunk_paths(FEEDBACK_DIR)]
+            total = _empty_agg()
+            for meta in metas:
+                _merge(total, meta["agg"])
+            complete = True
+            for path in _segment_paths(done={name for m in metas for name in m["sources"]}):
+                try:
+                    _merge(total, segment_aggregates(path))
+                except FileNotFoundError:
+                    _agg_state.pop(str(path), None)
+                    complete = False
+            if complete:
+                break
     return {
-        "events": len(events),
-        "rewrite_clicks": len(clicks),
-        "clicks_by_intent": by_intent
+        "events": total["events"],
+        "rewrite_clicks": total["by_type"].get("rewrite_click", 0),
+        "clicks_by_intent": total["clicks_by_intent"],
+        "clicks_by_card_index": total["clicks_by_card_index"],
+        "events_by_type": total["by_type"],
     }
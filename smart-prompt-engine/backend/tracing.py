@@ -0,0 +1,322 @@
+# backend/tracing.py
+"""
+Lightweight request tracing.
+
+A sampled request gets a trace id (returned as X-SPE-Trace-Id) and every
+span(...) / metrics stage(...) inside it becomes a span with its parent.
+Finished traces go to a buffered, rotating JSONL file per process.
+
+    SPE_TRACE_SAMPLE=0.01      fraction of requests traced (X-SPE-Trace: 1 forces)
+    SPE_TRACE_DIR=...          output directory (default backend/storage/traces)
+
+Per-stage percentile tables:
+
+    python -m backend.tracing report [--dir DIR] [--endpoint /rewrite_suggestions]
+"""
+from __future__ import annotations
+import argparse
+import atexit
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_TRACE_DIR = Path(__file__).resolve().parent / "storage" / "traces"
+TRACE_SAMPLE = float(os.getenv("SPE_TRACE_SAMPLE", "0.01"))
+TRACE_DIR = Path(os.getenv("SPE_TRACE_DIR", "") or DEFAULT_TRACE_DIR)
+
+FLUSH_INTERVAL_S = 1.0
+MAX_PENDING_TRACES = 10_000
+ROTATE_BYTES = 20 * 1024 * 1024
+ROTATE_BACKUPS = 5
+
+
+class _Trace:
+    __slots__ = ("trace_id", "t0", "wall", "spans", "ids")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.t0 = perf_counter()
+        self.wall = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.ids = itertools.count(1)  # 0 is the root span
+
+
+# (trace, id of the innermost open span)
+_current: ContextVar[Optional[Tuple[_Trace, int]]] = ContextVar("spe_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("trace", "parent", "name", "attrs", "span_id", "start", "token")
+
+    def __init__(self, trace: _Trace, parent: int, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.parent = parent
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> "_Span":
+        self.span_id = next(self.trace.ids)
+        self.token = _current.set((self.trace, self.span_id))
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc) -> bool:
+        end = perf_counter()
+        _current.reset(self.token)
+        rec = {
+            "span": self.span_id,
+            "parent": self.parent,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.t0) * 1000, 3),
+            "dur_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.attrs:
+            rec["attrs"] = self.attrs
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        self.trace.spans.append(rec)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs: Any):
+    """
+    Nested timing span; a shared no-op when the request is not sampled.
+    """
+    cur = _current.get()
+    if cur is None:
+        return _NO_SPAN
+    return _Span(cur[0], cur[1], name, attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    cur = _current.get()
+    return cur[0].trace_id if cur else None
+
+
+class JsonlExporter:
+    """
+    Finished traces are queued (bounded, drops counted) and written by a
+    background thread every FLUSH_INTERVAL_S. One file per process so
+    pre-forked workers never interleave writes; rotated at ROTATE_BYTES.
+    flush() is serialized, so the atexit hook and the thread never race,
+    and a failed write drops that batch (counted) without killing the thread.
+    """
+
+    def __init__(self, directory: Path = TRACE_DIR, rotate_bytes: int = ROTATE_BYTES,
+                 backups: int = ROTATE_BACKUPS):
+        self.directory = Path(directory)
+        self.rotate_bytes = rotate_bytes
+        self.backups = backups
+        self.pending: deque = deque()
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._wake = threading.Event()
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f"traces-{os.getpid()}.jsonl"
+
+    def export(self, trace: _Trace, root: Dict[str, Any]) -> None:
+        if len(self.pending) >= MAX_PENDING_TRACES:
+            self.dropped += 1
+            return
+        self.pending.append((trace, root))
+        thread = self._thread
+        # first export in this (forked) process, or the thread died
+        if self._pid != os.getpid() or thread is None or not thread.is_alive():
+            self._start()
+
+    def _start(self) -> None:
+        if self._pid != os.getpid():
+            self._flush_lock = threading.Lock()  # may have been held at fork
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="spe-trace-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(FLUSH_INTERVAL_S)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.write_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def _rotate(self) -> None:
+        base = self.path
+        for i in range(self.backups - 1, 0, -1):
+            src = base.with_name(f"{base.name}.{i}")
+            if src.exists():
+                src.replace(base.with_name(f"{base.name}.{i + 1}"))
+        base.replace(base.with_name(f"{base.name}.1"))
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            lines: List[str] = []
+            traces = 0
+            while True:
+                try:
+                    trace, root = self.pending.popleft()
+                except IndexError:
+                    break
+                traces += 1
+                for rec in [root, *trace.spans]:
+                    lines.append(json.dumps({"trace": trace.trace_id, "ts": trace.wall, **rec}, default=str))
+            if not lines:
+                return
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except Exception:
+                self.dropped += traces
+                raise
+            self.written += len(lines)
+            if self.path.stat().st_size >= self.rotate_bytes:
+                self._rotate()
+
+
+exporter = JsonlExporter()
+atexit.register(exporter.flush)
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI: samples requests, opens the root span and reports the
+    trace id in X-SPE-Trace-Id.
+    """
+
+    def __init__(self, app, sample: float = TRACE_SAMPLE):
+        self.app = app
+        self.sample = sample
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        forced = any(k == b"x-spe-trace" and v not in (b"", b"0") for k, v in scope.get("headers", ()))
+        if not forced and (self.sample <= 0 or random.random() >= self.sample):
+            return await self.app(scope, receive, send)
+
+        trace = _Trace(uuid.uuid4().hex[:16])
+        token = _current.set((trace, 0))
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-spe-trace-id", trace.trace_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            root = {
+                "span": 0, "parent": None, "name": "request", "start_ms": 0.0,
+                "dur_ms": round((perf_counter() - trace.t0) * 1000, 3),
+                "attrs": {"endpoint": scope.get("path", ""), "method": scope.get("method", ""), "status": status},
+            }
+            exporter.export(trace, root)
+
+
+# -----------------------------
+# CLI: per-stage percentile tables
+# -----------------------------
+
+
+def _load(directory: Path) -> Dict[str, List[Dict[str, Any]]]:
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for p in sorted(directory.glob("traces-*.jsonl*")):
+        with p.open(encoding="utf-8") as f:
+            for ln in f:
+                try:
+                    rec = json.loads(ln)
+                except Exception:
+                    continue
+                traces.setdefault(rec["trace"], []).append(rec)
+    return traces
+
+
+def _pct(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def report(directory: Path, endpoint: Optional[str] = None) -> str:
+    traces = _load(directory)
+    by_endpoint: Dict[str, Dict[str, List[float]]] = {}
+    for spans in traces.values():
+        root = next((s for s in spans if s.get("span") == 0), None)
+        if root is None:
+            continue
+        ep = (root.get("attrs") or {}).get("endpoint", "?")
+        if endpoint and ep != endpoint:
+            continue
+        names = {s["span"]: s["name"] for s in spans}
+        parents = {s["span"]: s.get("parent") for s in spans}
+        table = by_endpoint.setdefault(ep, {})
+        for s in spans:
+            # nested spans are reported by path ("rewrite > llm_call")
+            path, parent = [s["name"]], s.get("parent")
+            while parent not in (None, 0) and parent in names:
+                path.append(names[parent])
+                parent = parents[parent]
+            table.setdefault(" > ".join(reversed(path)), []).append(s["dur_ms"])
+
+    out: List[str] = []
+    for ep, table in sorted(by_endpoint.items()):
+        n_req = len(table.get("request", []))
+        out.append(f"\n{ep}  ({n_req} traced requests)")
+        out.append(f"{'stage':<48} {'n':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        rows = sorted(table.items(), key=lambda kv: -sum(kv[1]))
+        for name, durs in rows:
+            d = sorted(durs)
+            out.append(f"{name[:48]:<48} {len(d):>6} {_pct(d, .5):>9.2f} {_pct(d, .9):>9.2f} "
+                       f"{_pct(d, .99):>9.2f} {d[-1]:>9.2f}")
+    return "\n".join(out).lstrip("\n") or "no traces found"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Trace tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("report", help="per-stage latency percentiles from trace files")
+    p.add_argument("--dir", default=str(TRACE_DIR))
+    p.add_argument("--endpoint", default=None)
+    args = ap.parse_args()
+    if args.cmd == "report":
+        print(report(Path(args.dir), args.endpoint))
+
+
+if __name__ == "__main__":
+    main()
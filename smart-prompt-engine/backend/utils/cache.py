@@ -2,8 +2,10 @@
 from __future__ import annotations
 import time
 import hashlib
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
 def normalize_prompt(prompt: str) -> str:
@@ -54,6 +56,60 @@ class TTLCache:
         self.store[key] = CacheItem(value=value, expires_at=now + self.ttl)
 
 
+def content_hash(*parts: str) -> str:
+    """
+    Fast content key (blake2b) over text + options; cheaper than sha256
+    for large pastes.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode("utf-8", errors="ignore"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ByteLRUCache:
+    """
+    LRU bounded by total payload bytes instead of item count, so one huge
+    entry can't blow the memory budget. size_of(value) -> bytes.
+    """
+
+    def __init__(self, max_bytes: int, size_of: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.store: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self.store.get(key)
+            if item is None:
+                return None
+            self.store.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, value: Any, size: Optional[int] = None) -> bool:
+        """
+        size overrides size_of(value), e.g. when the key is the payload.
+        """
+        size = self.size_of(value) if size is None else size
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self.store.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            while self.store and self.bytes + size > self.max_bytes:
+                _, (_, evicted) = self.store.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+            self.store[key] = (value, size)
+            self.bytes += size
+        return True
+
+
 class SimpleRateLimiter:
     """
     Token bucket-ish (simple sliding window):
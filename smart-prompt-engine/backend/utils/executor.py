@@ -0,0 +1,134 @@
+# backend/utils/executor.py
+from __future__ import annotations
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Recent wait times kept per executor for percentile metrics.
+WAIT_SAMPLES = 1024
+MAX_RETRY_AFTER_S = 30
+
+
+class Overloaded(Exception):
+    """
+    Raised instead of queueing without bound. status 429 = queue full
+    (rejected on arrival), 503 = deadline passed while queued or running.
+    """
+
+    def __init__(self, workload: str, status: int, retry_after: int, reason: str):
+        super().__init__(f"{workload}: {reason}")
+        self.workload = workload
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _DeadlinePassed(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Dedicated thread pool for one workload class (encode / compress / llm).
+    At most max_workers run and max_queue wait; anything beyond that is
+    rejected immediately. Work that waited past its deadline is dropped
+    before it starts, and callers stop waiting at the deadline.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, deadline_s: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.deadline_s = deadline_s
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"spe-{name}")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self._waits: deque = deque(maxlen=WAIT_SAMPLES)
+        # EWMA of run time, for Retry-After estimates
+        self._service_s = 0.05
+
+    def _retry_after(self) -> int:
+        backlog = (self.queued + self.running) / max(1, self.max_workers)
+        return max(1, min(MAX_RETRY_AFTER_S, math.ceil(backlog * self._service_s)))
+
+    async def run(self, fn: Callable[..., Any], *args: Any, deadline_s: Optional[float] = None, **kwargs: Any) -> Any:
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        with self._lock:
+            if self.queued + self.running >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.name, 429, self._retry_after(), "queue full")
+            self.queued += 1
+            self.submitted += 1
+        enqueued = time.monotonic()
+
+        def task() -> Any:
+            started = time.monotonic()
+            waited = started - enqueued
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.started += 1
+                self.wait_total_s += waited
+                self.wait_max_s = max(self.wait_max_s, waited)
+                self._waits.append(waited)
+            try:
+                if waited >= deadline_s:
+                    raise _DeadlinePassed()
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self._service_s = 0.8 * self._service_s + 0.2 * (time.monotonic() - started)
+
+        # carry the request context (trace spans) into the pool thread
+        fut = self._pool.submit(contextvars.copy_context().run, task)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(fut), timeout=deadline_s)
+        except (asyncio.TimeoutError, _DeadlinePassed):
+            if fut.cancel():
+                with self._lock:
+                    self.queued -= 1
+            with self._lock:
+                self.timed_out += 1
+            raise Overloaded(self.name, 503, self._retry_after(), "deadline exceeded")
+        except asyncio.CancelledError:
+            # caller went away (e.g. a cancelled prefetch): drop it if not started
+            if fut.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            n = len(waits)
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "deadline_s": self.deadline_s,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "wait_ms_avg": round(1000 * self.wait_total_s / max(1, self.started), 3),
+                "wait_ms_p50": round(1000 * waits[n // 2], 3) if n else 0.0,
+                "wait_ms_p99": round(1000 * waits[min(n - 1, int(n * 0.99))], 3) if n else 0.0,
+                "wait_ms_max": round(1000 * self.wait_max_s, 3),
+            }
@@ -443,13 +443,18 @@ function createWidget() {
 
 let widget = createWidget();
 let debounceTimer = null;
+let settleTimer = null;
 let lastRewrite = null;
 
 const SCORE_DEBOUNCE_MS = 700;
+// After a fast (tier-0) score, re-score with the full model once typing settles.
+const SCORE_SETTLE_MS = 1500;
 const LLM_MIN_LEN = 12;
 const LLM_SCORE_THRESHOLD = 75;
 const REWRITE_THROTTLE_MS = 1200;
 const REWRITE_IDLE_BYPASS_MS = 800;
+// Server answers with local cards (meta.source="local") if the LLM is slower.
+const REWRITE_DEADLINE_MS = 2500;
 
 let lastSentText = "";
 let lastMeaningfulText = "";
@@ -468,6 +473,12 @@ let rewriteSessionActive = false;
 const scoreCache = new Map();
 const llmCache = new Map();
 
+function cacheRewrite(text, r) {
+    // Local fallback cards are not cached: the next call picks up the LLM result.
+    if (r?.meta?.source === "local") return;
+    llmCache.set(text, r);
+}
+
 let tokenUIReady = false;
 let tokenInputText = "";
 let lastToken = null;
@@ -634,6 +645,22 @@ function setupTokenSaverUI(trimmed) {
     tokenStatus.textContent = tokenSaverReadyText(bigText.length);
 }
 
+function scheduleSettledScore(scoringPrompt, callId, scoreEl) {
+    clearTimeout(settleTimer);
+    settleTimer = setTimeout(async () => {
+        if (callId !== lastCallId) return;
+        try {
+            const s = await postJSON("/score", { prompt: scoringPrompt, tier: "full" });
+            scoreCache.set(scoringPrompt, s);
+            if (callId !== lastCallId) return;
+            setDraftScore(scoreEl, typeof s.score === "number" ? s.score : null, s.intent || "other");
+            syncMiniView(widget);
+        } catch (e) {
+            console.error("[SPE] settled /score failed:", e);
+        }
+    }, SCORE_SETTLE_MS);
+}
+
 async function updateForText(text) {
     const callId = ++lastCallId;
     const trimmed = normalizeText(text);
@@ -683,8 +710,8 @@ async function updateForText(text) {
         try {
             let r = llmCache.get(trimmed);
             if (!r) {
-                r = await postJSON("/rewrite_suggestions", { prompt: trimmed });
-                llmCache.set(trimmed, r);
+                r = await postJSON("/rewrite_suggestions", { prompt: trimmed, deadline_ms: REWRITE_DEADLINE_MS });
+                cacheRewrite(trimmed, r);
             }
             if (callId !== lastCallId) return;
 
@@ -757,7 +784,7 @@ async function updateForText(text) {
         let s = scoreCache.get(scoringPrompt);
         if (!s) {
             s = await postJSON("/score", { prompt: scoringPrompt });
-            scoreCache.set(scoringPrompt, s);
+            if (s?.tier !== "tier0") scoreCache.set(scoringPrompt, s);
         }
 
         if (callId !== lastCallId) return;
@@ -767,6 +794,7 @@ async function updateForText(text) {
         const intent = s.intent || "other";
         setDraftScore(scoreEl, score, intent);
         syncMiniView(widget);
+        if (s?.tier === "tier0") scheduleSettledScore(scoringPrompt, callId, scoreEl);
         statusEl.textContent = "Analysis updated.";
         scheduleReposition();
 
@@ -841,8 +869,8 @@ async function updateForText(text) {
 
             lastRewriteAt = now;
             lastRewritePrompt = trimmed;
-            r = await postJSON("/rewrite_suggestions", { prompt: trimmed });
-            llmCache.set(trimmed, r);
+            r = await postJSON("/rewrite_suggestions", { prompt: trimmed, deadline_ms: REWRITE_DEADLINE_MS });
+            cacheRewrite(trimmed, r);
         }
 
         if (callId !== lastCallId) return;
@@ -906,6 +934,7 @@ function bindPromptBox(box) {
     repositionWidget(widget, activePromptEl);
     const onChange = () => {
         clearTimeout(debounceTimer);
+        clearTimeout(settleTimer);
         lastInputAt = Date.now();
         debounceTimer = setTimeout(() => {
             const clean = normalizeText(getPromptText(box));
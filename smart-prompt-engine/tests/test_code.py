@@ -0,0 +1,107 @@
+# tests/test_code.py
+import unittest
+
+from backend.compress.code import compress_code
+
+CODE = "def add(a, b):\n    return a + b\n"
+
+PY = '''import os
+
+
+class Store:
+    """Key-value store."""
+
+    def get(self, key):
+        """Return the value for key."""
+        path = os.path.join(self.root, key)
+        with open(path) as f:
+            return f.read()
+
+    def put(self, key, value):
+        path = os.path.join(self.root, key)
+        # TODO: write atomically
+        with open(path, "w") as f:
+            f.write(value)
+
+
+def load_config(path):
+    data = open(path).read()
+    parsed = parse(data)
+    return parsed
+'''
+
+# "import" makes this look like Python; ast.parse fails, so braces decide
+JS = '''import React from 'react';
+
+function add(a, b) {
+  const s = a + b;
+  console.log(s);
+  return s;
+}
+
+export function render(items) {
+  const out = [];
+  for (const i of items) {
+    out.push(i);
+  }
+  return out;
+}
+'''
+
+
+def _skeleton(text: str, query: str = ""):
+    r = compress_code(text, mode="skeleton", query=query)
+    return r["compressed"], r["stats"]
+
+
+class ModeTest(unittest.TestCase):
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compress_code(CODE, mode="skeletons")
+
+    def test_known_modes_run(self):
+        for mode in ("lines", "skeleton"):
+            self.assertIn("compressed", compress_code(CODE, mode=mode))
+
+
+class SkeletonTest(unittest.TestCase):
+    def test_bodies_dropped_signatures_and_docstrings_kept(self):
+        out, stats = _skeleton(PY)
+        self.assertEqual(stats["strategy"], "python_ast")
+        for kept in ("import os", "class Store:", '"""Key-value store."""', "def get(self, key):",
+                     '"""Return the value for key."""', "def load_config(path):"):
+            self.assertIn(kept, out)
+        self.assertNotIn("return f.read()", out)
+        self.assertNotIn("parsed = parse(data)", out)
+        self.assertIn("...  # 3 lines elided", out)
+
+    def test_todo_body_is_kept(self):
+        out, stats = _skeleton(PY)
+        self.assertIn("# TODO: write atomically", out)
+        self.assertIn('f.write(value)', out)
+        self.assertEqual((stats["functions_elided"], stats["functions_kept"]), (2, 1))
+
+    def test_body_named_in_prompt_is_kept(self):
+        out, stats = _skeleton(PY, query="why does load_config crash?")
+        self.assertIn("parsed = parse(data)", out)
+        self.assertNotIn("return f.read()", out)
+        self.assertEqual((stats["functions_elided"], stats["functions_kept"]), (1, 2))
+
+    def test_syntax_error_falls_back_to_brace_matching(self):
+        out, stats = _skeleton(JS)
+        self.assertEqual(stats["strategy"], "brace_matcher")
+        self.assertIn("function add(a, b) {", out)
+        self.assertIn("export function render(items) {", out)
+        self.assertNotIn("console.log(s);", out)
+        self.assertNotIn("out.push(i);", out)
+
+    def test_broken_python_uses_indent_fallback(self):
+        broken = PY.replace("def load_config(path):", "def load_config(path:")
+        out, stats = _skeleton(broken + "\ndef tail(x):\n    y = x\n    return y\n")
+        self.assertEqual(stats["strategy"], "python_indent_fallback")
+        self.assertIn("def tail(x):", out)
+        self.assertNotIn("y = x", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
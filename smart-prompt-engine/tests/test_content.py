@@ -0,0 +1,21 @@
+# tests/test_content.py
+import importlib.util
+import unittest
+
+
+@unittest.skipUnless(importlib.util.find_spec("sentence_transformers"), "needs the scorer dependencies")
+class SplitPromptTest(unittest.TestCase):
+    def test_comma_prose_stays_in_instruction(self):
+        from backend.scorer.content import split_prompt
+
+        lines = ["I went to the market, and I bought some apples",
+                 "Then I walked home, which took a while",
+                 "My sister called, asking about dinner"]
+        prompt = "Summarize this for me:\n" + "\n".join(lines * 3)
+        out = split_prompt(prompt)
+        self.assertEqual(out["attachments"], [])
+        self.assertIn(lines[1], out["instruction"])
+
+
+if __name__ == "__main__":
+    unittest.main()
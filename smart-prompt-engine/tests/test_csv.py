@@ -0,0 +1,81 @@
+# tests/test_csv.py
+import csv
+import unittest
+
+from backend.compress.csv import compress_csv
+
+ROWS = ["id,status,city"] + [f"{i},{'ok' if i % 3 else 'fail'},{'NYC' if i % 2 else 'Los Angeles'}"
+                             for i in range(1, 13)]
+
+
+class LosslessTest(unittest.TestCase):
+    def test_blank_rows_are_kept_in_place(self):
+        rows = list(ROWS)
+        rows.insert(4, "")
+        rows.insert(9, "")
+        r = compress_csv("\n".join(rows), mode="lossless")
+        self.assertEqual(r["stats"]["blank_rows"], 2)
+        table = r["compressed"].split("rows:\n", 1)[1].split("\n")
+        self.assertEqual([i for i, ln in enumerate(table) if not ln], [4, 9])
+        self.assertEqual(len(table), len(rows))
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compress_csv("\n".join(ROWS), mode="losless")
+
+
+def _decode(compressed: str):
+    """
+    Rebuild rows from lossless output (int deltas and plain dictionary
+    values only); stops at the omitted-rows note.
+    """
+    head, body = compressed.split("\nrows:\n", 1)
+    decoders = {}
+    for ln in head.split("\n")[2:]:
+        name, spec = ln[2:].split(": ", 1)
+        if spec.startswith("delta"):
+            decoders[name] = "delta"
+        else:
+            decoders[name] = dict(pair.split("=", 1) for pair in spec.split(", "))
+    lines = [ln for ln in body.split("\n") if not ln.startswith("... (")]
+    table = list(csv.reader(lines))
+    header, out, prev = table[0], [table[0]], {}
+    for row in table[1:]:
+        dec = []
+        for name, cell in zip(header, row):
+            d = decoders.get(name)
+            if d == "delta":
+                cell = str(prev[name] + int(cell[1:])) if name in prev else cell
+                prev[name] = int(cell)
+            elif d is not None:
+                cell = d[cell]
+            dec.append(cell)
+        out.append(dec)
+    return out
+
+
+class BudgetTest(unittest.TestCase):
+    rows = ["id,status,city"] + [f"{100000 + i * 7},{'ok' if i % 3 else 'failed'},"
+                                 f"{'New York' if i % 2 else 'Los Angeles'}" for i in range(50)]
+
+    def test_budgeted_lossless_output_decodes(self):
+        for budget in (30, 120, 250):
+            r = compress_csv("\n".join(self.rows), mode="lossless", target_tokens=budget)
+            decoded = _decode(r["compressed"])
+            original = list(csv.reader(self.rows))
+            self.assertEqual(decoded, original[:len(decoded)])
+            self.assertEqual(r["stats"]["dropped_rows"], 50 - (len(decoded) - 1))
+
+    def test_tiny_budget_keeps_legend_and_header(self):
+        r = compress_csv("\n".join(self.rows), mode="lossless", target_tokens=30)
+        self.assertIn("- status: s1=ok, s2=failed", r["compressed"])
+        self.assertIn("\nid,status,city\n", r["compressed"])
+        self.assertEqual(r["stats"]["dropped_rows"], 50)
+
+    def test_summary_keeps_header_lines(self):
+        r = compress_csv("\n".join(self.rows), target_tokens=5)
+        self.assertTrue(r["compressed"].startswith("CSV COMPRESSED SUMMARY\ncolumns (3): id, status, city"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+# tests/test_dedupe.py
+import os
+import subprocess
+import sys
+import unittest
+
+from backend.compress.dedupe import minhash_signatures, near_duplicate_clusters
+
+UNITS = ["error connecting to db host 0 retry 0", "user logged in from #", "x"]
+SCRIPT = ("from backend.compress.dedupe import minhash_signatures; "
+          f"print(minhash_signatures({UNITS!r}).sum())")
+
+
+class SignatureStabilityTest(unittest.TestCase):
+    def test_same_signatures_in_every_process(self):
+        out = set()
+        for seed in ("1", "2"):
+            env = {**os.environ, "PYTHONHASHSEED": seed}
+            out.add(subprocess.run([sys.executable, "-c", SCRIPT], env=env, check=True,
+                                   capture_output=True, text=True).stdout.strip())
+        self.assertEqual(out, {str(minhash_signatures(UNITS).sum())})
+
+
+class MaxUnitsTest(unittest.TestCase):
+    def test_units_past_the_cap_only_merge_exact_copies(self):
+        base = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu"
+        units = [base, "one two three four five six", base + " nu", "one two three four five six"]
+        self.assertEqual(near_duplicate_clusters(units), [0, 1, 0, 1])
+        self.assertEqual(near_duplicate_clusters(units, max_units=2), [0, 1, 2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# tests/test_feedback.py
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from backend.storage import compact, feedback
+from backend.storage.feedback import FeedbackWriter
+
+
+def _wait(cond, timeout: float = 5.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _events(directory: Path):
+    return [json.loads(ln) for p in sorted(directory.glob("feedback-*.jsonl"))
+            for ln in p.read_text().splitlines() if ln.strip()]
+
+
+class WriterResilienceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def _writer(self, directory: Path) -> FeedbackWriter:
+        return FeedbackWriter(directory=directory, fsync="off", flush_interval_s=0.02, auto_compact=False)
+
+    def test_write_error_keeps_thread_alive(self):
+        blocker = self.tmp / "blocked"
+        blocker.write_text("not a directory")
+        w = self._writer(blocker / "fb")
+        w.submit({"n": 1})
+        self.assertTrue(_wait(lambda: w.failed_batches == 1))
+        self.assertTrue(w._thread.is_alive())
+        self.assertEqual(w.dropped, 1)
+
+        blocker.unlink()
+        w.submit({"n": 2})
+        w.close()
+        self.assertEqual(_events(blocker / "fb"), [{"n": 2}])
+
+    def test_dead_thread_is_restarted_by_submit(self):
+        w = self._writer(self.tmp)
+        w.submit({"n": 1})
+        self.assertTrue(_wait(lambda: w.written == 1))
+        # stop the thread behind the writer's back, as a crash would
+        w.q.put(None)
+        w._thread.join(5)
+        w.submit({"n": 2})
+        w.close()
+        self.assertEqual(w.restarts, 1)
+        self.assertEqual(_events(self.tmp), [{"n": 1}, {"n": 2}])
+
+
+def _closed_segment(tmp: Path) -> Path:
+    # writer pid long gone, so compaction treats the segment as closed
+    seg = tmp / "feedback-999999-1000.jsonl"
+    seg.write_text("".join(json.dumps({"type": "rewrite_click", "intent": "code", "ts": 1000.0 + i}) + "\n"
+                           for i in range(3)))
+    return seg
+
+
+class ReadRecentTest(unittest.TestCase):
+    def test_segment_compacted_mid_read(self):
+        tmp = Path(tempfile.mkdtemp())
+        _closed_segment(tmp)
+        tail = feedback.tail_lines
+
+        def compact_then_tail(path, n):
+            compact.compact(tmp)  # unlinks the segment between stat() and the read
+            return tail(path, n)
+
+        with mock.patch.object(feedback, "FEEDBACK_DIR", tmp), \
+                mock.patch.object(feedback, "FEEDBACK_PATH", tmp / "legacy.jsonl"), \
+                mock.patch.object(feedback, "tail_lines", compact_then_tail):
+            events = feedback.read_recent(10)
+        self.assertEqual([e["ts"] for e in events], [1000.0, 1001.0, 1002.0])
+
+
+class SummaryTest(unittest.TestCase):
+    def test_segment_compacted_mid_summary_is_counted_once(self):
+        tmp = Path(tempfile.mkdtemp())
+        seg = _closed_segment(tmp)
+        fold = feedback.segment_aggregates
+
+        def fold_then_compact(path):
+            agg = fold(path)
+            compact.compact(tmp)  # lands between reading segments and chunks
+            return agg
+
+        with mock.patch.object(feedback, "FEEDBACK_DIR", tmp), \
+                mock.patch.object(feedback, "FEEDBACK_PATH", tmp / "legacy.jsonl"):
+            with mock.patch.object(feedback, "segment_aggregates", fold_then_compact):
+                self.assertEqual(feedback.summary()["events"], 3)
+            self.assertFalse(seg.exists())
+            self.assertEqual(feedback.summary()["rewrite_clicks"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+# tests/test_resilience.py
+import time
+import unittest
+
+from backend.llm.resilience import ResilienceConfig, ResilientCaller, UpstreamError
+
+
+class _Boom(ConnectionError):
+    pass
+
+
+def _fail(timeout_s: float):
+    raise _Boom("upstream down")
+
+
+def _ok(timeout_s: float):
+    return "ok"
+
+
+class HalfOpenProbeTest(unittest.TestCase):
+    def _open_breaker(self) -> ResilientCaller:
+        caller = ResilientCaller(ResilienceConfig(max_attempts=1, failure_threshold=1, reset_timeout_s=0.05,
+                                                  backoff_base_s=0.0))
+        with self.assertRaises(UpstreamError):
+            caller.call(_fail)
+        self.assertEqual(caller.breaker.state, "open")
+        time.sleep(0.06)
+        return caller
+
+    def test_short_deadline_does_not_consume_probe(self):
+        caller = self._open_breaker()
+        with self.assertRaises(UpstreamError) as cm:
+            caller.call(_ok, deadline_s=0.1)  # below MIN_ATTEMPT_S: no attempt
+        self.assertEqual(cm.exception.kind, "timeout")
+        self.assertEqual(caller.call(_ok), "ok")
+        self.assertEqual(caller.breaker.state, "closed")
+
+    def test_lost_probe_is_reissued(self):
+        caller = self._open_breaker()
+        self.assertTrue(caller.breaker.allow())   # probe taken, never reported
+        self.assertFalse(caller.breaker.allow())
+        time.sleep(0.06)
+        self.assertEqual(caller.call(_ok), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# tests/test_segment.py
+import time
+import unittest
+
+from backend.compress.segment import segment_text
+
+PROSE = "The quick brown fox jumps over the lazy dog again and again, then it rests a while now ok"
+
+
+class CsvRunTest(unittest.TestCase):
+    def test_quoted_comma_row_after_header(self):
+        text = 'name,city,note\nbob,NYC,"hello, world"\nal,LA,ok\njo,SF,ok\nmo,DC,ok'
+        segs = segment_text(text)
+        self.assertEqual([(s["type"], s["start_line"]) for s in segs], [("csv", 0)])
+
+    def test_rejected_run_is_scanned_once(self):
+        text = "\n".join([PROSE] * 4000)
+        t0 = time.perf_counter()
+        segment_text(text)
+        # quadratic rescans took seconds here
+        self.assertLess(time.perf_counter() - t0, 1.5)
+
+
+class JsonRunTest(unittest.TestCase):
+    def test_bracketed_prose_does_not_disable_json(self):
+        for first in ("[Note] look at this:", "{placeholder} look at this:"):
+            segs = segment_text(first + '\n{"a": 1, "b": [1,2]}\nthanks')
+            self.assertEqual([s["type"] for s in segs], ["text", "json", "text"])
+
+    def test_unbalanced_blob_is_scanned_once(self):
+        text = "\n".join(["{ never closed"] + ["[x"] * 4000)
+        t0 = time.perf_counter()
+        segment_text(text)
+        self.assertLess(time.perf_counter() - t0, 1.5)
+
+
+class ColumnStructureTest(unittest.TestCase):
+    def test_comma_prose_is_text(self):
+        text = "\n".join(["I went to the market, and I bought some apples",
+                          "Then I walked home, which took a while",
+                          "My sister called, asking about dinner"] * 3)
+        self.assertEqual([s["type"] for s in segment_text(text)], ["text"])
+
+    def test_two_column_table_after_prose(self):
+        text = "Here is the data, please check:\nname,age\nbob,3\nal,4\njo,5\nthanks"
+        segs = segment_text(text)
+        self.assertEqual([(s["type"], s["start_line"]) for s in segs], [("text", 0), ("csv", 1), ("text", 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
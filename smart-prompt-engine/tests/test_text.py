@@ -0,0 +1,15 @@
+# tests/test_text.py
+import unittest
+
+from backend.compress.text import compress_text
+
+
+class BudgetTest(unittest.TestCase):
+    def test_title_and_heading_stay(self):
+        text = "Release notes\n" + "\n".join(f"Item {i} changed the parser in some way." for i in range(20))
+        r = compress_text(text, target_tokens=3, near_dup_threshold=0)
+        self.assertEqual(r["compressed"].split("\n")[:2], ["Release notes", "Key points:"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+# tests/test_tokens.py
+import unittest
+
+from backend.compress import tokens
+
+
+class _FlakyTokenizer:
+    def __init__(self):
+        self.fail = True
+
+    def encode(self, text, add_special_tokens=False):
+        if self.fail:
+            raise RuntimeError("tokenizer not ready")
+        return text.split()
+
+
+class CountTokensTest(unittest.TestCase):
+    def tearDown(self):
+        tokens.set_tokenizer(None)
+
+    def test_fallback_is_not_cached(self):
+        tok = _FlakyTokenizer()
+        tokens.set_tokenizer(tok)
+        before = tokens.token_count_stats()["fallbacks"]
+        line = "alpha beta gamma delta epsilon"
+        self.assertEqual(tokens.count_tokens(line), tokens.estimate_tokens(line))
+        self.assertEqual(tokens.token_count_stats()["fallbacks"], before + 1)
+        tok.fail = False
+        self.assertEqual(tokens.count_tokens(line), 5)
+
+    def test_cache_is_bounded_by_bytes(self):
+        tokens.set_tokenizer(None)
+        for i in range(20000):
+            tokens.count_tokens(f"{i} " + "x" * 1500)
+        stats = tokens.token_count_stats()
+        self.assertLessEqual(stats["cache_bytes"], stats["cache_max_bytes"])
+        self.assertGreater(stats["cache_evictions"], 0)
+
+
+class FitLinesTest(unittest.TestCase):
+    def test_pinned_lines_survive_any_budget(self):
+        lines = ["legend: a=alpha, b=beta", "row one here", "row two here"]
+        kept, total = tokens.fit_lines(lines, [tokens.PINNED, 0, 0], target_tokens=1)
+        self.assertEqual(kept, [0])
+        self.assertEqual(total, tokens.count_tokens(lines[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
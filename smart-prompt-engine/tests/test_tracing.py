@@ -0,0 +1,54 @@
+# tests/test_tracing.py
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from backend.tracing import JsonlExporter, _Trace
+
+
+def _root() -> dict:
+    return {"span": 0, "parent": None, "name": "request", "start_ms": 0.0, "dur_ms": 1.0}
+
+
+class ExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def test_concurrent_flushes_write_each_trace_once(self):
+        exp = JsonlExporter(directory=self.tmp)
+        for _ in range(2000):
+            exp.pending.append((_Trace("t"), _root()))
+        errors = []
+
+        def run():
+            try:
+                exp.flush()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(exp.path.read_text().splitlines()), 2000)
+
+    def test_write_error_keeps_thread_alive(self):
+        blocker = self.tmp / "blocked"
+        blocker.write_text("not a directory")
+        exp = JsonlExporter(directory=blocker / "traces")
+        exp.export(_Trace("t"), _root())
+        exp._wake.set()
+        end = time.monotonic() + 5
+        while exp.write_errors == 0 and time.monotonic() < end:
+            time.sleep(0.01)
+        self.assertEqual(exp.write_errors, 1)
+        self.assertEqual(exp.dropped, 1)
+        self.assertTrue(exp._thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()